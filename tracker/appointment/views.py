@@ -5,6 +5,7 @@ from rest_framework import status
 from rest_framework.exceptions import ValidationError, NotFound
 
 from core.models import Parent
+from core.idempotency import IdempotentCreateMixin
 from .models import Availability, Appointment, Therapist
 from .serializers import AvailabilitySerializer, AppointmentSerializer
 import logging
@@ -138,7 +139,7 @@ class AvailabilityViewSet(viewsets.ModelViewSet):
         # logger.info(f"Deleted availability {instance.id} by user {user.id}")
 
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -0,0 +1,40 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from django.contrib.auth.models import AnonymousUser
+
+
+@database_sync_to_async
+def user_from_token(token):
+    """
+    Resolve a JWT access token or a DRF auth token to an active user.
+    """
+    from rest_framework.authtoken.models import Token
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.settings import api_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+    from core.models import CustomUser
+
+    try:
+        user_id = AccessToken(token)[api_settings.USER_ID_CLAIM]
+        return CustomUser.objects.filter(id=user_id, is_active=True).first()
+    except (TokenError, KeyError):
+        pass
+    found = Token.objects.select_related('user').filter(key=token).first()
+    if found and found.user.is_active:
+        return found.user
+    return None
+
+
+async def get_scope_user(scope):
+    """
+    The session user of the connection, or the user of a ``?token=`` query
+    parameter for clients (mobile apps, devices) that cannot send cookies.
+    """
+    user = scope.get('user') or AnonymousUser()
+    if user.is_authenticated:
+        return user
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+    if token:
+        return await user_from_token(token[0]) or AnonymousUser()
+    return AnonymousUser()
@@ -1,9 +1,21 @@
+import asyncio
 import json
+import logging
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from .models import ChatMessage
 from core.models import CustomUser
 from channels.db import database_sync_to_async
 from channels.auth import AuthMiddlewareStack
+from rest_framework.utils.encoders import JSONEncoder
+from core.access import accessible_children
+from log.models import LatestVitals
+from log.serializers import LatestVitalsSerializer
+from log.devices import open_stream, store_frames, stream_settings
+from log.realtime import vitals_group
+from .auth import get_scope_user
+
+logger = logging.getLogger(__name__)
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -50,4 +62,161 @@ class ChatConsumer(AsyncWebsocketConsumer):
             sender_id=sender_id,
             receiver_id=receiver_id,
             message=message
-        )
\ No newline at end of file
+        )
+
+
+class VitalsConsumer(AsyncWebsocketConsumer):
+    """
+    Live vitals of one child for its parent or therapist.
+
+    On connect the client gets a ``snapshot`` of the latest vitals, then a
+    ``delta`` message for every log write and an ``anomaly`` message for
+    every flagged reading. Unauthenticated connections are closed with 4401,
+    children the user cannot see with 4403.
+    """
+
+    async def connect(self):
+        self.child_id = int(self.scope['url_route']['kwargs']['child_id'])
+        self.group_name = None
+        user = await get_scope_user(self.scope)
+        if not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        if not await self.can_view(user, self.child_id):
+            await self.close(code=4403)
+            return
+
+        self.group_name = vitals_group(self.child_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.send_json({'type': 'snapshot', 'child': self.child_id, 'latest': await self.latest_vitals()})
+
+    async def disconnect(self, close_code):
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        # The stream is one-way; a ping is answered so clients can detect dead sockets
+        try:
+            message = json.loads(text_data or '{}')
+        except ValueError:
+            return
+        if isinstance(message, dict) and message.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def vitals_delta(self, event):
+        await self.send_json({**event, 'type': 'delta'})
+
+    async def vitals_anomaly(self, event):
+        await self.send_json({**event, 'type': 'anomaly'})
+
+    async def send_json(self, data):
+        await self.send(text_data=json.dumps(data, cls=JSONEncoder))
+
+    @database_sync_to_async
+    def can_view(self, user, child_id):
+        return accessible_children(user).filter(id=child_id).exists()
+
+    @database_sync_to_async
+    def latest_vitals(self):
+        latest = LatestVitals.objects.filter(child_id=self.child_id).first()
+        return LatestVitalsSerializer(latest).data if latest else None
+
+
+class DeviceIngestConsumer(AsyncWebsocketConsumer):
+    """
+    Readings streamed by a wearable for one child, at ws/ingest/<child_id>/
+    with ``?device=<id>&token=<token>``.
+
+    The device is authenticated once, on connect, and told the last sequence
+    number the server has stored (``ready``). It then sends frames such as
+    ``{"seq": 12, "bpm": 92}`` or ``{"seq": 13, "systolic": 118, "dystolic": 76}``,
+    singly or as a JSON list. Frames are buffered and stored in one batch
+    every flush interval, after which an ``ack`` carries the highest stored
+    sequence number; after a reconnect the device resends everything above
+    it. Frames at or below a sequence number already received are ignored.
+    Rows get their created_at when the batch is stored.
+    """
+
+    async def connect(self):
+        self.stream = None
+        self.flush_task = None
+        user = await get_scope_user(self.scope)
+        if not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        device_id = parse_qs(self.scope.get('query_string', b'').decode()).get('device', [''])[0]
+        if not device_id or len(device_id) > 64:
+            await self.close(code=4400)
+            return
+        child_id = int(self.scope['url_route']['kwargs']['child_id'])
+        self.stream = await database_sync_to_async(open_stream)(user, child_id, device_id)
+        if self.stream is None:
+            await self.close(code=4403)
+            return
+
+        config = stream_settings()
+        self.flush_interval = config['FLUSH_INTERVAL_MS'] / 1000
+        self.max_pending = config['MAX_PENDING']
+        self.pending = []
+        self.last_seq = self.stream.last_acked_seq  # highest sequence number received
+        self.flush_lock = asyncio.Lock()
+
+        await self.accept()
+        await self.send_json({'type': 'ready', 'last_seq': self.stream.last_acked_seq})
+        self.flush_task = asyncio.create_task(self.flush_periodically())
+
+    async def disconnect(self, close_code):
+        if self.flush_task:
+            self.flush_task.cancel()
+        if self.stream is not None and self.pending:
+            # Keep what was received; the device learns the ack on reconnect
+            async with self.flush_lock:
+                frames, self.pending = self.pending, []
+                await database_sync_to_async(store_frames)(self.stream, frames)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            payload = json.loads(text_data or bytes_data)
+        except ValueError:
+            await self.send_json({'type': 'error', 'error': 'Frames must be JSON'})
+            return
+
+        malformed = 0
+        for frame in payload if isinstance(payload, list) else [payload]:
+            seq = frame.get('seq') if isinstance(frame, dict) else None
+            if not isinstance(seq, int) or isinstance(seq, bool):
+                malformed += 1
+                continue
+            if seq <= self.last_seq:
+                continue  # already received
+            self.last_seq = seq
+            self.pending.append(frame)
+
+        if malformed:
+            await self.send_json({'type': 'error', 'error': f'{malformed} frames without an integer seq were dropped'})
+        if len(self.pending) >= self.max_pending:
+            await self.flush()
+
+    async def flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.pending:
+                return
+            frames, self.pending = self.pending, []
+            try:
+                stored, rejected = await database_sync_to_async(store_frames)(self.stream, frames)
+            except Exception as e:
+                # Nothing was acked, so the frames are retried with the next flush
+                logger.error(f"Storing {len(frames)} frames from device {self.stream.device_id} failed: {e}", exc_info=True)
+                self.pending = frames + self.pending
+                return
+        await self.send_json({'type': 'ack', 'seq': self.stream.last_acked_seq, 'stored': stored, 'rejected': rejected})
+
+    async def send_json(self, data):
+        await self.send(text_data=json.dumps(data, cls=JSONEncoder))
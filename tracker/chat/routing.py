@@ -3,4 +3,6 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'^ws/chat/(?P<receiver_id>\d+)/$', consumers.ChatConsumer.as_asgi()),
+    re_path(r'^ws/vitals/(?P<child_id>\d+)/$', consumers.VitalsConsumer.as_asgi()),
+    re_path(r'^ws/ingest/(?P<child_id>\d+)/$', consumers.DeviceIngestConsumer.as_asgi()),
 ]
\ No newline at end of file
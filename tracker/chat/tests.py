@@ -1,3 +1,215 @@
-from django.test import TestCase
+import json
+from urllib.parse import urlsplit
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from django.test import TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from core.models import CustomUser, ChildProfile
+from log.models import HeartBeat, BloodPressure, DeviceStream, LatestVitals
+from log.devices import store_frames, open_stream
+from log.ingest import bulk_insert
+from log.realtime import vitals_group
+from .routing import websocket_urlpatterns
+
+application = URLRouter(websocket_urlpatterns)
+
+
+class WebsocketClient(ApplicationCommunicator):
+    # A minimal channels.testing.WebsocketCommunicator, which needs daphne
+    def __init__(self, path):
+        url = urlsplit(path)
+        super().__init__(application, {
+            'type': 'websocket', 'path': url.path, 'query_string': url.query.encode(),
+            'headers': [], 'subprotocols': [],
+        })
+
+    async def connect(self, timeout=1):
+        await self.send_input({'type': 'websocket.connect'})
+        response = await self.receive_output(timeout)
+        if response['type'] == 'websocket.close':
+            return False, response.get('code', 1000)
+        return True, None
+
+    async def send_json_to(self, data):
+        await self.send_input({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def receive_json_from(self, timeout=1):
+        response = await self.receive_output(timeout)
+        return json.loads(response['text'])
+
+    async def disconnect(self, code=1000, timeout=1):
+        await self.send_input({'type': 'websocket.disconnect', 'code': code})
+        await self.wait(timeout)
+
+
+def make_user(email, role='parent'):
+    return CustomUser.objects.create_user(email=email, phone_number=email.split('@')[0][:15], role=role)
+
+
+class SocketTestCase(TransactionTestCase):
+    # The consumers query the database from worker threads, which cannot see
+    # the uncommitted data of a TestCase transaction
+
+    def setUp(self):
+        self.user = make_user('parent@example.com')
+        self.child = ChildProfile.objects.create(parent=self.user, first_name='Sam', last_name='Test')
+        self.other = make_user('other@example.com')
+        self.other_child = ChildProfile.objects.create(parent=self.other, first_name='Alex', last_name='Test')
+        self.token = Token.objects.create(user=self.user).key
+
+    async def connect(self, path):
+        communicator = WebsocketClient(path)
+        connected, code = await communicator.connect()
+        return communicator, connected, code
+
+
+class VitalsConsumerTests(SocketTestCase):
+    def test_requires_authentication(self):
+        async def check():
+            _, connected, code = await self.connect(f'/ws/vitals/{self.child.id}/')
+            self.assertEqual((connected, code), (False, 4401))
+            _, connected, code = await self.connect(f'/ws/vitals/{self.child.id}/?token=wrong')
+            self.assertEqual((connected, code), (False, 4401))
+        async_to_sync(check)()
+
+    def test_rejects_children_the_user_cannot_see(self):
+        async def check():
+            _, connected, code = await self.connect(f'/ws/vitals/{self.other_child.id}/?token={self.token}')
+            self.assertEqual((connected, code), (False, 4403))
+        async_to_sync(check)()
+
+    def test_snapshot_then_deltas_and_anomalies(self):
+        HeartBeat.objects.create(child=self.child, bpm=120)
+
+        async def check():
+            communicator, connected, _ = await self.connect(f'/ws/vitals/{self.child.id}/?token={self.token}')
+            self.assertTrue(connected)
+            snapshot = await communicator.receive_json_from()
+            self.assertEqual(snapshot['type'], 'snapshot')
+            self.assertEqual(snapshot['latest']['heartbeat_bpm'], 120)
+
+            # The children are born today, so 250 bpm is out of range
+            beat = await database_sync_to_async(HeartBeat.objects.create)(child=self.child, bpm=250)
+            delta = await communicator.receive_json_from()
+            self.assertEqual((delta['type'], delta['log'], delta['op']), ('delta', 'heartbeat', 'upsert'))
+            self.assertEqual(delta['fields'], ['id', 't', 'bpm'])
+            self.assertEqual(delta['rows'][0][0], beat.id)
+            self.assertEqual(delta['rows'][0][2], 250)
+            anomaly = await communicator.receive_json_from()
+            self.assertEqual(anomaly['type'], 'anomaly')
+            self.assertEqual(anomaly['rows'][0][:3], ['heartbeat_bpm', 'out_of_range', 250])
+
+            beat_id = beat.id
+            await database_sync_to_async(beat.delete)()
+            deleted = await communicator.receive_json_from()
+            self.assertEqual((deleted['op'], deleted['rows']), ('delete', [[beat_id]]))
+
+            # Other children's writes do not reach this socket
+            await database_sync_to_async(HeartBeat.objects.create)(child=self.other_child, bpm=120)
+            await communicator.send_json_to({'type': 'ping'})
+            self.assertEqual(await communicator.receive_json_from(), {'type': 'pong'})
+            await communicator.disconnect()
+        async_to_sync(check)()
+
+    def test_bulk_insert_is_one_delta(self):
+        async def check():
+            communicator, _, _ = await self.connect(f'/ws/vitals/{self.child.id}/?token={self.token}')
+            self.assertIsNone((await communicator.receive_json_from())['latest'])
+            await database_sync_to_async(bulk_insert)(
+                HeartBeat, [HeartBeat(child=self.child, bpm=bpm) for bpm in (110, 111, 112)]
+            )
+            delta = await communicator.receive_json_from()
+            self.assertEqual([row[2] for row in delta['rows']], [110, 111, 112])
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+        async_to_sync(check)()
+
+    def test_rolled_back_rows_are_not_published(self):
+        async def check():
+            layer = get_channel_layer()
+            channel = await layer.new_channel()
+            await layer.group_add(vitals_group(self.child.id), channel)
+
+            def write_and_roll_back():
+                from django.db import transaction
+                with transaction.atomic():
+                    HeartBeat.objects.create(child=self.child, bpm=120)
+                    transaction.set_rollback(True)
+                HeartBeat.objects.create(child=self.child, bpm=121)
+
+            await database_sync_to_async(write_and_roll_back)()
+            message = await layer.receive(channel)
+            self.assertEqual(message['rows'][0][2], 121)
+            await layer.group_discard(vitals_group(self.child.id), channel)
+        async_to_sync(check)()
+
+
+@override_settings(DEVICE_STREAM={'FLUSH_INTERVAL_MS': 50, 'MAX_PENDING': 3})
+class DeviceIngestConsumerTests(SocketTestCase):
+    def path(self, child=None, device='watch-1', token=None):
+        return f'/ws/ingest/{(child or self.child).id}/?device={device}&token={token or self.token}'
+
+    def test_connect_checks_token_device_and_child(self):
+        async def check():
+            _, connected, code = await self.connect(self.path(token='wrong'))
+            self.assertEqual((connected, code), (False, 4401))
+            _, connected, code = await self.connect(self.path(device=''))
+            self.assertEqual((connected, code), (False, 4400))
+            _, connected, code = await self.connect(self.path(child=self.other_child))
+            self.assertEqual((connected, code), (False, 4403))
+        async_to_sync(check)()
+
+    def test_frames_are_stored_acked_and_not_duplicated_on_resend(self):
+        async def check():
+            communicator, connected, _ = await self.connect(self.path())
+            self.assertTrue(connected)
+            self.assertEqual(await communicator.receive_json_from(), {'type': 'ready', 'last_seq': 0})
+            await communicator.send_json_to([
+                {'seq': 1, 'bpm': 120},
+                {'seq': 2, 'systolic': 90, 'dystolic': 60},
+                {'seq': 3, 'bpm': 'fast'},
+            ])
+            ack = await communicator.receive_json_from()
+            self.assertEqual((ack['type'], ack['seq'], ack['stored']), ('ack', 3, 2))
+            self.assertEqual([frame['seq'] for frame in ack['rejected']], [3])
+            await communicator.disconnect()
+
+            # A reconnecting device resends from its last ack; older frames are dropped
+            communicator, _, _ = await self.connect(self.path())
+            self.assertEqual(await communicator.receive_json_from(), {'type': 'ready', 'last_seq': 3})
+            await communicator.send_json_to([{'seq': 2, 'bpm': 121}, {'seq': 4, 'bpm': 122}])
+            ack = await communicator.receive_json_from(timeout=2)
+            self.assertEqual((ack['seq'], ack['stored']), (4, 1))
+            await communicator.send_json_to({'bpm': 123})
+            self.assertEqual((await communicator.receive_json_from())['type'], 'error')
+            await communicator.disconnect()
+        async_to_sync(check)()
+
+        self.assertEqual(sorted(HeartBeat.objects.values_list('bpm', flat=True)), [120, 122])
+        self.assertEqual(BloodPressure.objects.get().systolic, 90)
+        stream = DeviceStream.objects.get()
+        self.assertEqual((stream.last_acked_seq, stream.frames_stored, stream.frames_rejected), (4, 3, 1))
+
+    def test_pending_frames_are_stored_on_disconnect(self):
+        async def check():
+            communicator, _, _ = await self.connect(self.path())
+            await communicator.receive_json_from()
+            await communicator.send_json_to({'seq': 1, 'bpm': 120})
+            await communicator.disconnect()
+        with override_settings(DEVICE_STREAM={'FLUSH_INTERVAL_MS': 60000, 'MAX_PENDING': 100}):
+            async_to_sync(check)()
+        self.assertEqual(HeartBeat.objects.get().bpm, 120)
+        self.assertEqual(DeviceStream.objects.get().last_acked_seq, 1)
+
+    def test_store_frames_skips_already_acked_sequence_numbers(self):
+        stream = open_stream(self.user, self.child.id, 'watch-1')
+        self.assertEqual(store_frames(stream, [{'seq': 1, 'bpm': 120}, {'seq': 2, 'bpm': 121}]), (2, []))
+        # The same frames arriving over a second connection
+        self.assertEqual(store_frames(open_stream(self.user, self.child.id, 'watch-1'), [{'seq': 2, 'bpm': 121}]), (0, []))
+        self.assertEqual(HeartBeat.objects.count(), 2)
+        self.assertEqual(LatestVitals.objects.get(child=self.child).heartbeat_bpm, 121)
@@ -0,0 +1,20 @@
+from django.db.models import Q
+
+from .models import ChildProfile
+
+
+def accessible_children(user):
+    """
+    Children whose records the user may read: their own children, and for a
+    therapist, children they share a chat room with or whose parent has
+    booked one of their appointment slots.
+    """
+    # Imported here: both apps import core.models
+    from appointment.models import Appointment
+    from communication.models import ChatRoom
+
+    chat_children = ChatRoom.objects.filter(therapist=user).values('child_id')
+    booked_parents = Appointment.objects.filter(availability__therapist__user=user).values('parent__user_id')
+    return ChildProfile.objects.filter(
+        Q(parent=user) | Q(id__in=chat_children) | Q(parent_id__in=booked_parents)
+    )
@@ -0,0 +1,133 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_TTL = getattr(settings, 'IDEMPOTENCY_KEY_TTL', timedelta(hours=24))
+# A claim older than this belongs to a worker that died mid-request; a few
+# times the longest request the server lets run
+IDEMPOTENCY_CLAIM_TIMEOUT = getattr(settings, 'IDEMPOTENCY_CLAIM_TIMEOUT', timedelta(minutes=5))
+MAX_KEY_LENGTH = 255
+
+
+def _hash(*parts):
+    return hashlib.sha256('\x1f'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _cache_key(key_hash):
+    return f'idempotency:{key_hash}'
+
+
+def run_idempotent(request, handler):
+    """
+    Run ``handler`` (returning a Response) at most once per Idempotency-Key.
+
+    Without the header the handler simply runs. With it, the first request
+    stores its response; retries with the same key and payload get that
+    response back (from the cache, or one indexed lookup) without running the
+    handler again. Reusing a key for a different payload is rejected with 422
+    and a retry that arrives while the first attempt is still running gets 409,
+    unless that attempt was claimed more than IDEMPOTENCY_CLAIM_TIMEOUT ago:
+    its worker is taken to be dead and the retry runs the handler instead.
+    Server errors are not stored, so those requests can be retried.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return handler()
+    if len(key) > MAX_KEY_LENGTH:
+        return Response(
+            {'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    key_hash = _hash(request.user.pk, request.method, request.path, key)
+    try:
+        payload = json.dumps(request.data, cls=JSONEncoder, sort_keys=True)
+    except TypeError:
+        payload = repr(request.data)
+    request_hash = _hash(payload)
+
+    stored = cache.get(_cache_key(key_hash))
+    stale = False
+    if stored is None:
+        record = IdempotencyKey.objects.filter(key_hash=key_hash, expires_at__gt=timezone.now()).first()
+        if record is not None:
+            stored = (record.request_hash, record.status_code, record.response_body)
+            stale = record.created_at <= timezone.now() - IDEMPOTENCY_CLAIM_TIMEOUT
+
+    if stored is not None:
+        stored_request_hash, status_code, body = stored
+        if stored_request_hash != request_hash:
+            return Response(
+                {'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if status_code is not None:
+            return Response(body, status=status_code, headers={'Idempotent-Replayed': 'true'})
+        if not stale:
+            return Response({'error': 'A request with this key is still in progress'}, status=status.HTTP_409_CONFLICT)
+
+    # Claim the key before running the handler so concurrent retries see it
+    now = timezone.now()
+    expires_at = now + IDEMPOTENCY_KEY_TTL
+    IdempotencyKey.objects.filter(key_hash=key_hash).filter(
+        Q(expires_at__lte=now) | Q(status_code__isnull=True, created_at__lte=now - IDEMPOTENCY_CLAIM_TIMEOUT)
+    ).delete()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                key_hash=key_hash, user=request.user, request_hash=request_hash, expires_at=expires_at,
+            )
+    except IntegrityError:
+        return Response({'error': 'A request with this key is still in progress'}, status=status.HTTP_409_CONFLICT)
+
+    try:
+        response = handler()
+    except Exception:
+        record.delete()
+        raise
+
+    if response.status_code >= 500:
+        record.delete()
+        return response
+
+    body = json.loads(json.dumps(response.data, cls=JSONEncoder)) if response.data is not None else None
+    # The claim may have been taken over while the handler ran too long; the
+    # new owner's outcome is the one that is kept
+    claimed = IdempotencyKey.objects.filter(pk=record.pk).update(status_code=response.status_code, response_body=body)
+    if not claimed:
+        return response
+    cache.set(
+        _cache_key(key_hash),
+        (request_hash, response.status_code, body),
+        timeout=int(IDEMPOTENCY_KEY_TTL.total_seconds()),
+    )
+    return response
+
+
+def purge_expired():
+    """
+    Delete expired keys. Returns the number of keys removed.
+    """
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+class IdempotentCreateMixin:
+    """
+    ViewSet mixin adding Idempotency-Key support to ``create`` (POST).
+    """
+
+    def create(self, request, *args, **kwargs):
+        return run_idempotent(request, lambda: super(IdempotentCreateMixin, self).create(request, *args, **kwargs))
@@ -155,3 +155,20 @@ class ChildProfile(TimeStampedModel):
         verbose_name_plural = 'Child Profiles'
 
 
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored outcome of a POST sent with an Idempotency-Key header, replayed
+    for retries of the same request until it expires.
+    """
+    key_hash = models.CharField(max_length=64, unique=True)  # sha256 of user, method, path and key
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='idempotency_keys')
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)  # null while in progress
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Idempotency key {self.key_hash[:12]} for {self.user_id}"
@@ -1,3 +1,105 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from log.models import HeartBeat
+from .idempotency import IDEMPOTENCY_CLAIM_TIMEOUT, _hash, purge_expired, run_idempotent
+from .models import CustomUser, ChildProfile, IdempotencyKey
+
+
+class IdempotencyTests(TestCase):
+    url = '/api/api/heartbeats/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='parent@example.com', phone_number='1', role='parent')
+        self.child = ChildProfile.objects.create(parent=self.user, first_name='Sam', last_name='Test')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, key, bpm=70):
+        return self.client.post(
+            self.url, {'child': self.child.id, 'bpm': bpm}, format='json', headers={'Idempotency-Key': key}
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post('abc')
+        self.assertEqual(first.status_code, 201)
+        for _ in range(2):
+            retry = self.post('abc')
+            self.assertEqual(retry.status_code, 201)
+            self.assertEqual(retry.data, first.data)
+            self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(HeartBeat.objects.count(), 1)
+
+    def test_replay_survives_a_cache_flush(self):
+        first = self.post('abc')
+        cache.clear()
+        self.assertEqual(self.post('abc').data, first.data)
+        self.assertEqual(HeartBeat.objects.count(), 1)
+
+    def test_key_reused_for_another_payload_is_rejected(self):
+        self.post('abc')
+        self.assertEqual(self.post('abc', bpm=90).status_code, 422)
+        self.assertEqual(HeartBeat.objects.count(), 1)
+
+    def test_request_in_progress_gets_409(self):
+        key_hash = _hash(self.user.pk, 'POST', self.url, 'abc')
+        IdempotencyKey.objects.create(
+            key_hash=key_hash, user=self.user, request_hash='pending', expires_at=timezone.now() + timedelta(hours=1)
+        )
+        self.assertEqual(self.post('abc').status_code, 422)
+        payload = json.dumps({'child': self.child.id, 'bpm': 70}, sort_keys=True)
+        IdempotencyKey.objects.filter(key_hash=key_hash).update(request_hash=_hash(payload))
+        self.assertEqual(self.post('abc').status_code, 409)
+        self.assertFalse(HeartBeat.objects.exists())
+
+    def test_stale_claim_is_taken_over(self):
+        # The worker that claimed the key died without finishing
+        key_hash = _hash(self.user.pk, 'POST', self.url, 'abc')
+        payload = json.dumps({'child': self.child.id, 'bpm': 70}, sort_keys=True)
+        record = IdempotencyKey.objects.create(
+            key_hash=key_hash, user=self.user, request_hash=_hash(payload), expires_at=timezone.now() + timedelta(hours=1)
+        )
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            created_at=timezone.now() - IDEMPOTENCY_CLAIM_TIMEOUT - timedelta(seconds=1)
+        )
+        first = self.post('abc')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(self.post('abc').data, first.data)
+        self.assertEqual(HeartBeat.objects.count(), 1)
+        self.assertFalse(IdempotencyKey.objects.filter(pk=record.pk).exists())
+
+    def test_late_finish_of_a_taken_over_claim_is_not_stored(self):
+        replies = []
+
+        def handler():
+            # Another worker takes over the claim while this one runs
+            IdempotencyKey.objects.update(created_at=timezone.now() - IDEMPOTENCY_CLAIM_TIMEOUT)
+            replies.append(self.post('abc', bpm=70))
+            return Response({'late': True}, status=201)
+
+        request = mock.Mock(headers={'Idempotency-Key': 'abc'}, user=self.user, method='POST', path=self.url,
+                            data={'child': self.child.id, 'bpm': 70})
+        self.assertEqual(run_idempotent(request, handler).data, {'late': True})
+        self.assertEqual(replies[0].status_code, 201)
+        self.assertEqual(self.post('abc').data, replies[0].data)
+
+    def test_without_header_every_request_runs(self):
+        self.client.post(self.url, {'child': self.child.id, 'bpm': 70}, format='json')
+        self.client.post(self.url, {'child': self.child.id, 'bpm': 70}, format='json')
+        self.assertEqual(HeartBeat.objects.count(), 2)
 
-# Create your tests here.
+    def test_expired_keys_are_purged_and_reusable(self):
+        self.post('abc')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        cache.clear()
+        self.assertEqual(purge_expired(), 1)
+        self.assertEqual(self.post('abc', bpm=90).status_code, 201)
+        self.assertEqual(HeartBeat.objects.count(), 2)
@@ -4,6 +4,9 @@ import requests
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from llm_cache import cached_call
+import prompt_builder
+
 # Load environment variables from .env
 load_dotenv()
 
@@ -16,7 +19,12 @@ REPORT_POST_URL = "http://localhost:8000/api/api/report/"
 
 # Configure Gemini
 genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash-002")
+MODEL_NAME = "gemini-1.5-flash-002"
+model = genai.GenerativeModel(MODEL_NAME)
+
+# Bump when the report prompt changes, so cached reports are not reused
+REPORT_PROMPT_VERSION = 3
+REPORT_TOKEN_BUDGET = int(os.getenv("REPORT_PROMPT_TOKEN_BUDGET", prompt_builder.DEFAULT_TOKEN_BUDGET))
 
 def fetch_dashboard_data() -> dict:
     """
@@ -29,13 +37,37 @@ def fetch_dashboard_data() -> dict:
     response.raise_for_status()
     return response.json()
 
-def summarize_dashboard_data(data: dict) -> dict:
+def summarize_dashboard_data(data: dict, timeout: float = None, bypass_cache: bool = False) -> dict:
     """
     Sends dashboard JSON to Gemini and receives structured health summary.
-    Cleans response from Markdown and parses JSON.
+    Cleans response from Markdown and parses JSON. ``timeout`` (seconds)
+    bounds the request. Valid reports are cached per input (see llm_cache);
+    ``bypass_cache`` forces a fresh call.
+
+    The logs are sent as compact statistics (see prompt_builder), and the
+    report's "usage" says how many input tokens that took.
     """
+    payload, estimated_tokens = prompt_builder.build(data, REPORT_TOKEN_BUDGET)
+    called = False
+
+    def call():
+        nonlocal called
+        called = True
+        return _summarize(payload, estimated_tokens, timeout)
+
+    report = cached_call(
+        MODEL_NAME, REPORT_PROMPT_VERSION, payload, call,
+        bypass=bypass_cache,
+        cacheable=lambda report: "error" not in report,
+    )
+    if not called:
+        report = dict(report, usage={"input_tokens": 0, "output_tokens": 0, "cached": True})
+    return report
+
+
+def _summarize(payload: str, estimated_tokens: int, timeout: float = None) -> dict:
     prompt = f"""
-You are a health assistant for caregivers of autistic children. Based on the following JSON-formatted log data, generate a summary report in strict JSON format only.
+You are a health assistant for caregivers of autistic children. Based on the following JSON-formatted log statistics, generate a summary report in strict JSON format only.
 for the week make it look like a weekly report
 Return a JSON object in the following format:
 {{
@@ -51,11 +83,11 @@ Return a JSON object in the following format:
   }}
 }}
 make everything descriptive, also it is going to be displayed for the parent so make it for the parent, don't mention about child ID,
-Here is the input data:
-{data}
+Here is the input data ({prompt_builder.FORMAT_NOTE}):
+{payload}
 """
 
-    response = model.generate_content(prompt)
+    response = model.generate_content(prompt, request_options={"timeout": timeout} if timeout else None)
     raw_output = response.text.strip()
 
     # Strip code block markers if present
@@ -64,8 +96,15 @@ Here is the input data:
     elif raw_output.startswith("```"):
         raw_output = raw_output.lstrip("```").rstrip("```").strip()
 
+    usage = getattr(response, "usage_metadata", None)
     try:
-        return json.loads(raw_output)
+        report = json.loads(raw_output)
+        if isinstance(report, dict):
+            report["usage"] = {
+                "input_tokens": usage.prompt_token_count if usage else estimated_tokens,
+                "output_tokens": usage.candidates_token_count if usage else None,
+            }
+        return report
     except json.JSONDecodeError:
         print("⚠️ Gemini did not return valid JSON. Cleaned output:")
         print(raw_output)
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Persistent cache of model responses, shared by gemini.py and
+# sentiment_analysis.py. Entries are keyed by a hash of the model name, the
+# prompt template version and the normalized input, so identical requests are
+# answered locally and any change to the prompt or model misses.
+#
+# The cache is a local file, so it is only shared by the processes of one
+# host; in a container it must live on a mounted volume to survive redeploys.
+#
+# Configured from the environment:
+#   LLM_CACHE_PATH         sqlite file (default llm_cache.sqlite3 in DATA_DIR)
+#   DATA_DIR               directory for local state (default the directory of this file)
+#   LLM_CACHE_TTL          seconds an entry is served (default 30 days)
+#   LLM_CACHE_MAX_ENTRIES  least recently used entries are evicted past this (default 10000)
+#   LLM_CACHE_DISABLED     "true" bypasses the cache entirely
+
+DATA_DIR = os.getenv("DATA_DIR", os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(DATA_DIR, "llm_cache.sqlite3")
+DEFAULT_TTL = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10000
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        value TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        last_used_at REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used_at)",
+    "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+]
+
+
+def normalize(data):
+    """
+    Canonical text of a request input: strings have their whitespace
+    collapsed, anything else becomes sorted, compact JSON.
+    """
+    if isinstance(data, str):
+        return " ".join(data.split())
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def make_key(model_name, template_version, data):
+    payload = json.dumps([model_name, template_version, normalize(data)], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    JSON values in a sqlite file, with TTL and least-recently-used eviction
+    and persistent hit/miss counters. Safe to use from several threads (one
+    connection per thread) and processes (sqlite locking).
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, enabled=True):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, conn, name):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) ON CONFLICT (name) DO UPDATE SET value = value + 1",
+            [name],
+        )
+
+    def get(self, key):
+        """
+        The cached value for the key, or None if it is missing or expired.
+        """
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute("SELECT value, created_at FROM responses WHERE key = ?", [key]).fetchone()
+        if row is None or now - row[1] > self.ttl:
+            self._count(conn, "misses")
+            return None
+        conn.execute("UPDATE responses SET last_used_at = ? WHERE key = ?", [now, key])
+        self._count(conn, "hits")
+        return json.loads(row[0])
+
+    def set(self, key, value, model_name=""):
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, model, value, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+            [key, model_name, json.dumps(value), now, now],
+        )
+        self.evict(now)
+
+    def evict(self, now=None):
+        """
+        Drop expired entries, then the least recently used ones past max_entries.
+        Returns the number of entries removed.
+        """
+        conn = self._connection()
+        now = now or time.time()
+        removed = conn.execute("DELETE FROM responses WHERE created_at < ?", [now - self.ttl]).rowcount
+        excess = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if excess > 0:
+            removed += conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used_at LIMIT ?)",
+                [excess],
+            ).rowcount
+        if removed:
+            conn.execute(
+                "INSERT INTO counters (name, value) VALUES ('evictions', ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                [removed],
+            )
+        return removed
+
+    def stats(self):
+        conn = self._connection()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "entries": conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0],
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute("DELETE FROM responses")
+        conn.execute("DELETE FROM counters")
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ResponseCache(
+                path=os.getenv("LLM_CACHE_PATH", DEFAULT_PATH),
+                ttl=int(os.getenv("LLM_CACHE_TTL", DEFAULT_TTL)),
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                enabled=os.getenv("LLM_CACHE_DISABLED", "false").lower() != "true",
+            )
+    return _default
+
+
+_inflight = {}  # key -> [lock, waiters]
+_inflight_lock = threading.Lock()
+
+
+@contextmanager
+def _single_flight(key):
+    # Concurrent calls for the same key in this process wait for the first one
+    with _inflight_lock:
+        entry = _inflight.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _inflight_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _inflight[key]
+
+
+def cached_call(model_name, template_version, data, compute, bypass=False, cacheable=None, cache=None):
+    """
+    Return the cached response for (model, template version, input), or
+    call ``compute()`` and cache its result. ``bypass`` skips the lookup but
+    still stores the fresh response; ``cacheable(result)`` can refuse to
+    store a result, e.g. an error.
+    """
+    cache = cache or default_cache()
+    if not cache.enabled:
+        return compute()
+    key = make_key(model_name, template_version, data)
+    with _single_flight(key):
+        if not bypass:
+            value = cache.get(key)
+            if value is not None:
+                return value
+        value = compute()
+        if cacheable is None or cacheable(value):
+            cache.set(key, value, model_name)
+        return value
@@ -10,4 +10,9 @@ admin.site.register(BloodPressure)
 admin.site.register(Food)
 admin.site.register(Sleep)
 admin.site.register(ScratchNotes)
-admin.site.register(Behavior)
\ No newline at end of file
+admin.site.register(Behavior)
+admin.site.register(VitalRollup)
+admin.site.register(LatestVitals)
+admin.site.register(VitalAnomaly)
+admin.site.register(DeviceStream)
+admin.site.register(HeartBeatBlock)
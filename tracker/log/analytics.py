@@ -0,0 +1,168 @@
+import math
+
+import numpy as np
+import pandas as pd
+from django.utils import timezone
+
+from .models import Behavior, HeartBeat, Sleep, VitalRollup
+from . import blocks
+from .rollups import ROLLUP_METRICS, bucket_start
+
+PERCENTILES = (5, 25, 50, 75, 95)
+DEFAULT_ROLLING_DAYS = 7
+MIN_CORRELATION_DAYS = 3
+
+# Free-text moods and energy levels mapped onto a numeric scale for the
+# sleep correlations; values that are not listed are left out.
+MOOD_SCORES = {
+    'very happy': 2, 'excited': 2, 'joyful': 2,
+    'happy': 1, 'good': 1, 'calm': 1, 'content': 1, 'relaxed': 1,
+    'neutral': 0, 'okay': 0, 'ok': 0, 'fine': 0, 'tired': 0,
+    'sad': -1, 'anxious': -1, 'irritable': -1, 'frustrated': -1, 'grumpy': -1,
+    'very sad': -2, 'angry': -2, 'upset': -2, 'meltdown': -2,
+}
+ENERGY_SCORES = {
+    'very low': 1, 'low': 2, 'medium': 3, 'moderate': 3, 'normal': 3, 'high': 4, 'very high': 5,
+}
+
+
+def _number(value, digits=2):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return round(float(value), digits)
+
+
+def _values(series):
+    return [_number(value) for value in series]
+
+
+def distribution(child_id, since, until):
+    """
+    Count, mean, standard deviation and percentiles of every rolled-up metric,
+    from one values_list fetch per log type.
+    """
+    result = {}
+    for model, metrics in ROLLUP_METRICS.items():
+        fields = [field for _, field in metrics]
+        rows = model.objects.filter(child_id=child_id, created_at__gte=since, created_at__lt=until).values_list(*fields)
+        values = np.array(list(rows), dtype=np.float64).reshape(-1, len(fields))
+        if model is HeartBeat:
+            compacted = blocks.block_values(blocks.blocks_in_range(since, until, child_id=child_id), since, until)
+            values = np.concatenate([values, compacted.reshape(-1, 1)])
+        for i, (metric, _) in enumerate(metrics):
+            column = values[:, i]
+            column = column[~np.isnan(column)]
+            if not len(column):
+                result[metric] = {'count': 0}
+                continue
+            result[metric] = {
+                'count': int(len(column)),
+                'mean': _number(column.mean()),
+                'std': _number(column.std()),
+                'percentiles': {f'p{p}': _number(v) for p, v in zip(PERCENTILES, np.percentile(column, PERCENTILES))},
+            }
+    return result
+
+
+def profiles(child_id, since, until, rolling_days=DEFAULT_ROLLING_DAYS):
+    """
+    Daily means with a rolling average, and hour-of-day and day-of-week
+    profiles (UTC), built from the hourly rollups rather than raw rows.
+    """
+    rows = VitalRollup.objects.filter(
+        child_id=child_id, granularity='hour',
+        bucket_start__gte=bucket_start(since, 'hour'), bucket_start__lt=until,
+    ).values_list('metric', 'bucket_start', 'count', 'total')
+    frame = pd.DataFrame(list(rows), columns=['metric', 'bucket_start', 'count', 'total'])
+    if frame.empty:
+        return {}
+
+    frame['bucket_start'] = pd.to_datetime(frame['bucket_start'], utc=True)
+    frame['day'] = frame['bucket_start'].dt.floor('D')
+    frame['hour'] = frame['bucket_start'].dt.hour
+    frame['weekday'] = frame['bucket_start'].dt.dayofweek
+
+    days = pd.date_range(
+        pd.Timestamp(since).tz_convert('UTC').floor('D'), pd.Timestamp(until).tz_convert('UTC').floor('D'), freq='D'
+    )
+    result = {}
+    for metric, group in frame.groupby('metric'):
+        # Rolling means are weighted by sample count: sum of totals over sum of counts
+        daily = group.groupby('day')[['count', 'total']].sum().reindex(days, fill_value=0)
+        rolling = daily.rolling(rolling_days, min_periods=1).sum()
+        daily_mean = (daily['total'] / daily['count']).where(daily['count'] > 0)
+        rolling_mean = (rolling['total'] / rolling['count']).where(rolling['count'] > 0)
+
+        by_hour = group.groupby('hour')[['count', 'total']].sum().reindex(range(24), fill_value=0)
+        by_weekday = group.groupby('weekday')[['count', 'total']].sum().reindex(range(7), fill_value=0)
+
+        result[metric] = {
+            'daily': [
+                {'date': day.date().isoformat(), 'mean': mean, 'rolling_mean': rolled}
+                for day, mean, rolled in zip(days, _values(daily_mean), _values(rolling_mean))
+            ],
+            'hour_of_day': _values((by_hour['total'] / by_hour['count']).where(by_hour['count'] > 0)),
+            'day_of_week': _values((by_weekday['total'] / by_weekday['count']).where(by_weekday['count'] > 0)),
+        }
+    return result
+
+
+def _correlation(x, y):
+    pairs = pd.concat([x, y], axis=1, join='inner').dropna()
+    if len(pairs) < MIN_CORRELATION_DAYS:
+        return {'days': int(len(pairs)), 'pearson': None, 'spearman': None}
+    a, b = pairs.iloc[:, 0], pairs.iloc[:, 1]
+    return {
+        'days': int(len(pairs)),
+        'pearson': _number(a.corr(b), 3),
+        # Pearson on ranks; Series.corr(method='spearman') would need scipy
+        'spearman': _number(a.rank().corr(b.rank()), 3),
+    }
+
+
+def sleep_mood(child_id, since, until):
+    """
+    Correlate total sleep per day with that day's and the next day's mean mood
+    and energy scores.
+    """
+    sleeps = pd.DataFrame(
+        list(Sleep.objects.filter(child_id=child_id, created_at__gte=since, created_at__lt=until)
+             .values_list('created_at', 'hours')),
+        columns=['created_at', 'hours'],
+    )
+    behaviors = pd.DataFrame(
+        list(Behavior.objects.filter(child_id=child_id, created_at__gte=since, created_at__lt=until)
+             .values_list('created_at', 'mood', 'energy_level')),
+        columns=['created_at', 'mood', 'energy_level'],
+    )
+
+    moods = behaviors['mood'].str.strip().str.lower()
+    behaviors['mood_score'] = moods.map(MOOD_SCORES)
+    behaviors['energy_score'] = behaviors['energy_level'].str.strip().str.lower().map(ENERGY_SCORES)
+    unscored = sorted(moods[behaviors['mood_score'].isna()].unique())
+
+    sleep_by_day = sleeps.groupby(pd.to_datetime(sleeps['created_at'], utc=True).dt.floor('D'))['hours'].sum()
+    scores_by_day = behaviors.groupby(pd.to_datetime(behaviors['created_at'], utc=True).dt.floor('D'))[
+        ['mood_score', 'energy_score']
+    ].mean()
+    next_day = scores_by_day.set_axis(scores_by_day.index - pd.Timedelta(days=1))
+
+    return {
+        'same_day_mood': _correlation(sleep_by_day, scores_by_day['mood_score']),
+        'next_day_mood': _correlation(sleep_by_day, next_day['mood_score']),
+        'same_day_energy': _correlation(sleep_by_day, scores_by_day['energy_score']),
+        'unscored_moods': unscored,
+    }
+
+
+def child_statistics(child_id, window, rolling_days=DEFAULT_ROLLING_DAYS):
+    until = timezone.now()
+    since = until - window
+    return {
+        'child': child_id,
+        'window': {'since': since, 'until': until},
+        'rolling_days': rolling_days,
+        'distribution': distribution(child_id, since, until),
+        'profiles': profiles(child_id, since, until, rolling_days),
+        'sleep_vs_mood': sleep_mood(child_id, since, until),
+    }
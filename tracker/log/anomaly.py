@@ -0,0 +1,237 @@
+import math
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import ChildProfile
+
+from .models import HeartBeat, BloodPressure, VitalBaseline, VitalAnomaly
+from .rollups import ROLLUP_METRICS
+from . import blocks
+
+# Vitals that are checked: model -> [(metric, field)]
+ANOMALY_METRICS = {
+    HeartBeat: ROLLUP_METRICS[HeartBeat],
+    BloodPressure: ROLLUP_METRICS[BloodPressure],
+}
+
+# (age in years below which the band applies, {metric: (low, high)}).
+# Deliberately wider than textbook normal ranges: these flag readings that are
+# implausible or need attention whatever the child's own baseline looks like.
+AGE_RANGES = [
+    (1, {'heartbeat_bpm': (90, 180), 'bloodpressure_systolic': (65, 115), 'bloodpressure_dystolic': (35, 70)}),
+    (3, {'heartbeat_bpm': (80, 150), 'bloodpressure_systolic': (80, 115), 'bloodpressure_dystolic': (40, 75)}),
+    (6, {'heartbeat_bpm': (70, 140), 'bloodpressure_systolic': (85, 120), 'bloodpressure_dystolic': (45, 80)}),
+    (12, {'heartbeat_bpm': (60, 125), 'bloodpressure_systolic': (90, 125), 'bloodpressure_dystolic': (50, 85)}),
+    (None, {'heartbeat_bpm': (50, 110), 'bloodpressure_systolic': (95, 140), 'bloodpressure_dystolic': (55, 90)}),
+]
+
+DETECTION_DEFAULTS = {
+    'ALPHA': 0.1,
+    'Z_THRESHOLD': 3.5,
+    'WARMUP': 20,
+}
+
+
+def detection_settings():
+    return {**DETECTION_DEFAULTS, **getattr(settings, 'ANOMALY_DETECTION', {})}
+
+
+def age_in_years(date_of_birth, at):
+    return (at.date() - date_of_birth).days / 365.25
+
+
+def normal_range(metric, age):
+    for max_age, ranges in AGE_RANGES:
+        if max_age is None or age < max_age:
+            return ranges[metric]
+
+
+def update_baseline(baseline, value, alpha):
+    """
+    Fold one sample into an EWMA mean and variance in O(1).
+    """
+    if baseline.samples == 0:
+        baseline.mean = value
+        baseline.variance = 0.0
+    else:
+        diff = value - baseline.mean
+        incr = alpha * diff
+        baseline.mean += incr
+        baseline.variance = (1 - alpha) * (baseline.variance + diff * incr)
+    baseline.samples += 1
+
+
+def check_reading(baseline, metric, value, age, z_threshold, warmup):
+    """
+    Return (reason, z_score) for an anomalous value, or None. The value is
+    compared with the baseline as it was before the value is folded in.
+    """
+    z_score = None
+    if baseline.samples >= warmup and baseline.variance > 0:
+        z_score = (value - baseline.mean) / math.sqrt(baseline.variance)
+
+    low, high = normal_range(metric, age)
+    if value < low or value > high:
+        return 'out_of_range', z_score
+    if z_score is not None and abs(z_score) > z_threshold:
+        return 'deviation', z_score
+    return None
+
+
+def evaluate(model, instances):
+    """
+    Check newly created readings against their child's baseline and update it.
+
+    Baselines for the whole batch are read and written in one query each, so
+    the cost per reading is constant whatever the length of the history.
+    Returns the VitalAnomaly rows that were created.
+    """
+    metrics = ANOMALY_METRICS.get(model)
+    if not metrics or not instances:
+        return []
+    config = detection_settings()
+
+    instances = sorted(instances, key=lambda instance: (instance.created_at, instance.pk))
+    child_ids = {instance.child_id for instance in instances}
+    birth_dates = dict(ChildProfile.objects.filter(id__in=child_ids).values_list('id', 'date_of_birth'))
+    names = [metric for metric, _ in metrics]
+
+    anomalies = []
+    with transaction.atomic():
+        VitalBaseline.objects.bulk_create(
+            [VitalBaseline(child_id=child_id, metric=metric) for child_id in child_ids for metric in names],
+            ignore_conflicts=True,
+        )
+        baselines = {
+            (baseline.child_id, baseline.metric): baseline
+            for baseline in VitalBaseline.objects.select_for_update().filter(child_id__in=child_ids, metric__in=names)
+        }
+
+        for instance in instances:
+            age = age_in_years(birth_dates[instance.child_id], instance.created_at)
+            for metric, field in metrics:
+                value = getattr(instance, field)
+                if value is None:
+                    continue
+                value = float(value)
+                baseline = baselines[(instance.child_id, metric)]
+                result = check_reading(baseline, metric, value, age, config['Z_THRESHOLD'], config['WARMUP'])
+                if result is not None:
+                    reason, z_score = result
+                    anomalies.append(VitalAnomaly(
+                        child_id=instance.child_id,
+                        metric=metric,
+                        reason=reason,
+                        value=value,
+                        baseline_mean=baseline.mean if baseline.samples else None,
+                        z_score=z_score,
+                        reading_id=instance.pk,
+                        reading_at=instance.created_at,
+                    ))
+                    if reason == 'out_of_range':
+                        # Keep implausible values from inflating the baseline
+                        continue
+                update_baseline(baseline, value, config['ALPHA'])
+
+        now = timezone.now()  # bulk_update skips auto_now
+        for baseline in baselines.values():
+            baseline.updated_at = now
+        VitalBaseline.objects.bulk_update(baselines.values(), ['samples', 'mean', 'variance', 'updated_at'])
+        if anomalies:
+            VitalAnomaly.objects.bulk_create(anomalies)
+    return anomalies
+
+
+def replay(model, child_ids=None, since=None, until=None, alpha=None, z_threshold=None, warmup=None):
+    """
+    Run the detector over stored readings without writing anything.
+
+    The EWMA recursion is computed with pandas per child and metric, so
+    thresholds can be tuned against months of history in seconds. Baselines
+    start empty, as they would for a new child. Returns a DataFrame with one
+    row per anomaly (child_id, metric, reason, value, z_score, reading_id,
+    reading_at) and the final baselines as {(child_id, metric): (samples, mean, variance)}.
+    """
+    config = detection_settings()
+    alpha = config['ALPHA'] if alpha is None else alpha
+    z_threshold = config['Z_THRESHOLD'] if z_threshold is None else z_threshold
+    warmup = config['WARMUP'] if warmup is None else warmup
+    metrics = ANOMALY_METRICS[model]
+
+    queryset = model.objects.all()
+    if child_ids is not None:
+        queryset = queryset.filter(child_id__in=child_ids)
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    rows = list(
+        queryset.order_by('child_id', 'created_at', 'id')
+        .values_list('id', 'child_id', 'created_at', 'child__date_of_birth', *[field for _, field in metrics])
+    )
+    if model is HeartBeat:
+        # Include samples compacted into blocks
+        block_filter = {'child_id__in': child_ids} if child_ids is not None else {}
+        block_queryset = blocks.blocks_in_range(since, until, **block_filter)
+        birth_dates = dict(
+            ChildProfile.objects.filter(id__in=block_queryset.values('child_id')).values_list('id', 'date_of_birth')
+        )
+        rows.extend(
+            (pk, child_id, created_at, birth_dates[child_id], bpm)
+            for pk, child_id, created_at, bpm in blocks.iter_samples(block_queryset, since, until)
+        )
+        rows.sort(key=lambda row: (row[1], row[2], row[0]))
+    columns = ['reading_id', 'child_id', 'reading_at', 'date_of_birth'] + [metric for metric, _ in metrics]
+    frame = pd.DataFrame(rows, columns=columns)
+
+    results, baselines = [], {}
+    if frame.empty:
+        return pd.DataFrame(columns=['child_id', 'metric', 'reason', 'value', 'z_score', 'reading_id', 'reading_at']), baselines
+
+    reading_days = pd.to_datetime(frame['reading_at'], utc=True).dt.tz_localize(None).dt.normalize()
+    ages = (reading_days - pd.to_datetime(frame['date_of_birth'])).dt.days.to_numpy() / 365.25
+
+    for metric, _ in metrics:
+        values = frame[metric].astype(float)
+        low = np.select([ages < max_age for max_age, _ in AGE_RANGES[:-1]],
+                        [ranges[metric][0] for _, ranges in AGE_RANGES[:-1]], AGE_RANGES[-1][1][metric][0])
+        high = np.select([ages < max_age for max_age, _ in AGE_RANGES[:-1]],
+                         [ranges[metric][1] for _, ranges in AGE_RANGES[:-1]], AGE_RANGES[-1][1][metric][1])
+        out_of_range = (values < low) | (values > high)
+
+        # Out-of-range readings are left out of the baseline, as in evaluate()
+        kept = values.where(~out_of_range)
+        grouped = kept.groupby(frame['child_id'])
+        mean = grouped.transform(lambda s: s.ewm(alpha=alpha, adjust=False, ignore_na=True).mean())
+        variance = grouped.transform(lambda s: s.ewm(alpha=alpha, adjust=False, ignore_na=True).var(bias=True))
+        mean = mean.groupby(frame['child_id']).ffill()
+        variance = variance.groupby(frame['child_id']).ffill()
+        samples = kept.notna().astype(int).groupby(frame['child_id']).cumsum()
+
+        # Compare each reading with the state before it
+        previous_mean = mean.groupby(frame['child_id']).shift(1)
+        previous_variance = variance.groupby(frame['child_id']).shift(1)
+        previous_samples = samples - kept.notna().astype(int)
+        scorable = (previous_samples >= warmup) & (previous_variance > 0)
+        z_scores = ((values - previous_mean) / np.sqrt(previous_variance)).where(scorable)
+        deviation = ~out_of_range & (z_scores.abs() > z_threshold)
+
+        flagged = frame.loc[out_of_range | deviation, ['child_id', 'reading_id', 'reading_at']].copy()
+        flagged['metric'] = metric
+        flagged['reason'] = np.where(out_of_range[flagged.index], 'out_of_range', 'deviation')
+        flagged['value'] = values[flagged.index]
+        flagged['z_score'] = z_scores[flagged.index]
+        results.append(flagged)
+
+        last = frame.index.to_series().groupby(frame['child_id']).last()
+        for child_id, index in last.items():
+            if samples[index]:
+                baselines[(child_id, metric)] = (int(samples[index]), float(mean[index]), float(variance[index]))
+
+    anomalies = pd.concat(results, ignore_index=True)
+    anomalies = anomalies[['child_id', 'metric', 'reason', 'value', 'z_score', 'reading_id', 'reading_at']]
+    return anomalies.sort_values(['child_id', 'reading_at', 'reading_id'], ignore_index=True), baselines
@@ -0,0 +1,279 @@
+"""
+Compact storage for dense HeartBeat series.
+
+``compact`` folds raw rows older than a cutoff into one HeartBeatBlock per
+child-hour and deletes them. A block stores three little-endian arrays, each
+delta-encoded and then zlib-compressed together:
+
+- ids: difference to the previous id (first one absolute),
+- timestamps: microseconds since the previous sample (first one since
+  ``start_at``) minus the block's median ``interval_us``, so a regular
+  series is almost all zeros,
+- bpm: difference to the previous value (first one absolute).
+
+Raw rows are stamped when they are inserted and compaction only takes hours
+before its cutoff, so for any child every block sample is older than every
+raw row. The read helpers below merge both so callers see plain rows.
+"""
+
+import heapq
+import zlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import TruncHour
+
+from .models import HeartBeat, HeartBeatBlock
+from .pagination import decode_cursor, encode_cursor
+
+ENCODING = 1
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+HOUR = timedelta(hours=1)
+
+
+def _to_us(value):
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _from_us(value):
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+def encode(ids, times_us, values):
+    """
+    Encode sorted samples; returns (data, interval_us).
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    times_us = np.asarray(times_us, dtype=np.int64)
+    values = np.asarray(values, dtype=np.int64)
+
+    gaps = np.diff(times_us)
+    interval = int(np.median(gaps)) if len(gaps) else 0
+    residuals = np.concatenate([[0], gaps - interval])
+    payload = b''.join([
+        np.diff(ids, prepend=0).astype('<i8').tobytes(),
+        residuals.astype('<i8').tobytes(),
+        np.diff(values, prepend=0).astype('<i4').tobytes(),
+    ])
+    return zlib.compress(payload, 9), interval
+
+
+def decode(block):
+    """
+    Return (ids, times_us, values) arrays of a block, oldest first.
+    """
+    raw = zlib.decompress(bytes(block.data))
+    n = block.count
+    ids = np.cumsum(np.frombuffer(raw, dtype='<i8', count=n, offset=0))
+    residuals = np.frombuffer(raw, dtype='<i8', count=n, offset=8 * n)
+    gaps = residuals + block.interval_us
+    gaps[0] = 0
+    times_us = _to_us(block.start_at) + np.cumsum(gaps)
+    values = np.cumsum(np.frombuffer(raw, dtype='<i4', count=n, offset=16 * n).astype(np.int64))
+    return ids, times_us, values
+
+
+def _window_mask(times_us, since, until):
+    mask = np.ones(len(times_us), dtype=bool)
+    if since is not None:
+        mask &= times_us >= _to_us(since)
+    if until is not None:
+        mask &= times_us < _to_us(until)
+    return mask
+
+
+def block_samples(block, since=None, until=None):
+    """
+    (id, child_id, created_at, bpm) tuples of one block inside the window.
+    """
+    ids, times_us, values = decode(block)
+    mask = _window_mask(times_us, since, until)
+    return [
+        (int(pk), block.child_id, _from_us(t), int(bpm))
+        for pk, t, bpm in zip(ids[mask], times_us[mask], values[mask])
+    ]
+
+
+def block_values(blocks, since=None, until=None):
+    """
+    bpm values of the blocks inside the window as one NumPy array.
+    """
+    arrays = []
+    for block in blocks:
+        _, times_us, values = decode(block)
+        arrays.append(values[_window_mask(times_us, since, until)])
+    return np.concatenate(arrays).astype(np.float64) if arrays else np.empty(0)
+
+
+def blocks_in_range(since=None, until=None, **filters):
+    """
+    Blocks with samples that may fall in [since, until), filtered like HeartBeat
+    (e.g. ``child_id=`` or ``child__parent=``).
+    """
+    blocks = HeartBeatBlock.objects.filter(**filters)
+    if since is not None:
+        blocks = blocks.filter(end_at__gte=since)
+    if until is not None:
+        blocks = blocks.filter(start_at__lt=until)
+    return blocks
+
+
+def iter_samples(blocks, since=None, until=None):
+    """
+    Yield block samples ordered by (child_id, created_at, id).
+    """
+    for block in blocks.order_by('child_id', 'hour').iterator(chunk_size=100):
+        yield from block_samples(block, since, until)
+
+
+def merge_rows(raw_rows, blocks, since=None, until=None):
+    """
+    Merge raw ``(id, child_id, created_at, bpm)`` rows ordered by
+    (child_id, created_at, id) with the block samples of the same window.
+    """
+    return heapq.merge(
+        iter_samples(blocks, since, until), raw_rows,
+        key=lambda row: (row[1], row[2], row[0]),
+    )
+
+
+def keyset_page(queryset, blocks, cursor, page_size, since=None, until=None):
+    """
+    Newest-first page of HeartBeat instances from raw rows and blocks after
+    ``cursor``, like pagination.keyset_page. Block samples become unsaved
+    HeartBeat instances, which serialize like stored ones.
+    """
+    raw = queryset.order_by('-created_at', '-id')
+    before = None
+    if cursor:
+        before = decode_cursor(cursor)
+        raw = raw.filter(Q(created_at__lt=before[0]) | Q(created_at=before[0], id__lt=before[1]))
+        blocks = blocks.filter(start_at__lte=before[0])
+    rows = list(raw[:page_size + 1])
+
+    # Blocks hold older hours, so they are only read once raw rows run out
+    if len(rows) <= page_size:
+        wanted = page_size + 1 - len(rows)
+        samples = []
+        for block in blocks.order_by('-end_at').iterator(chunk_size=10):
+            if len(samples) >= wanted and block.end_at < samples[wanted - 1][2]:
+                break
+            new = block_samples(block, since, until)
+            if before is not None:
+                new = [sample for sample in new if (sample[2], sample[0]) < before]
+            samples = sorted(samples + new, key=lambda sample: (sample[2], sample[0]), reverse=True)[:wanted]
+        rows.extend(
+            HeartBeat(id=pk, child_id=child_id, created_at=created_at, bpm=bpm)
+            for pk, child_id, created_at, bpm in samples
+        )
+        rows.sort(key=lambda row: (row.created_at, row.pk), reverse=True)
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].pk)
+    return rows, next_cursor
+
+
+def aggregate(blocks, since=None, until=None):
+    """
+    count/minimum/maximum/total/total_sq of the block samples in the window.
+    Blocks wholly inside it use their stored aggregates; edge blocks are decoded.
+    """
+    count, minimum, maximum, total, total_sq = 0, None, None, 0.0, 0.0
+    for block in blocks:
+        inside = (since is None or block.start_at >= since) and (until is None or block.end_at < until)
+        if inside:
+            n, lo, hi, s, sq = block.count, block.minimum, block.maximum, block.total, block.total_sq
+        else:
+            _, times_us, values = decode(block)
+            values = values[_window_mask(times_us, since, until)]
+            if not len(values):
+                continue
+            n, lo, hi = len(values), int(values.min()), int(values.max())
+            s, sq = float(values.sum()), float((values.astype(np.float64) ** 2).sum())
+        count += n
+        minimum = lo if minimum is None else min(minimum, lo)
+        maximum = hi if maximum is None else max(maximum, hi)
+        total += s
+        total_sq += sq
+    return {'count': count, 'minimum': minimum, 'maximum': maximum, 'total': total, 'total_sq': total_sq}
+
+
+def latest_sample(**filters):
+    """
+    The newest block sample as (id, child_id, created_at, bpm), or None.
+    """
+    block = HeartBeatBlock.objects.filter(**filters).order_by('-end_at').first()
+    return block_samples(block)[-1] if block else None
+
+
+def _build_block(child_id, hour, samples):
+    ids = [s[0] for s in samples]
+    times_us = [_to_us(s[1]) for s in samples]
+    values = np.array([s[2] for s in samples], dtype=np.int64)
+    data, interval = encode(ids, times_us, values)
+    return HeartBeatBlock(
+        child_id=child_id, hour=hour, start_at=samples[0][1], end_at=samples[-1][1],
+        interval_us=interval, count=len(samples), first_id=ids[0], last_id=ids[-1],
+        minimum=int(values.min()), maximum=int(values.max()),
+        total=float(values.sum()), total_sq=float((values.astype(np.float64) ** 2).sum()),
+        encoding=ENCODING, data=data,
+    )
+
+
+def _compact_hour(child_id, hour, samples):
+    existing = HeartBeatBlock.objects.filter(child_id=child_id, hour=hour).first()
+    if existing is not None:
+        # Late rows for an hour that is already compacted
+        samples = sorted(
+            [(pk, created_at, bpm) for pk, _, created_at, bpm in block_samples(existing)] + samples,
+            key=lambda s: (s[1], s[0]),
+        )
+    block = _build_block(child_id, hour, samples)
+
+    table = HeartBeat._meta.db_table
+    with transaction.atomic():
+        if existing is not None:
+            existing.delete()
+        block.save()
+        # Raw SQL on purpose: a queryset delete would send post_delete per
+        # row, and rollups, sync and live updates must not see these as deletes.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE child_id = %s AND created_at >= %s AND created_at < %s",
+                [child_id, connection.ops.adapt_datetimefield_value(hour),
+                 connection.ops.adapt_datetimefield_value(hour + HOUR)],
+            )
+    return block
+
+
+def compact(cutoff, child_id=None, dry_run=False):
+    """
+    Fold raw HeartBeat rows older than ``cutoff`` (truncated to the hour)
+    into blocks, one transaction per child-hour. Returns (rows, blocks, bytes).
+    """
+    cutoff = cutoff.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    rows = HeartBeat.objects.filter(created_at__lt=cutoff)
+    if child_id is not None:
+        rows = rows.filter(child_id=child_id)
+    # Listed up front, since the loop deletes the rows it has read
+    hours = list(
+        rows.annotate(hour=TruncHour('created_at', tzinfo=dt_timezone.utc))
+        .values_list('child_id', 'hour').distinct().order_by('child_id', 'hour')
+    )
+
+    compacted, blocks, size = 0, 0, 0
+    for child, hour in hours:
+        samples = list(
+            HeartBeat.objects.filter(child_id=child, created_at__gte=hour, created_at__lt=hour + HOUR)
+            .order_by('created_at', 'id').values_list('id', 'created_at', 'bpm')
+        )
+        if not samples:
+            continue
+        block = _build_block(child, hour, samples) if dry_run else _compact_hour(child, hour, samples)
+        compacted, blocks, size = compacted + len(samples), blocks + 1, size + len(block.data)
+    return compacted, blocks, size
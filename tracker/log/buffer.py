@@ -0,0 +1,225 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .ingest import bulk_insert
+from .models import HeartBeat
+
+logger = logging.getLogger(__name__)
+
+BUFFER_DEFAULTS = {
+    'ENABLED': False,
+    'MAX_ROWS': 500,           # flush as soon as this many rows are waiting
+    'FLUSH_INTERVAL_MS': 200,  # ... and at least this often
+    'MAX_QUEUE': 20000,        # rows accepted before producers get BufferFull
+    'ACK': 'enqueue',          # 'enqueue' or 'flush'
+    'ACK_TIMEOUT_S': 5,        # how long an ack-after-flush request waits
+}
+
+
+class BufferFull(Exception):
+    pass
+
+
+class WriteBehindBuffer:
+    """
+    In-process buffer that turns many small inserts into periodic bulk inserts.
+
+    Producers ``submit`` unsaved instances and get a Future that resolves to
+    the saved rows once they are flushed; a background thread flushes every
+    ``flush_interval`` seconds or as soon as ``max_rows`` are waiting. The
+    queue is bounded: ``submit`` raises BufferFull instead of growing memory.
+
+    Rows still in the buffer when the process dies are lost, so callers that
+    need durability should wait on the Future before acknowledging. Note that
+    created_at is set at flush time, at most one flush interval late.
+    """
+
+    def __init__(self, model, max_rows, flush_interval, max_queue):
+        self.model = model
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+
+        self._pending = deque()  # (instance, future)
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+        self.flushed_rows = 0
+        self.flush_count = 0
+        self.failed_rows = 0
+        self.rejected_rows = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self):
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=f'{self.model.__name__}-write-behind', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=10):
+        """
+        Flush whatever is left and stop the flusher thread.
+        """
+        with self._condition:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self._condition.notify()
+            thread = self._thread
+        thread.join(timeout)
+        with self._condition:
+            self._thread = None
+
+    def submit(self, instances):
+        if not instances:
+            future = Future()
+            future.set_result([])
+            return future
+
+        future = Future()
+        with self._condition:
+            if len(self._pending) + len(instances) > self.max_queue:
+                self.rejected_rows += len(instances)
+                raise BufferFull(f"{len(self._pending)} rows already waiting")
+            for instance in instances:
+                self._pending.append((instance, future))
+            if len(self._pending) >= self.max_rows:
+                self._condition.notify()
+        return future
+
+    def metrics(self):
+        with self._condition:
+            depth = len(self._pending)
+        return {
+            'queue_depth': depth,
+            'queue_capacity': self.max_queue,
+            'flushed_rows': self.flushed_rows,
+            'flush_count': self.flush_count,
+            'failed_rows': self.failed_rows,
+            'rejected_rows': self.rejected_rows,
+            'last_flush_ms': self.last_flush_ms,
+            'avg_flush_ms': round(self._total_flush_ms / self.flush_count, 2) if self.flush_count else None,
+            'max_flush_ms': round(self.max_flush_ms, 2),
+        }
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._stopping and len(self._pending) < self.max_rows:
+                    self._condition.wait(self.flush_interval)
+                batch = list(self._pending)
+                self._pending.clear()
+                stopping = self._stopping
+            if batch:
+                self._flush(batch)
+            if stopping:
+                close_old_connections()
+                return
+
+    def _flush(self, batch):
+        start = time.perf_counter()
+        submits = {}  # future -> instances, one entry per submit() call
+        for instance, future in batch:
+            submits.setdefault(future, []).append(instance)
+
+        # Whole submits are grouped into chunks of about max_rows rows
+        chunks, chunk, size = [], [], 0
+        for future, instances in submits.items():
+            if chunk and size + len(instances) > self.max_rows:
+                chunks.append(chunk)
+                chunk, size = [], 0
+            chunk.append((future, instances))
+            size += len(instances)
+        if chunk:
+            chunks.append(chunk)
+
+        # Each chunk commits on its own, so one bad row (say, a reading for a
+        # child deleted while it was buffered) only fails the submits it was
+        # chunked with, and those are retried one by one
+        failed = {}  # future -> exception
+        close_old_connections()
+        for chunk in chunks:
+            try:
+                self._insert(chunk)
+                continue
+            except Exception as e:
+                if len(chunk) == 1:
+                    failed[chunk[0][0]] = e
+                    continue
+            for submit in chunk:
+                try:
+                    self._insert([submit])
+                except Exception as e:
+                    failed[submit[0]] = e
+
+        flushed = 0
+        for future, instances in submits.items():
+            if future in failed:
+                error = failed[future]
+                logger.error(f"Write-behind insert of {len(instances)} {self.model.__name__} rows failed: {error}")
+                self.failed_rows += len(instances)
+                future.set_exception(error)
+            else:
+                flushed += len(instances)
+                future.set_result(instances)
+
+        elapsed = (time.perf_counter() - start) * 1000
+        self.flushed_rows += flushed
+        self.flush_count += 1
+        self.last_flush_ms = round(elapsed, 2)
+        self.max_flush_ms = max(self.max_flush_ms, elapsed)
+        self._total_flush_ms += elapsed
+
+    def _insert(self, chunk):
+        # All or nothing: a failed submit leaves no rows behind for client
+        # retries to duplicate
+        objs = [instance for _, instances in chunk for instance in instances]
+        try:
+            with transaction.atomic():
+                bulk_insert(self.model, objs)
+        except Exception:
+            # bulk_create may have set keys that were then rolled back
+            for instance in objs:
+                instance.pk = None
+            raise
+
+
+def buffer_settings():
+    return {**BUFFER_DEFAULTS, **getattr(settings, 'HEARTBEAT_BUFFER', {})}
+
+
+_heartbeat_buffer = None
+_heartbeat_buffer_lock = threading.Lock()
+
+
+def get_heartbeat_buffer():
+    """
+    Process-wide HeartBeat buffer, started on first use. None when disabled.
+    """
+    global _heartbeat_buffer
+    config = buffer_settings()
+    if not config['ENABLED']:
+        return None
+    with _heartbeat_buffer_lock:
+        if _heartbeat_buffer is None:
+            _heartbeat_buffer = WriteBehindBuffer(
+                HeartBeat,
+                max_rows=config['MAX_ROWS'],
+                flush_interval=config['FLUSH_INTERVAL_MS'] / 1000,
+                max_queue=config['MAX_QUEUE'],
+            )
+            _heartbeat_buffer.start()
+    return _heartbeat_buffer
@@ -0,0 +1,88 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.models import ChildProfile
+
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+# Responses cached through this module, each with its own hit/miss counters
+NAMESPACES = ('dashboard', 'stats', 'caseload')
+
+
+def _stats_keys(namespace):
+    return {name: f'{namespace}:stats:{name}' for name in ('hits', 'misses')}
+
+
+def _version_key(child_id):
+    return f'dashboard:child:{child_id}:version'
+
+
+def invalidate_children(child_ids):
+    """
+    Bump the cache version of each child, orphaning every cached dashboard
+    that includes it. Old entries simply expire.
+    """
+    for child_id in set(child_ids):
+        _incr(_version_key(child_id))
+
+
+def cache_key(request, namespace='dashboard', child_ids=None):
+    """
+    Key for one user's response, derived from the query string and the
+    current versions of every child the response can include (by default
+    ?child= or all of the user's own children).
+    """
+    child_id = request.query_params.get('child')
+    if child_ids is not None:
+        child_ids = list(child_ids)
+    elif child_id:
+        child_ids = [child_id]
+    else:
+        child_ids = list(ChildProfile.objects.filter(parent=request.user).values_list('id', flat=True))
+
+    versions = cache.get_many([_version_key(c) for c in child_ids])
+    version = ','.join(f'{c}:{versions.get(_version_key(c), 0)}' for c in sorted(map(str, child_ids)))
+    params = '&'.join(f'{k}={v}' for k, v in sorted(request.query_params.items()))
+    digest = hashlib.sha1(f'{params}|{version}'.encode()).hexdigest()
+    return f'{namespace}:{request.user.id}:{child_id or "all"}:{digest}'
+
+
+def get(key, namespace='dashboard'):
+    """
+    Return the cached (etag, data) pair for the key, counting hits and misses
+    of the namespace.
+    """
+    entry = cache.get(key)
+    _incr(_stats_keys(namespace)['hits' if entry is not None else 'misses'])
+    return entry
+
+
+def store(key, data):
+    """
+    Cache JSON-ready data with a strong ETag and return the (etag, data) pair.
+    """
+    body = json.dumps(data, cls=JSONEncoder, sort_keys=True)
+    entry = (f'"{hashlib.sha1(body.encode()).hexdigest()}"', json.loads(body))
+    cache.set(key, entry, timeout=DASHBOARD_CACHE_TIMEOUT)
+    return entry
+
+
+def stats(namespace='dashboard'):
+    keys = _stats_keys(namespace)
+    values = cache.get_many(keys.values())
+    counters = {name: values.get(key, 0) for name, key in keys.items()}
+    total = counters['hits'] + counters['misses']
+    counters['hit_ratio'] = round(counters['hits'] / total, 4) if total else None
+    return counters
+
+
+def _incr(key):
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
@@ -0,0 +1,102 @@
+from django.db import models
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: only needed for columnar exports
+    pa = pq = None
+
+from .export import EXPORT_FIELDS
+from .models import LOG_MODELS, HeartBeat
+from . import blocks
+
+COLUMNAR_FORMATS = {
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('.arrow', 'application/vnd.apache.arrow.file'),
+}
+BATCH_ROWS = 50000
+
+
+class ColumnarUnavailable(Exception):
+    pass
+
+
+def _arrow_type(field):
+    if isinstance(field, (models.ForeignKey, models.BigIntegerField)):
+        return pa.int64()
+    if isinstance(field, models.IntegerField):
+        return pa.int32()
+    if isinstance(field, models.FloatField):
+        return pa.float64()
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp('us', tz='UTC')
+    return pa.string()
+
+
+def table_schema(log_type):
+    """
+    Arrow schema of a log table: id, child_id, created_at and its value columns.
+    """
+    model = LOG_MODELS[log_type]
+    names = ['id', 'child', 'created_at'] + EXPORT_FIELDS[log_type]
+    return pa.schema([
+        pa.field('child_id' if name == 'child' else name, _arrow_type(model._meta.get_field(name)))
+        for name in names
+    ])
+
+
+def write_table(log_type, sink, export_format, child_ids=None, since=None, until=None, batch_rows=BATCH_ROWS):
+    """
+    Write one log table to ``sink`` (path or binary file) as Parquet or Arrow IPC.
+
+    Rows are streamed from a server-side cursor and written as record batches
+    of ``batch_rows``, so memory is bounded by one batch. Returns the row count.
+    """
+    if pa is None:
+        raise ColumnarUnavailable("pyarrow is not installed")
+
+    schema = table_schema(log_type)
+    queryset = LOG_MODELS[log_type].objects.all()
+    if child_ids is not None:
+        queryset = queryset.filter(child_id__in=child_ids)
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    rows = (
+        queryset.order_by('child_id', 'created_at', 'id')
+        .values_list('id', 'child_id', 'created_at', *EXPORT_FIELDS[log_type])
+        .iterator(chunk_size=min(batch_rows, 10000))
+    )
+    if LOG_MODELS[log_type] is HeartBeat:
+        block_filter = {'child_id__in': child_ids} if child_ids is not None else {}
+        rows = blocks.merge_rows(rows, blocks.blocks_in_range(since, until, **block_filter), since, until)
+
+    if export_format == 'parquet':
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_file(sink, schema)
+
+    total = 0
+    try:
+        columns = [[] for _ in schema]
+        for row in rows:
+            for column, value in zip(columns, row):
+                column.append(value)
+            if len(columns[0]) >= batch_rows:
+                total += _write_batch(writer, schema, columns)
+                columns = [[] for _ in schema]
+        if columns[0] or total == 0:
+            total += _write_batch(writer, schema, columns)
+    finally:
+        writer.close()
+    return total
+
+
+def _write_batch(writer, schema, columns):
+    batch = pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema,
+    )
+    writer.write_batch(batch)
+    return batch.num_rows
@@ -0,0 +1,200 @@
+import re
+from datetime import timedelta
+
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import HeartBeat, Behavior, Food, Sleep, BloodPressure, ScratchNotes, VitalRollup, VitalAnomaly
+from . import blocks
+from .rollups import bucket_start
+
+WINDOW_PATTERN = re.compile(r'^(\d+)([hdw])$')
+WINDOW_UNITS = {'h': 'hours', 'd': 'days', 'w': 'weeks'}
+MAX_WINDOW = timedelta(days=366)
+
+# Numeric fields summarised per dashboard section
+NUMERIC_SECTIONS = {
+    'heartbeats': (HeartBeat, ['bpm']),
+    'bloodpressures': (BloodPressure, ['systolic', 'dystolic']),
+    'sleeps': (Sleep, ['hours']),
+    'foods': (Food, ['calories']),
+}
+
+# Relative change between the two halves of the window reported as a trend
+TREND_THRESHOLD = 0.05
+
+
+def parse_window(value):
+    """
+    Parse a window such as ``24h``, ``7d`` or ``4w`` into a timedelta.
+    """
+    match = WINDOW_PATTERN.match(value or '')
+    if not match:
+        raise ValidationError({'window': "Use a number followed by h, d or w, e.g. '7d'."})
+    window = timedelta(**{WINDOW_UNITS[match.group(2)]: int(match.group(1))})
+    if not timedelta(0) < window <= MAX_WINDOW:
+        raise ValidationError({'window': 'Window must be between 1h and 366d.'})
+    return window
+
+
+def _trend(first, second):
+    if first is None or second is None:
+        return None
+    change = (second - first) / first if first else 0.0
+    if change > TREND_THRESHOLD:
+        direction = 'up'
+    elif change < -TREND_THRESHOLD:
+        direction = 'down'
+    else:
+        direction = 'flat'
+    return {'first_half_avg': round(first, 2), 'second_half_avg': round(second, 2), 'direction': direction}
+
+
+def _latest(queryset, fields):
+    return queryset.order_by('-created_at', '-id').values(*fields, 'created_at').first()
+
+
+def _merge_blocks(result, queryset_filter, since, midpoint, until, latest):
+    """
+    Fold HeartBeat samples compacted into blocks into the raw bpm aggregates.
+    Returns the latest reading, from the blocks if there is no raw one.
+    """
+    block_queryset = list(blocks.blocks_in_range(since, until, **queryset_filter))
+    if not block_queryset:
+        return latest
+    first = blocks.aggregate(block_queryset, since, midpoint)
+    second = blocks.aggregate(block_queryset, midpoint, until)
+
+    raw_count, raw_first = result['count'], result['first_count']
+    raw_second = raw_count - raw_first
+
+    def weighted(raw_avg, raw_n, *parts):
+        n = raw_n + sum(part['count'] for part in parts)
+        if not n:
+            return None
+        return ((raw_avg or 0) * raw_n + sum(part['total'] for part in parts)) / n
+
+    result['bpm_avg'] = weighted(result['bpm_avg'], raw_count, first, second)
+    result['bpm_first_avg'] = weighted(result['bpm_first_avg'], raw_first, first)
+    result['bpm_second_avg'] = weighted(result['bpm_second_avg'], raw_second, second)
+    for key, pick, part_key in (('bpm_min', min, 'minimum'), ('bpm_max', max, 'maximum')):
+        values = [v for v in (result[key], first[part_key], second[part_key]) if v is not None]
+        result[key] = pick(values) if values else None
+    result['count'] = raw_count + first['count'] + second['count']
+
+    if latest is None:
+        newest = max(block_queryset, key=lambda block: block.end_at)
+        samples = blocks.block_samples(newest, since, until)
+        if samples:
+            latest = {'bpm': samples[-1][3], 'created_at': samples[-1][2]}
+    return latest
+
+
+def summarize(queryset_filter, window):
+    """
+    Build per-type aggregates over the window with one aggregate query per log type.
+    """
+    until = timezone.now()
+    since = until - window
+    midpoint = since + window / 2
+    time_filter = dict(queryset_filter, created_at__gte=since)
+
+    summary = {'window': {'since': since, 'until': until}}
+
+    for section, (model, fields) in NUMERIC_SECTIONS.items():
+        queryset = model.objects.filter(**time_filter)
+        aggregates = {'count': Count('id')}
+        for field in fields:
+            aggregates[f'{field}_avg'] = Avg(field)
+            aggregates[f'{field}_min'] = Min(field)
+            aggregates[f'{field}_max'] = Max(field)
+            aggregates[f'{field}_first_avg'] = Avg(field, filter=Q(created_at__lt=midpoint))
+            aggregates[f'{field}_second_avg'] = Avg(field, filter=Q(created_at__gte=midpoint))
+        if model is HeartBeat:
+            aggregates['first_count'] = Count('id', filter=Q(created_at__lt=midpoint))
+        result = queryset.aggregate(**aggregates)
+
+        latest = _latest(queryset, fields)
+        if model is HeartBeat:
+            latest = _merge_blocks(result, queryset_filter, since, midpoint, until, latest)
+
+        data = {'count': result['count'], 'latest': latest}
+        for field in fields:
+            avg = result[f'{field}_avg']
+            data[field] = {
+                'avg': round(avg, 2) if avg is not None else None,
+                'min': result[f'{field}_min'],
+                'max': result[f'{field}_max'],
+                'trend': _trend(result[f'{field}_first_avg'], result[f'{field}_second_avg']),
+            }
+        summary[section] = data
+
+    behaviors = Behavior.objects.filter(**time_filter)
+    summary['behaviors'] = {
+        'count': behaviors.count(),
+        'latest': _latest(behaviors, ['mood', 'energy_level']),
+        'moods': {
+            row['mood']: row['count']
+            for row in behaviors.values('mood').annotate(count=Count('id')).order_by('-count')
+        },
+    }
+
+    notes = ScratchNotes.objects.filter(**time_filter)
+    summary['scratchnotes'] = {
+        'count': notes.count(),
+        'latest': _latest(notes, ['text']),
+    }
+    return summary
+
+
+def caseload(child_ids, window):
+    """
+    Window aggregates of many children at once, for a therapist's caseload:
+    {'window': ..., 'children': {child_id: {'vitals': {metric: ...}, 'anomalies': ...}}}.
+
+    Vitals come from the hourly rollups (the window is widened to whole
+    hours), so this is two aggregate queries however many children there are.
+    """
+    until = timezone.now()
+    since = until - window
+    midpoint = since + window / 2
+    child_ids = list(child_ids)
+    result = {child_id: {'vitals': {}, 'anomalies': {'count': 0, 'last_at': None}} for child_id in child_ids}
+
+    rows = (
+        VitalRollup.objects.filter(
+            child_id__in=child_ids, granularity='hour',
+            bucket_start__gte=bucket_start(since, 'hour'), bucket_start__lt=until,
+        )
+        .values('child_id', 'metric')
+        .annotate(
+            samples=Sum('count'), low=Min('minimum'), high=Max('maximum'), sum_total=Sum('total'),
+            first_count=Sum('count', filter=Q(bucket_start__lt=midpoint)),
+            first_total=Sum('total', filter=Q(bucket_start__lt=midpoint)),
+        )
+        .order_by()
+    )
+    for row in rows:
+        if not row['samples']:
+            continue
+        first_count, first_total = row['first_count'] or 0, row['first_total'] or 0
+        second_count = row['samples'] - first_count
+        result[row['child_id']]['vitals'][row['metric']] = {
+            'count': row['samples'],
+            'avg': round(row['sum_total'] / row['samples'], 2),
+            'min': row['low'],
+            'max': row['high'],
+            'trend': _trend(
+                first_total / first_count if first_count else None,
+                (row['sum_total'] - first_total) / second_count if second_count else None,
+            ),
+        }
+
+    anomalies = (
+        VitalAnomaly.objects.filter(child_id__in=child_ids, created_at__gte=since)
+        .values('child_id').annotate(count=Count('id'), last_at=Max('created_at')).order_by()
+    )
+    for row in anomalies:
+        result[row['child_id']]['anomalies'] = {'count': row['count'], 'last_at': row['last_at']}
+    return {'window': {'since': since, 'until': until}, 'children': result}
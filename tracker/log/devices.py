@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import ChildProfile
+
+from .ingest import bulk_insert
+from .models import LOG_MODELS, DeviceStream
+from .serializers import BATCH_SERIALIZERS
+
+DEVICE_STREAM_DEFAULTS = {
+    'FLUSH_INTERVAL_MS': 1000,  # how often buffered frames are stored and acked
+    'MAX_PENDING': 1000,        # ... or as soon as this many are waiting
+}
+
+# Log type of a frame, recognised by its first value field
+FRAME_TYPES = {
+    'bpm': 'heartbeat',
+    'systolic': 'bloodpressure',
+}
+
+
+def stream_settings():
+    return {**DEVICE_STREAM_DEFAULTS, **getattr(settings, 'DEVICE_STREAM', {})}
+
+
+def open_stream(user, child_id, device_id):
+    """
+    Return the device's stream for one of the user's children, or None if
+    the child is not theirs. A known device keeps its sequence numbers.
+    """
+    if not ChildProfile.objects.filter(id=child_id, parent=user).exists():
+        return None
+    stream, created = DeviceStream.objects.get_or_create(
+        owner=user, device_id=device_id, defaults={'child_id': child_id},
+    )
+    if not created and stream.child_id != child_id:
+        stream.child_id = child_id
+        stream.save(update_fields=['child', 'updated_at'])
+    return stream
+
+
+def store_frames(stream, frames):
+    """
+    Validate a batch of frames and store the valid ones, then advance the
+    stream's acked sequence number in the same transaction.
+
+    A frame is ``{"seq": 12, "bpm": 92}`` or ``{"seq": 13, "systolic": 118,
+    "dystolic": 76}``. Frames are validated with the batch serializers and
+    written with one bulk insert per log type; invalid frames are acked too
+    (so they are not resent) and reported back. The stream row is locked and
+    frames at or below its stored sequence number are dropped, so a frame
+    resent on a second connection is never stored twice. Returns
+    (stored, rejected).
+    """
+    stored, rejected = 0, []
+    with transaction.atomic():
+        acked = DeviceStream.objects.select_for_update().values_list('last_acked_seq', flat=True).get(pk=stream.pk)
+        frames = [frame for frame in frames if frame['seq'] > acked]
+        if not frames:
+            stream.last_acked_seq = acked
+            return stored, rejected
+
+        pending = {}  # log type -> [instance]
+        for frame in frames:
+            log_type = next((FRAME_TYPES[key] for key in FRAME_TYPES if key in frame), None)
+            if log_type is None:
+                rejected.append({'seq': frame['seq'], 'errors': {'non_field_errors': ['Unknown frame.']}})
+                continue
+            serializer = BATCH_SERIALIZERS[log_type](data=frame)
+            if not serializer.is_valid():
+                rejected.append({'seq': frame['seq'], 'errors': serializer.errors})
+                continue
+            pending.setdefault(log_type, []).append(
+                LOG_MODELS[log_type](child_id=stream.child_id, **serializer.validated_data)
+            )
+
+        for log_type, instances in pending.items():
+            stored += len(bulk_insert(LOG_MODELS[log_type], instances))
+        last_seq = max(frame['seq'] for frame in frames)
+        DeviceStream.objects.filter(pk=stream.pk).update(
+            last_acked_seq=last_seq,
+            frames_stored=F('frames_stored') + stored,
+            frames_rejected=F('frames_rejected') + len(rejected),
+            updated_at=timezone.now(),  # update() skips auto_now
+        )
+    stream.last_acked_seq = last_seq
+    return stored, rejected
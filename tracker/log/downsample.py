@@ -0,0 +1,79 @@
+import numpy as np
+
+MAX_POINTS = 5000
+
+
+def lttb(x, y, n):
+    """
+    Largest-Triangle-Three-Buckets: indices of ``n`` points that keep the visual
+    shape of the series, peaks included.
+
+    The first and last points are always kept; every interior bucket keeps the
+    point forming the largest triangle with the previously kept point and the
+    mean of the next bucket. Areas within a bucket are computed with NumPy, so
+    the Python loop runs once per output point rather than per sample.
+    """
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+
+    edges = np.floor(np.linspace(1, size - 1, n - 1)).astype(np.int64)
+    selected = np.empty(n, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = size - 1
+
+    previous = 0
+    for i in range(n - 2):
+        start, end = edges[i], edges[i + 1]
+        if i < n - 3:
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = size - 1, size
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+
+def minmax(y, n):
+    """
+    Indices of the minimum and maximum of ``n // 2`` equal-count buckets.
+    """
+    size = len(y)
+    if n >= size or n < 2:
+        return np.arange(size)
+
+    edges = np.linspace(0, size, n // 2 + 1).astype(np.int64)
+    picked = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            bucket = y[start:end]
+            picked.append(start + int(np.argmin(bucket)))
+            picked.append(start + int(np.argmax(bucket)))
+    return np.unique(picked)
+
+
+METHODS = ('lttb', 'minmax')
+
+
+def downsample(rows, fields, n, method='lttb'):
+    """
+    Downsample ``(created_at, id, *fields)`` tuples, sorted by time, to about
+    ``n`` points per field. Indices kept for any field are kept for all fields,
+    so multi-valued readings (blood pressure) stay intact.
+    """
+    if len(rows) <= n:
+        return rows
+
+    x = np.fromiter((row[0].timestamp() for row in rows), dtype=np.float64, count=len(rows))
+    kept = []
+    for i in range(len(fields)):
+        y = np.fromiter((row[2 + i] for row in rows), dtype=np.float64, count=len(rows))
+        kept.append(minmax(y, n) if method == 'minmax' else lttb(x, y, n))
+    return [rows[i] for i in np.unique(np.concatenate(kept))]
@@ -0,0 +1,94 @@
+import csv
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import LOG_MODELS, HeartBeat
+from . import blocks
+from .serializers import BATCH_SERIALIZERS
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+CHUNK_SIZE = 2000
+
+# Value columns of each log type, in serializer order
+EXPORT_FIELDS = {
+    log_type: [field for field in serializer.Meta.fields if field not in ('id', 'child', 'created_at')]
+    for log_type, serializer in BATCH_SERIALIZERS.items()
+}
+
+CSV_COLUMNS = ['type', 'id', 'child', 'created_at'] + [
+    field for log_type in LOG_MODELS for field in EXPORT_FIELDS[log_type]
+]
+
+
+def iter_records(child_ids, types=None, since=None, until=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield every log record of the children as a flat dict, one type at a time.
+
+    Rows are read with ``.iterator(chunk_size=...)`` (a server-side cursor on
+    Postgres) so memory stays flat however long the history is.
+    """
+    for log_type, model in LOG_MODELS.items():
+        if types and log_type not in types:
+            continue
+        fields = EXPORT_FIELDS[log_type]
+        queryset = model.objects.filter(child_id__in=child_ids)
+        if since is not None:
+            queryset = queryset.filter(created_at__gte=since)
+        if until is not None:
+            queryset = queryset.filter(created_at__lt=until)
+        rows = (
+            queryset.order_by('child_id', 'created_at', 'id')
+            .values_list('id', 'child_id', 'created_at', *fields)
+            .iterator(chunk_size=chunk_size)
+        )
+        if model is HeartBeat:
+            rows = blocks.merge_rows(rows, blocks.blocks_in_range(since, until, child_id__in=child_ids), since, until)
+        for row in rows:
+            record = {'type': log_type, 'id': row[0], 'child': row[1], 'created_at': row[2]}
+            record.update(zip(fields, row[3:]))
+            yield record
+
+
+def ndjson_lines(records):
+    encoder = JSONEncoder()
+    for record in records:
+        yield encoder.encode(record) + '\n'
+
+
+class _Echo:
+    # File-like object that hands back what csv.writer writes to it
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.DictWriter(_Echo(), fieldnames=CSV_COLUMNS)
+    yield writer.writeheader()
+    for record in records:
+        record['created_at'] = record['created_at'].isoformat()
+        yield writer.writerow(record)
+
+
+def render(records, export_format, asynchronous=False):
+    """
+    Lines of the export. With ``asynchronous``, an async iterator of chunks
+    of ``CHUNK_SIZE`` lines: under ASGI, Django reads a sync iterator into a
+    list before sending anything, which would hold the whole export in memory.
+    """
+    lines = ndjson_lines(records) if export_format == 'ndjson' else csv_lines(records)
+    return _async_chunks(lines) if asynchronous else lines
+
+
+async def _async_chunks(lines, chunk_size=CHUNK_SIZE):
+    # The database cursor is read on the request's sync thread, a chunk at a time
+    next_chunk = sync_to_async(lambda: ''.join(islice(lines, chunk_size)), thread_sensitive=True)
+    try:
+        while True:
+            chunk = await next_chunk()
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        await sync_to_async(lines.close, thread_sensitive=True)()
@@ -0,0 +1,81 @@
+from django.db import transaction
+
+from core.models import ChildProfile
+from .models import LOG_MODELS
+from .serializers import BATCH_SERIALIZERS
+from .signals import logs_created
+
+MAX_BATCH_SIZE = 5000
+INSERT_BATCH_SIZE = 500
+
+
+def bulk_insert(model, objs, batch_size=INSERT_BATCH_SIZE):
+    """
+    Insert log rows with bulk_create and return them with primary keys set.
+
+    bulk_create does not send post_save, so ``logs_created`` is sent here to
+    keep rollups and other derived data in step.
+    """
+    if not objs:
+        return []
+    created = model.objects.bulk_create(objs, batch_size=batch_size)
+    logs_created.send(sender=model, instances=created)
+    return created
+
+
+def ingest_records(user, records, default_child=None):
+    """
+    Validate and store a batch of mixed log records for the user's children.
+
+    Each record is a dict with a ``type`` key (see ``LOG_MODELS``), an optional
+    ``child`` (falls back to ``default_child``) and the fields of that log type.
+    Child ownership is checked with a single query for the whole batch and rows
+    are written with one bulk insert per log type.
+
+    Returns one result per record, in input order, so clients can resend only
+    the records that failed.
+    """
+    results = [None] * len(records)
+
+    # Resolve every referenced child in one query
+    child_ids = set()
+    for record in records:
+        child_id = record.get('child', default_child) if isinstance(record, dict) else None
+        if child_id is not None:
+            child_ids.add(str(child_id))
+    children = {
+        str(child.id): child
+        for child in ChildProfile.objects.filter(id__in=[c for c in child_ids if c.isdigit()], parent=user)
+    }
+
+    pending = {}  # log type -> [(index, instance)]
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            results[index] = {'index': index, 'status': 'error', 'errors': {'non_field_errors': ['Expected an object.']}}
+            continue
+
+        log_type = record.get('type')
+        if log_type not in BATCH_SERIALIZERS:
+            results[index] = {'index': index, 'status': 'error', 'errors': {'type': [f"Unknown log type '{log_type}'."]}}
+            continue
+
+        child = children.get(str(record.get('child', default_child)))
+        if child is None:
+            results[index] = {'index': index, 'status': 'error', 'errors': {'child': ['Child not found.']}}
+            continue
+
+        serializer = BATCH_SERIALIZERS[log_type](data=record)
+        if not serializer.is_valid():
+            results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+            continue
+
+        instance = LOG_MODELS[log_type](child=child, **serializer.validated_data)
+        pending.setdefault(log_type, []).append((index, instance))
+
+    with transaction.atomic():
+        for log_type, items in pending.items():
+            created = bulk_insert(LOG_MODELS[log_type], [instance for _, instance in items])
+            for (index, _), instance in zip(items, created):
+                results[index] = {'index': index, 'status': 'created', 'type': log_type, 'id': instance.pk}
+
+    return results
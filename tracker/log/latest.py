@@ -0,0 +1,61 @@
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import HeartBeat, BloodPressure, Sleep, Behavior, Food, LatestVitals
+from . import blocks
+
+# model -> (timestamp column, {LatestVitals column: log field})
+LATEST_COLUMNS = {
+    HeartBeat: ('heartbeat_at', {'heartbeat_bpm': 'bpm'}),
+    BloodPressure: ('bloodpressure_at', {'systolic': 'systolic', 'dystolic': 'dystolic'}),
+    Sleep: ('sleep_at', {'sleep_hours': 'hours', 'sleep_quality': 'sleep_quality'}),
+    Behavior: ('behavior_at', {'mood': 'mood', 'energy_level': 'energy_level'}),
+    Food: ('food_at', {'food_type': 'food_type', 'calories': 'calories'}),
+}
+
+
+def apply_latest(model, instances):
+    """
+    Record the newest of the created rows per child, unless a newer reading is
+    already stored. The update is conditional, so out-of-order writes are safe.
+    """
+    if model not in LATEST_COLUMNS or not instances:
+        return
+    timestamp_column, columns = LATEST_COLUMNS[model]
+
+    newest = {}
+    for instance in instances:
+        current = newest.get(instance.child_id)
+        if current is None or (instance.created_at, instance.pk) > (current.created_at, current.pk):
+            newest[instance.child_id] = instance
+
+    with transaction.atomic():
+        for child_id, instance in newest.items():
+            LatestVitals.objects.get_or_create(child_id=child_id)
+            values = {column: getattr(instance, field) for column, field in columns.items()}
+            values[timestamp_column] = instance.created_at
+            values['updated_at'] = timezone.now()  # update() skips auto_now
+            LatestVitals.objects.filter(
+                Q(**{f'{timestamp_column}__isnull': True}) | Q(**{f'{timestamp_column}__lte': instance.created_at}),
+                child_id=child_id,
+            ).update(**values)
+
+
+def refresh_latest(model, child_id):
+    """
+    Recompute one vital of one child from raw rows, after an edit or delete.
+    """
+    if model not in LATEST_COLUMNS:
+        return
+    timestamp_column, columns = LATEST_COLUMNS[model]
+    row = model.objects.filter(child_id=child_id).order_by('-created_at', '-id').first()
+    if row is None and model is HeartBeat:
+        # Only compacted samples left
+        sample = blocks.latest_sample(child_id=child_id)
+        if sample is not None:
+            row = HeartBeat(id=sample[0], child_id=child_id, created_at=sample[2], bpm=sample[3])
+
+    values = {column: getattr(row, field) if row else None for column, field in columns.items()}
+    values[timestamp_column] = row.created_at if row else None
+    LatestVitals.objects.update_or_create(child_id=child_id, defaults=values)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.models import ChildProfile
+from log.latest import LATEST_COLUMNS, refresh_latest
+
+
+class Command(BaseCommand):
+    help = "Rebuild the latest-vitals table from raw log rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--child', type=int, help="Only rebuild this child id")
+
+    def handle(self, *args, **options):
+        children = ChildProfile.objects.all()
+        if options.get('child'):
+            children = children.filter(id=options['child'])
+
+        count = 0
+        for child_id in children.values_list('id', flat=True).iterator():
+            for model in LATEST_COLUMNS:
+                refresh_latest(model, child_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt latest vitals for {count} children"))
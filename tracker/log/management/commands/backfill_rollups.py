@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from log.rollups import backfill
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hourly and daily vital rollups from raw log history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--child', type=int, help="Only rebuild rollups for this child id")
+
+    def handle(self, *args, **options):
+        written = backfill(child_id=options.get('child'))
+        self.stdout.write(self.style.SUCCESS(f"✅ Wrote {written} rollup rows"))
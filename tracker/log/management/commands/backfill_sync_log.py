@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from core.models import ChildProfile
+from log.models import LOG_MODELS, SyncChange
+from log.sync import CHILD_RESOURCE
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = "Seed the sync change feed with an upsert for every existing child and log row."
+
+    def handle(self, *args, **options):
+        written = self._seed(
+            CHILD_RESOURCE,
+            ChildProfile.objects.order_by('id').values_list('id', 'parent_id', 'id'),
+        )
+        for resource, model in LOG_MODELS.items():
+            written += self._seed(
+                resource,
+                model.objects.order_by('id').values_list('id', 'child__parent_id', 'child_id'),
+            )
+        self.stdout.write(self.style.SUCCESS(f"✅ Recorded {written} sync changes"))
+
+    def _seed(self, resource, rows):
+        written = 0
+        batch = []
+        for object_id, parent_id, child_id in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(SyncChange(
+                parent_id=parent_id, child_id=child_id, resource=resource, object_id=object_id, op='upsert',
+            ))
+            if len(batch) >= BATCH_SIZE:
+                written += len(SyncChange.objects.bulk_create(batch))
+                batch = []
+        written += len(SyncChange.objects.bulk_create(batch))
+        return written
@@ -0,0 +1,56 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import ChildProfile
+from log.ingest import ingest_records
+from log.serializers import HeartBeatSerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare HeartBeat rows/sec for the per-row create path and the batch ingestion path. Nothing is persisted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--child', type=int, required=True, help="Child id to write the benchmark rows for")
+        parser.add_argument('--rows', type=int, default=2000, help="Number of rows per run")
+
+    def handle(self, *args, **options):
+        try:
+            child = ChildProfile.objects.select_related('parent').get(id=options['child'])
+        except ChildProfile.DoesNotExist:
+            raise CommandError(f"Child {options['child']} does not exist")
+
+        rows = options['rows']
+        records = [{'type': 'heartbeat', 'child': child.id, 'bpm': random.randint(60, 140)} for _ in range(rows)]
+
+        def per_row():
+            # Same work HeartBeatViewSet.create does for every POST, minus HTTP
+            for record in records:
+                serializer = HeartBeatSerializer(data=record)
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+
+        def batch():
+            ingest_records(child.parent, records)
+
+        for label, run in (('per-row', per_row), ('batch', batch)):
+            elapsed = self._timed(run)
+            self.stdout.write(f"{label:>8}: {rows} rows in {elapsed:.3f}s ({rows / elapsed:,.0f} rows/sec)")
+
+    def _timed(self, run):
+        # Run inside a transaction that is always rolled back
+        start = time.perf_counter()
+        try:
+            with transaction.atomic():
+                run()
+                elapsed = time.perf_counter() - start
+                raise _Rollback
+        except _Rollback:
+            pass
+        return elapsed
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from log.blocks import compact
+
+
+class Command(BaseCommand):
+    help = "Fold old raw HeartBeat rows into compressed per-hour blocks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=30, help="Compact rows older than this many days")
+        parser.add_argument('--child', type=int, help="Only compact this child id")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be compacted without writing")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        rows, blocks, size = compact(cutoff, child_id=options.get('child'), dry_run=options['dry_run'])
+        verb = "Would compact" if options['dry_run'] else "Compacted"
+        self.stdout.write(self.style.SUCCESS(f"✅ {verb} {rows} heartbeats into {blocks} blocks ({size} bytes)"))
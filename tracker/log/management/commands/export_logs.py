@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ChildProfile
+from log import export
+from log.pagination import time_bound_option
+
+
+class Command(BaseCommand):
+    help = "Stream the full log history of a child, or of all children of a parent, as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        scope = parser.add_mutually_exclusive_group(required=True)
+        scope.add_argument('--child', type=int, help="Child id to export")
+        scope.add_argument('--parent', type=int, help="Export every child of this parent user id")
+        parser.add_argument('--format', choices=export.EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--types', help="Comma separated log types, e.g. heartbeat,sleep")
+        parser.add_argument('--since', help="ISO date or datetime (inclusive)")
+        parser.add_argument('--until', help="ISO date or datetime (exclusive)")
+        parser.add_argument('--output', help="File to write to (default: stdout)")
+
+    def handle(self, *args, **options):
+        if options['child']:
+            children = ChildProfile.objects.filter(id=options['child'])
+        else:
+            children = ChildProfile.objects.filter(parent_id=options['parent'])
+        child_ids = list(children.values_list('id', flat=True))
+        if not child_ids:
+            raise CommandError("No matching children")
+
+        types = options['types'].split(',') if options['types'] else None
+        if types and any(log_type not in export.EXPORT_FIELDS for log_type in types):
+            raise CommandError(f"Unknown log type in --types, expected any of {', '.join(export.EXPORT_FIELDS)}")
+
+        records = export.iter_records(
+            child_ids,
+            types=types,
+            since=time_bound_option(options, 'since'),
+            until=time_bound_option(options, 'until'),
+        )
+
+        output = open(options['output'], 'w', newline='') if options['output'] else self.stdout
+        try:
+            for line in export.render(records, options['format']):
+                output.write(line)
+        finally:
+            if options['output']:
+                output.close()
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from log import partitions
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly partitions of the log tables and retire the ones past retention (Postgres only)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, help="Future months to keep partitions ready for")
+        parser.add_argument('--retention-months', type=int, help="Retire partitions entirely older than this many months")
+        parser.add_argument('--archive', choices=partitions.ARCHIVE_MODES,
+                            help="detach old partitions as plain tables, or drop them")
+        parser.add_argument('--dry-run', action='store_true', help="Only print what would change")
+
+    def handle(self, *args, **options):
+        if not partitions.supported():
+            self.stdout.write(self.style.WARNING("Log tables are only partitioned on PostgreSQL; nothing to do"))
+            return
+        try:
+            actions = partitions.maintain(
+                months_ahead=options['months_ahead'],
+                retention_months=options['retention_months'],
+                archive=options['archive'],
+                dry_run=options['dry_run'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        for table, action, name in actions:
+            self.stdout.write(f"{table}: {action} {name}")
+        verb = "Would apply" if options['dry_run'] else "Applied"
+        self.stdout.write(self.style.SUCCESS(f"✅ {verb} {len(actions)} partition changes"))
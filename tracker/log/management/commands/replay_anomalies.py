@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from log.anomaly import ANOMALY_METRICS, replay
+from log.models import VitalBaseline
+from log.pagination import time_bound_option
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the anomaly detector over stored heart rate and blood pressure "
+        "readings to tune thresholds. Nothing is written unless --save-baselines is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--child', type=int, action='append', help="Only replay this child id (repeatable)")
+        parser.add_argument('--since', help="ISO datetime or date (inclusive)")
+        parser.add_argument('--until', help="ISO datetime or date (exclusive)")
+        parser.add_argument('--alpha', type=float, help="EWMA smoothing factor (default: settings)")
+        parser.add_argument('--z-threshold', type=float, help="Flag deviations above this z-score (default: settings)")
+        parser.add_argument('--warmup', type=int, help="Readings needed before deviations are scored (default: settings)")
+        parser.add_argument('--show', type=int, default=0, help="Print this many flagged readings")
+        parser.add_argument(
+            '--save-baselines', action='store_true',
+            help="Replace the stored baselines with the replayed ones (e.g. after changing alpha)",
+        )
+
+    def handle(self, *args, **options):
+        since = time_bound_option(options, 'since')
+        until = time_bound_option(options, 'until')
+
+        total = 0
+        saved = []
+        for model in ANOMALY_METRICS:
+            anomalies, baselines = replay(
+                model, child_ids=options['child'], since=since, until=until,
+                alpha=options['alpha'], z_threshold=options['z_threshold'], warmup=options['warmup'],
+            )
+            total += len(anomalies)
+            for (metric, reason), count in anomalies.groupby(['metric', 'reason']).size().items():
+                self.stdout.write(f"{metric:<24} {reason:<13} {count}")
+            if options['show'] and not anomalies.empty:
+                self.stdout.write(anomalies.head(options['show']).to_string(index=False))
+            saved.extend(
+                VitalBaseline(child_id=child_id, metric=metric, samples=samples, mean=mean, variance=variance)
+                for (child_id, metric), (samples, mean, variance) in baselines.items()
+            )
+
+        if options['save_baselines']:
+            with transaction.atomic():
+                VitalBaseline.objects.filter(child_id__in={b.child_id for b in saved}).delete()
+                VitalBaseline.objects.bulk_create(saved)
+            self.stdout.write(f"Saved {len(saved)} baselines")
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Replay flagged {total} readings"))
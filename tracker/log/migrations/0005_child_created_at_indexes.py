@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('log', '0004_alter_heartbeat_child_alter_scratchnotes_child_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='behavior',
+            index=models.Index(fields=['child', 'created_at'], name='log_behavio_child_i_4cc51b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodpressure',
+            index=models.Index(fields=['child', 'created_at'], name='log_bloodpr_child_i_665f68_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['child', 'created_at'], name='log_food_child_i_4e6006_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='heartbeat',
+            index=models.Index(fields=['child', 'created_at'], name='log_heartbe_child_i_4a3f1f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scratchnotes',
+            index=models.Index(fields=['child', 'created_at'], name='log_scratch_child_i_17ca16_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sleep',
+            index=models.Index(fields=['child', 'created_at'], name='log_sleep_child_i_c8a318_idx'),
+        ),
+    ]
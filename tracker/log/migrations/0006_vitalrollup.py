@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('log', '0005_child_created_at_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VitalRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('heartbeat_bpm', 'Heart rate (bpm)'), ('bloodpressure_systolic', 'Systolic pressure'), ('bloodpressure_dystolic', 'Diastolic pressure'), ('sleep_hours', 'Sleep hours'), ('food_calories', 'Food calories')], max_length=32)),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('minimum', models.FloatField()),
+                ('maximum', models.FloatField()),
+                ('total', models.FloatField(default=0)),
+                ('total_sq', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vital_rollups', to='core.childprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['child', 'granularity', 'bucket_start'], name='log_vitalro_child_i_8f50d1_idx')],
+                'unique_together': {('child', 'metric', 'granularity', 'bucket_start')},
+            },
+        ),
+    ]
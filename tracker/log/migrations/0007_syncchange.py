@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('log', '0006_vitalrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parent_id', models.BigIntegerField()),
+                ('child_id', models.BigIntegerField()),
+                ('resource', models.CharField(max_length=32)),
+                ('object_id', models.BigIntegerField()),
+                ('op', models.CharField(choices=[('upsert', 'Created or updated'), ('delete', 'Deleted')], max_length=6)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['parent_id', 'id'], name='log_synccha_parent__192642_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_idempotencykey'),
+        ('log', '0007_syncchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestVitals',
+            fields=[
+                ('child', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_vitals', serialize=False, to='core.childprofile')),
+                ('heartbeat_bpm', models.IntegerField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('systolic', models.FloatField(blank=True, null=True)),
+                ('dystolic', models.FloatField(blank=True, null=True)),
+                ('bloodpressure_at', models.DateTimeField(blank=True, null=True)),
+                ('sleep_hours', models.FloatField(blank=True, null=True)),
+                ('sleep_quality', models.CharField(blank=True, max_length=100, null=True)),
+                ('sleep_at', models.DateTimeField(blank=True, null=True)),
+                ('mood', models.CharField(blank=True, max_length=100, null=True)),
+                ('energy_level', models.CharField(blank=True, max_length=100, null=True)),
+                ('behavior_at', models.DateTimeField(blank=True, null=True)),
+                ('food_type', models.CharField(blank=True, max_length=100, null=True)),
+                ('calories', models.FloatField(blank=True, null=True)),
+                ('food_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_idempotencykey'),
+        ('log', '0008_latestvitals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VitalAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=32)),
+                ('reason', models.CharField(choices=[('out_of_range', 'Outside the age-adjusted range'), ('deviation', 'Deviates from the child baseline')], max_length=16)),
+                ('value', models.FloatField()),
+                ('baseline_mean', models.FloatField(blank=True, null=True)),
+                ('z_score', models.FloatField(blank=True, null=True)),
+                ('reading_id', models.BigIntegerField()),
+                ('reading_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vital_anomalies', to='core.childprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['child', 'created_at'], name='log_vitalan_child_i_4e6d52_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VitalBaseline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=32)),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('variance', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vital_baselines', to='core.childprofile')),
+            ],
+            options={
+                'unique_together': {('child', 'metric')},
+            },
+        ),
+    ]
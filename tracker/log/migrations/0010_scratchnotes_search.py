@@ -0,0 +1,61 @@
+from django.db import migrations
+
+# Full-text index over ScratchNotes.text, created with vendor-specific SQL:
+#
+# - Postgres: a generated tsvector column with a GIN index. The column is not
+#   declared on the model, so the ORM never reads or writes it.
+# - SQLite: an external-content FTS5 table kept in sync by triggers. Django
+#   rebuilds SQLite tables on most ALTERs, which drops the triggers, so a later
+#   migration that alters log_scratchnotes must recreate them.
+#
+# Other backends get no index and search falls back to a substring match.
+
+POSTGRES_FORWARD = [
+    "ALTER TABLE log_scratchnotes ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', coalesce(text, ''))) STORED",
+    "CREATE INDEX log_scratchnotes_search_idx ON log_scratchnotes USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS log_scratchnotes_search_idx",
+    "ALTER TABLE log_scratchnotes DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE log_scratchnotes_fts USING fts5("
+    "text, content='log_scratchnotes', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER log_scratchnotes_fts_insert AFTER INSERT ON log_scratchnotes BEGIN "
+    "INSERT INTO log_scratchnotes_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER log_scratchnotes_fts_delete AFTER DELETE ON log_scratchnotes BEGIN "
+    "INSERT INTO log_scratchnotes_fts(log_scratchnotes_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER log_scratchnotes_fts_update AFTER UPDATE OF text ON log_scratchnotes BEGIN "
+    "INSERT INTO log_scratchnotes_fts(log_scratchnotes_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+    "INSERT INTO log_scratchnotes_fts(rowid, text) VALUES (new.id, new.text); END",
+    "INSERT INTO log_scratchnotes_fts(log_scratchnotes_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS log_scratchnotes_fts_insert",
+    "DROP TRIGGER IF EXISTS log_scratchnotes_fts_delete",
+    "DROP TRIGGER IF EXISTS log_scratchnotes_fts_update",
+    "DROP TABLE IF EXISTS log_scratchnotes_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('log', '0009_vitalbaseline_vitalanomaly'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
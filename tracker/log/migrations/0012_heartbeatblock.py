@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_idempotencykey'),
+        ('log', '0011_devicestream'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeartBeatBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('start_at', models.DateTimeField()),
+                ('end_at', models.DateTimeField()),
+                ('interval_us', models.BigIntegerField()),
+                ('count', models.PositiveIntegerField()),
+                ('first_id', models.BigIntegerField()),
+                ('last_id', models.BigIntegerField()),
+                ('minimum', models.IntegerField()),
+                ('maximum', models.IntegerField()),
+                ('total', models.FloatField()),
+                ('total_sq', models.FloatField()),
+                ('encoding', models.PositiveSmallIntegerField(default=1)),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='heartbeat_blocks', to='core.childprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['child', 'end_at'], name='log_heartbe_child_i_c8ad62_idx')],
+                'unique_together': {('child', 'hour')},
+            },
+        ),
+    ]
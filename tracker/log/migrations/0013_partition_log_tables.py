@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# Turns log_heartbeat and log_bloodpressure into tables range-partitioned by
+# month on created_at (see log/partitions.py). Postgres only: on other
+# backends the tables stay plain. The rows are copied into the new table, so
+# this holds an exclusive lock on both tables while it runs.
+
+TABLES = ['log_heartbeat', 'log_bloodpressure']
+
+
+def partition(apps, schema_editor):
+    from log.partitions import partition_table
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            partition_table(cursor, table)
+
+
+def unpartition(apps, schema_editor):
+    from log.partitions import unpartition_table
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            unpartition_table(cursor, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('log', '0012_heartbeatblock'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
 
 
-from core.models import ChildProfile
+from core.models import ChildProfile, CustomUser
 
 
 # ======================= LOG COMPONENTS ============================
@@ -13,6 +13,9 @@ class HeartBeat(models.Model):
     def __str__(self):
         return f"{self.bpm} BPM for {self.child.full_name}"
 
+    class Meta:
+        indexes = [models.Index(fields=['child', 'created_at'])]
+
 class Behavior(models.Model):
     child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, related_name='behaviors')
     mood = models.CharField(max_length=100)
@@ -22,6 +25,9 @@ class Behavior(models.Model):
     def __str__(self):
         return f"Mood: {self.mood}, Energy: {self.energy_level} for {self.child.full_name}"
 
+    class Meta:
+        indexes = [models.Index(fields=['child', 'created_at'])]
+
 class Food(models.Model):
     child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, related_name='foods')
     food_type = models.CharField(max_length=100)
@@ -31,6 +37,9 @@ class Food(models.Model):
     def __str__(self):
         return f"{self.food_type} ({self.calories} cal) for {self.child.full_name}"
 
+    class Meta:
+        indexes = [models.Index(fields=['child', 'created_at'])]
+
 class Sleep(models.Model):
     child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, related_name='sleeps')
     hours = models.FloatField()
@@ -40,6 +49,9 @@ class Sleep(models.Model):
     def __str__(self):
         return f"{self.hours} hrs, Quality: {self.sleep_quality} for {self.child.full_name}"
 
+    class Meta:
+        indexes = [models.Index(fields=['child', 'created_at'])]
+
 class BloodPressure(models.Model):
     child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, related_name='blood_pressures')
     systolic = models.FloatField()
@@ -49,10 +61,222 @@ class BloodPressure(models.Model):
     def __str__(self):
         return f"{self.systolic}/{self.dystolic} mmHg for {self.child.full_name}"
 
+    class Meta:
+        indexes = [models.Index(fields=['child', 'created_at'])]
+
 class ScratchNotes(models.Model):
     child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, related_name='scratch_notes')
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Note at {self.created_at} is {self.text}"
\ No newline at end of file
+        return f"Note at {self.created_at} is {self.text}"
+
+    class Meta:
+        indexes = [models.Index(fields=['child', 'created_at'])]
+
+# Log models addressable by type name (batch ingestion, exports, ...)
+LOG_MODELS = {
+    'heartbeat': HeartBeat,
+    'behavior': Behavior,
+    'food': Food,
+    'sleep': Sleep,
+    'bloodpressure': BloodPressure,
+    'scratchnotes': ScratchNotes,
+}
+
+
+# ======================= ROLLUPS ============================
+class VitalRollup(models.Model):
+    """
+    Pre-aggregated statistics of one numeric vital per child per hour or day.
+    """
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    METRIC_CHOICES = [
+        ('heartbeat_bpm', 'Heart rate (bpm)'),
+        ('bloodpressure_systolic', 'Systolic pressure'),
+        ('bloodpressure_dystolic', 'Diastolic pressure'),
+        ('sleep_hours', 'Sleep hours'),
+        ('food_calories', 'Food calories'),
+    ]
+
+    child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, related_name='vital_rollups')
+    metric = models.CharField(max_length=32, choices=METRIC_CHOICES)
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    minimum = models.FloatField()
+    maximum = models.FloatField()
+    total = models.FloatField(default=0)
+    total_sq = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def variance(self):
+        if not self.count:
+            return None
+        mean = self.total / self.count
+        return max(self.total_sq / self.count - mean * mean, 0.0)
+
+    def __str__(self):
+        return f"{self.metric} {self.granularity} {self.bucket_start} for child {self.child_id}"
+
+    class Meta:
+        unique_together = ('child', 'metric', 'granularity', 'bucket_start')
+        indexes = [models.Index(fields=['child', 'granularity', 'bucket_start'])]
+
+
+# ======================= SYNC ============================
+class SyncChange(models.Model):
+    """
+    Append-only change feed for offline clients. The auto-increment id is the
+    sync cursor; log/sync.py serializes writes per parent so ids commit in
+    order. Parent and child ids are plain columns so tombstones outlive
+    the rows (and children) they describe.
+    """
+    OP_CHOICES = [
+        ('upsert', 'Created or updated'),
+        ('delete', 'Deleted'),
+    ]
+
+    parent_id = models.BigIntegerField()
+    child_id = models.BigIntegerField()
+    resource = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=6, choices=OP_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.op} {self.resource} {self.object_id}"
+
+    class Meta:
+        indexes = [models.Index(fields=['parent_id', 'id'])]
+
+
+# ======================= LATEST VITALS ============================
+class LatestVitals(models.Model):
+    """
+    Most recent reading of each vital per child, maintained on write.
+    """
+    child = models.OneToOneField(ChildProfile, on_delete=models.CASCADE, primary_key=True, related_name='latest_vitals')
+    heartbeat_bpm = models.IntegerField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    systolic = models.FloatField(null=True, blank=True)
+    dystolic = models.FloatField(null=True, blank=True)
+    bloodpressure_at = models.DateTimeField(null=True, blank=True)
+    sleep_hours = models.FloatField(null=True, blank=True)
+    sleep_quality = models.CharField(max_length=100, null=True, blank=True)
+    sleep_at = models.DateTimeField(null=True, blank=True)
+    mood = models.CharField(max_length=100, null=True, blank=True)
+    energy_level = models.CharField(max_length=100, null=True, blank=True)
+    behavior_at = models.DateTimeField(null=True, blank=True)
+    food_type = models.CharField(max_length=100, null=True, blank=True)
+    calories = models.FloatField(null=True, blank=True)
+    food_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Latest vitals for child {self.child_id}"
+
+
+# ======================= ANOMALIES ============================
+class VitalBaseline(models.Model):
+    """
+    Rolling EWMA mean and variance of one vital per child, updated per reading.
+    """
+    child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, related_name='vital_baselines')
+    metric = models.CharField(max_length=32)
+    samples = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    variance = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.metric} baseline for child {self.child_id}"
+
+    class Meta:
+        unique_together = ('child', 'metric')
+
+
+class VitalAnomaly(models.Model):
+    REASON_CHOICES = [
+        ('out_of_range', 'Outside the age-adjusted range'),
+        ('deviation', 'Deviates from the child baseline'),
+    ]
+
+    child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, related_name='vital_anomalies')
+    metric = models.CharField(max_length=32)
+    reason = models.CharField(max_length=16, choices=REASON_CHOICES)
+    value = models.FloatField()
+    baseline_mean = models.FloatField(null=True, blank=True)
+    z_score = models.FloatField(null=True, blank=True)
+    reading_id = models.BigIntegerField()
+    reading_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.metric} {self.value} ({self.reason}) for child {self.child_id}"
+
+    class Meta:
+        indexes = [models.Index(fields=['child', 'created_at'])]
+
+
+# ======================= DEVICES ============================
+class DeviceStream(models.Model):
+    """
+    Ingestion state of one wearable streaming readings for one child over a
+    WebSocket: the highest frame sequence number that has been stored.
+    """
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='device_streams')
+    child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, related_name='device_streams')
+    device_id = models.CharField(max_length=64)
+    last_acked_seq = models.BigIntegerField(default=0)
+    frames_stored = models.BigIntegerField(default=0)
+    frames_rejected = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Device {self.device_id} for child {self.child_id} at seq {self.last_acked_seq}"
+
+    class Meta:
+        unique_together = ('owner', 'device_id')
+
+
+# ======================= HEARTBEAT BLOCKS ============================
+class HeartBeatBlock(models.Model):
+    """
+    One child-hour of compacted HeartBeat samples (see log/blocks.py).
+
+    Ids, timestamps and bpm values are delta-encoded and zlib-compressed in
+    ``data``; count/min/max/total/total_sq let aggregates skip decoding.
+    """
+    child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, related_name='heartbeat_blocks')
+    hour = models.DateTimeField()
+    start_at = models.DateTimeField()
+    end_at = models.DateTimeField()
+    interval_us = models.BigIntegerField()
+    count = models.PositiveIntegerField()
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    minimum = models.IntegerField()
+    maximum = models.IntegerField()
+    total = models.FloatField()
+    total_sq = models.FloatField()
+    encoding = models.PositiveSmallIntegerField(default=1)
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.count} heartbeats of child {self.child_id} at {self.hour}"
+
+    class Meta:
+        unique_together = ('child', 'hour')
+        indexes = [models.Index(fields=['child', 'end_at'])]
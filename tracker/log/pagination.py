@@ -0,0 +1,155 @@
+import base64
+from datetime import datetime
+
+from django.core.management.base import CommandError
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def parse_time_bound(value, name):
+    """
+    Parse a since/until query value (ISO datetime or date) into an aware datetime.
+    """
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = day and datetime(day.year, day.month, day.day)
+    except ValueError:
+        # Well-formed but impossible dates such as 2024-02-30
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: f"Invalid datetime '{value}'."})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def time_bound_option(options, name):
+    """
+    parse_time_bound for the --since/--until option of a management command:
+    None if it is not given, a CommandError if it is not a valid date.
+    """
+    value = options[name]
+    if not value:
+        return None
+    try:
+        return parse_time_bound(value, name)
+    except ValidationError:
+        raise CommandError(f"--{name} must be an ISO date or datetime, got '{value}'")
+
+
+def filter_time_range(queryset, params):
+    """
+    Apply the optional ``since`` (inclusive) and ``until`` (exclusive) filters on created_at.
+    """
+    since = params.get('since')
+    until = params.get('until')
+    if since:
+        queryset = queryset.filter(created_at__gte=parse_time_bound(since, 'since'))
+    if until:
+        queryset = queryset.filter(created_at__lt=parse_time_bound(until, 'until'))
+    return queryset
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(token):
+    try:
+        created_at, pk = base64.urlsafe_b64decode(token.encode()).decode().split('|')
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            raise ValueError
+        return created_at, int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+
+
+def keyset_page(queryset, cursor, page_size):
+    """
+    Return one newest-first page of log rows after ``cursor`` and the cursor of the next page.
+
+    Pages are seeked on (created_at, id) so every page costs one index range scan
+    on (child, created_at), however deep into the history it is.
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].pk)
+    return rows, next_cursor
+
+
+class LogCursorPagination(BasePagination):
+    """
+    Keyset pagination for log viewsets, newest first.
+    """
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return self.page_size
+        try:
+            return max(1, min(int(value), self.max_page_size))
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: 'Must be an integer.'})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        rows, self.next_cursor = keyset_page(
+            queryset, request.query_params.get(self.cursor_query_param), self.get_page_size(request)
+        )
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'cursor': self.next_cursor,
+            'results': data,
+        })
+
+
+class BlockCursorPagination(LogCursorPagination):
+    """
+    LogCursorPagination for HeartBeat that also pages through compacted
+    blocks, taken from the view's ``get_block_queryset()``.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        from .blocks import keyset_page as block_keyset_page  # blocks imports this module
+
+        self.request = request
+        since = request.query_params.get('since')
+        until = request.query_params.get('until')
+        rows, self.next_cursor = block_keyset_page(
+            queryset,
+            view.get_block_queryset(),
+            request.query_params.get(self.cursor_query_param),
+            self.get_page_size(request),
+            since=parse_time_bound(since, 'since') if since else None,
+            until=parse_time_bound(until, 'until') if until else None,
+        )
+        return rows
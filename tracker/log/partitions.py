@@ -0,0 +1,228 @@
+"""
+Monthly range partitioning on ``created_at`` for the high-volume log tables.
+
+Only Postgres has declarative partitioning; on other backends every function
+here is a no-op and the tables stay plain. Migration 0013 turns each table in
+PARTITIONED_MODELS into a partitioned table with one partition per month
+(``log_heartbeat_p2026_10``) and a ``_default`` partition that catches rows
+outside every month, so inserts never fail. ``manage_partitions`` keeps
+partitions created ahead of time and detaches or drops the ones older than
+the retention.
+
+Postgres needs the partition key in the primary key, so the partitioned
+tables use (id, created_at). Ids still come from one sequence per table and
+stay unique; Django keeps treating ``id`` as the primary key.
+"""
+
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import HeartBeat, BloodPressure
+
+PARTITIONED_MODELS = (HeartBeat, BloodPressure)
+
+LOG_PARTITIONS_DEFAULTS = {
+    'MONTHS_AHEAD': 3,         # future monthly partitions kept ready
+    'RETENTION_MONTHS': None,  # months of raw rows kept; None keeps everything
+    'ARCHIVE': 'detach',       # 'detach' keeps old partitions as plain tables, 'drop' deletes them
+}
+ARCHIVE_MODES = ('detach', 'drop')
+
+_PARTITION_NAME = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def partition_settings():
+    return {**LOG_PARTITIONS_DEFAULTS, **getattr(settings, 'LOG_PARTITIONS', {})}
+
+
+def supported(conn=connection):
+    return conn.vendor == 'postgresql'
+
+
+def month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y_%m}'
+
+
+def _literal(value):
+    # DDL cannot take bound parameters, and these are generated values only
+    return f"'{value.isoformat()}'"
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def _rebuild(cursor, table, partitioned, now=None):
+    """
+    Recreate ``table`` as a partitioned table (or back as a plain one), keeping
+    its rows, id sequence, check and foreign key constraints and indexes.
+    Holds an exclusive lock on the table while the rows are copied.
+    """
+    legacy = f'{table}_legacy'
+    sequence = f'{table}_id_seq'
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes "
+        "WHERE schemaname = current_schema() AND tablename = %s AND indexname <> %s",
+        [table, f'{table}_pkey'],
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('c', 'f')",
+        [table],
+    )
+    constraints = cursor.fetchall()
+    cursor.execute("SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'", [table])
+    identity = cursor.fetchone()[0]
+    cursor.execute(f"SELECT min(created_at), max(id) FROM {table}")
+    first, max_id = cursor.fetchone()
+
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    # Free the id sequence name for the new table
+    if identity:
+        cursor.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP IDENTITY")
+    else:
+        cursor.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP DEFAULT")
+        cursor.execute(f"DROP SEQUENCE IF EXISTS {sequence}")
+
+    suffix = " PARTITION BY RANGE (created_at)" if partitioned else ""
+    cursor.execute(f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS){suffix}")
+    cursor.execute(f"CREATE SEQUENCE {sequence} OWNED BY {table}.id")
+    cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+    if max_id is not None:
+        cursor.execute("SELECT setval(%s, %s)", [sequence, max_id])
+
+    if partitioned:
+        cursor.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+        now = now or timezone.now()
+        month = month_start(first or now)
+        last = add_months(month_start(now), partition_settings()['MONTHS_AHEAD'])
+        while month <= last:
+            _create_partition(cursor, table, month)
+            month = add_months(month, 1)
+
+    cursor.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+    cursor.execute(f"DROP TABLE {legacy} CASCADE")
+
+    # Keys and indexes are built once the rows are in
+    key = "(id, created_at)" if partitioned else "(id)"
+    cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY {key}")
+    for name, definition in constraints:
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+    for _, definition in indexes:
+        # Indexes read from a partitioned table are defined ON ONLY it
+        cursor.execute(definition.replace(' ON ONLY ', ' ON ', 1))
+
+
+def partition_table(cursor, table, now=None):
+    if not is_partitioned(cursor, table):
+        _rebuild(cursor, table, partitioned=True, now=now)
+
+
+def unpartition_table(cursor, table):
+    if is_partitioned(cursor, table):
+        _rebuild(cursor, table, partitioned=False)
+
+
+def _create_partition(cursor, table, month):
+    name = partition_name(table, month)
+    bounds = f"FROM ({_literal(month)}) TO ({_literal(add_months(month, 1))})"
+    default = f'{table}_default'
+    window = [month, add_months(month, 1)]
+
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [default])
+    has_default = cursor.fetchone()[0]
+    if has_default:
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE created_at >= %s AND created_at < %s)", window)
+    if not has_default or not cursor.fetchone()[0]:
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}")
+        return
+
+    # The default partition already holds rows for this month: move them over
+    cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {default}")
+    cursor.execute(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}")
+    cursor.execute(f"INSERT INTO {table} SELECT * FROM {default} WHERE created_at >= %s AND created_at < %s", window)
+    cursor.execute(f"DELETE FROM {default} WHERE created_at >= %s AND created_at < %s", window)
+    cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT")
+
+
+def monthly_partitions(cursor, table):
+    """
+    {month: partition name} of the table's attached monthly partitions.
+    """
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = %s::regclass",
+        [table],
+    )
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        match = _PARTITION_NAME.search(name)
+        if match:
+            partitions[datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)] = name
+    return partitions
+
+
+def maintain(months_ahead=None, retention_months=None, archive=None, dry_run=False, now=None):
+    """
+    Create the missing monthly partitions up to ``months_ahead`` months from
+    now and detach or drop those entirely older than ``retention_months``.
+
+    Rows in retired partitions leave without delete signals, so rollups and
+    latest vitals keep their history. Returns a list of
+    (table, action, partition) tuples; empty on backends other than Postgres.
+    """
+    if not supported():
+        return []
+    config = partition_settings()
+    months_ahead = config['MONTHS_AHEAD'] if months_ahead is None else months_ahead
+    retention_months = config['RETENTION_MONTHS'] if retention_months is None else retention_months
+    archive = config['ARCHIVE'] if archive is None else archive
+    if archive not in ARCHIVE_MODES:
+        raise ValueError(f"archive must be one of {', '.join(ARCHIVE_MODES)}")
+
+    current = month_start(now or timezone.now())
+    actions = []
+    for model in PARTITIONED_MODELS:
+        table = model._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            if not is_partitioned(cursor, table):
+                continue
+            existing = monthly_partitions(cursor, table)
+
+            for offset in range(months_ahead + 1):
+                month = add_months(current, offset)
+                if month not in existing:
+                    actions.append((table, 'create', partition_name(table, month)))
+                    if not dry_run:
+                        _create_partition(cursor, table, month)
+
+            if retention_months is None:
+                continue
+            cutoff = add_months(current, -retention_months)
+            for month, name in sorted(existing.items()):
+                if add_months(month, 1) > cutoff:
+                    continue
+                actions.append((table, archive, name))
+                if dry_run:
+                    continue
+                cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                if archive == 'drop':
+                    cursor.execute(f"DROP TABLE {name}")
+    return actions
@@ -0,0 +1,101 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .export import EXPORT_FIELDS
+from .models import LOG_MODELS
+
+logger = logging.getLogger(__name__)
+
+LOG_TYPES = {model: log_type for log_type, model in LOG_MODELS.items()}
+
+
+def vitals_group(child_id):
+    return f'vitals_{child_id}'
+
+
+def _timestamp(value):
+    # Epoch milliseconds keep the deltas small
+    return int(value.timestamp() * 1000)
+
+
+def _send(messages):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for child_id, message in messages:
+        try:
+            async_to_sync(channel_layer.group_send)(vitals_group(child_id), message)
+        except Exception as e:
+            # Live updates are best effort; the write itself has succeeded
+            logger.warning(f"Could not publish vitals for child {child_id}: {e}")
+
+
+def publish(messages):
+    """
+    Send (child_id, message) pairs to the children's groups once the current
+    transaction commits, so subscribers never see rows that are rolled back.
+    """
+    if messages:
+        transaction.on_commit(lambda: _send(messages))
+
+
+def publish_rows(model, instances, op='upsert'):
+    """
+    Publish created or edited log rows as one compact delta per child:
+    ``{"log": "heartbeat", "op": "upsert", "fields": ["id", "t", "bpm"],
+    "rows": [[1, 1718000000000, 92], ...]}`` with ``t`` in epoch milliseconds.
+    """
+    log_type = LOG_TYPES.get(model)
+    if log_type is None or not instances:
+        return
+    fields = EXPORT_FIELDS[log_type]
+
+    rows = {}
+    for instance in instances:
+        row = [instance.pk, _timestamp(instance.created_at)] + [getattr(instance, field) for field in fields]
+        rows.setdefault(instance.child_id, []).append(row)
+
+    publish([
+        (child_id, {
+            'type': 'vitals.delta',
+            'log': log_type,
+            'op': op,
+            'fields': ['id', 't'] + fields,
+            'rows': child_rows,
+        })
+        for child_id, child_rows in rows.items()
+    ])
+
+
+def publish_delete(model, instance):
+    log_type = LOG_TYPES.get(model)
+    if log_type is None:
+        return
+    publish([(instance.child_id, {
+        'type': 'vitals.delta',
+        'log': log_type,
+        'op': 'delete',
+        'fields': ['id'],
+        'rows': [[instance.pk]],
+    })])
+
+
+def publish_anomalies(anomalies):
+    rows = {}
+    for anomaly in anomalies:
+        rows.setdefault(anomaly.child_id, []).append([
+            anomaly.metric, anomaly.reason, anomaly.value,
+            round(anomaly.z_score, 2) if anomaly.z_score is not None else None,
+            anomaly.reading_id, _timestamp(anomaly.reading_at),
+        ])
+    publish([
+        (child_id, {
+            'type': 'vitals.anomaly',
+            'fields': ['metric', 'reason', 'value', 'z', 'reading_id', 't'],
+            'rows': child_rows,
+        })
+        for child_id, child_rows in rows.items()
+    ])
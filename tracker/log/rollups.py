@@ -0,0 +1,234 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum, Value
+from django.db.models.functions import Greatest, Least, TruncDay, TruncHour
+
+from .models import HeartBeat, BloodPressure, Sleep, Food, VitalRollup, HeartBeatBlock
+from . import blocks
+
+# Numeric vitals that are rolled up: model -> [(metric, field)]
+ROLLUP_METRICS = {
+    HeartBeat: [('heartbeat_bpm', 'bpm')],
+    BloodPressure: [('bloodpressure_systolic', 'systolic'), ('bloodpressure_dystolic', 'dystolic')],
+    Sleep: [('sleep_hours', 'hours')],
+    Food: [('food_calories', 'calories')],
+}
+
+GRANULARITIES = {
+    'hour': TruncHour,
+    'day': TruncDay,
+}
+
+BUCKET_LENGTHS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+
+
+def bucket_start(value, granularity):
+    """
+    Truncate an aware datetime to the start of its UTC hour or day.
+    """
+    value = value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        value = value.replace(hour=0)
+    return value
+
+
+def apply_samples(model, instances):
+    """
+    Fold newly created log rows into their hourly and daily rollups.
+
+    Samples are first combined in memory so a batch touches each bucket once.
+    """
+    metrics = ROLLUP_METRICS.get(model)
+    if not metrics or not instances:
+        return
+
+    groups = {}
+    for instance in instances:
+        for metric, field in metrics:
+            value = getattr(instance, field)
+            if value is None:
+                continue
+            value = float(value)
+            for granularity in GRANULARITIES:
+                key = (instance.child_id, metric, granularity, bucket_start(instance.created_at, granularity))
+                agg = groups.get(key)
+                if agg is None:
+                    groups[key] = [1, value, value, value, value * value]
+                else:
+                    agg[0] += 1
+                    agg[1] = min(agg[1], value)
+                    agg[2] = max(agg[2], value)
+                    agg[3] += value
+                    agg[4] += value * value
+
+    with transaction.atomic():
+        for (child_id, metric, granularity, start), (count, minimum, maximum, total, total_sq) in groups.items():
+            rollup, created = VitalRollup.objects.get_or_create(
+                child_id=child_id, metric=metric, granularity=granularity, bucket_start=start,
+                defaults={
+                    'count': count, 'minimum': minimum, 'maximum': maximum,
+                    'total': total, 'total_sq': total_sq,
+                },
+            )
+            if not created:
+                VitalRollup.objects.filter(pk=rollup.pk).update(
+                    count=F('count') + count,
+                    minimum=Least(F('minimum'), Value(minimum)),
+                    maximum=Greatest(F('maximum'), Value(maximum)),
+                    total=F('total') + total,
+                    total_sq=F('total_sq') + total_sq,
+                )
+
+
+def rebuild_buckets(model, child_id, timestamps):
+    """
+    Recompute the rollups containing the given timestamps from raw rows.
+
+    Used after updates and deletes, where min/max cannot be maintained incrementally.
+    """
+    metrics = ROLLUP_METRICS.get(model)
+    if not metrics:
+        return
+
+    buckets = {
+        (granularity, bucket_start(ts, granularity))
+        for ts in timestamps for granularity in GRANULARITIES
+    }
+    with transaction.atomic():
+        for granularity, start in buckets:
+            end = start + BUCKET_LENGTHS[granularity]
+            rows = model.objects.filter(child_id=child_id, created_at__gte=start, created_at__lt=end)
+            for metric, field in metrics:
+                agg = rows.aggregate(**_aggregates(field))
+                if model is HeartBeat:
+                    # A day bucket can span compacted hours and raw ones
+                    compacted = blocks.aggregate(blocks.blocks_in_range(start, end, child_id=child_id), start, end)
+                    agg = _combine(agg, compacted)
+                lookup = dict(child_id=child_id, metric=metric, granularity=granularity, bucket_start=start)
+                if not agg['count']:
+                    VitalRollup.objects.filter(**lookup).delete()
+                    continue
+                VitalRollup.objects.update_or_create(**lookup, defaults=agg)
+
+
+def backfill(child_id=None):
+    """
+    Rebuild all rollups (optionally for one child) from raw history with
+    database-side aggregation. Returns the number of rollup rows written.
+    """
+    written = 0
+    with transaction.atomic():
+        existing = VitalRollup.objects.all()
+        if child_id is not None:
+            existing = existing.filter(child_id=child_id)
+        existing.delete()
+
+        for model, metrics in ROLLUP_METRICS.items():
+            rows = model.objects.all()
+            if child_id is not None:
+                rows = rows.filter(child_id=child_id)
+            for granularity, trunc in GRANULARITIES.items():
+                for metric, field in metrics:
+                    buckets = (
+                        rows.annotate(bucket=trunc('created_at', tzinfo=dt_timezone.utc))
+                        .values('child_id', 'bucket')
+                        .annotate(**_aggregates(field))
+                        .order_by()
+                    )
+                    compacted = _block_buckets(child_id, granularity) if model is HeartBeat else {}
+                    batch = []
+                    for bucket in buckets.iterator(chunk_size=2000):
+                        agg = compacted.pop((bucket['child_id'], bucket['bucket']), None)
+                        if agg is not None:
+                            bucket = dict(bucket, **_combine(bucket, agg))
+                        batch.append(VitalRollup(
+                            child_id=bucket['child_id'], metric=metric, granularity=granularity,
+                            bucket_start=bucket['bucket'], count=bucket['count'],
+                            minimum=bucket['minimum'], maximum=bucket['maximum'],
+                            total=bucket['total'], total_sq=bucket['total_sq'],
+                        ))
+                        if len(batch) >= 1000:
+                            written += len(VitalRollup.objects.bulk_create(batch))
+                            batch = []
+                    # Buckets with compacted samples only
+                    for (bucket_child, start), agg in compacted.items():
+                        batch.append(VitalRollup(
+                            child_id=bucket_child, metric=metric, granularity=granularity,
+                            bucket_start=start, **agg,
+                        ))
+                    written += len(VitalRollup.objects.bulk_create(batch, batch_size=1000))
+    return written
+
+
+def rollup_series(child_ids, granularity='day', since=None, until=None):
+    """
+    Return {child_id: {metric: [bucket, ...]}} read from the rollup table.
+
+    The cost depends on the number of buckets in the window, not on raw samples.
+    """
+    rollups = VitalRollup.objects.filter(child_id__in=child_ids, granularity=granularity)
+    if since is not None:
+        rollups = rollups.filter(bucket_start__gte=bucket_start(since, granularity))
+    if until is not None:
+        rollups = rollups.filter(bucket_start__lt=until)
+
+    series = {}
+    for rollup in rollups.order_by('bucket_start'):
+        series.setdefault(rollup.child_id, {}).setdefault(rollup.metric, []).append({
+            'bucket_start': rollup.bucket_start.isoformat(),
+            'count': rollup.count,
+            'mean': round(rollup.mean, 2),
+            'min': rollup.minimum,
+            'max': rollup.maximum,
+        })
+    return series
+
+
+def _combine(agg, other):
+    """
+    Combine two count/minimum/maximum/total/total_sq aggregates, either of which may be empty.
+    """
+    if not other['count']:
+        return agg
+    if not agg['count']:
+        return other
+    return {
+        'count': agg['count'] + other['count'],
+        'minimum': min(agg['minimum'], other['minimum']),
+        'maximum': max(agg['maximum'], other['maximum']),
+        'total': agg['total'] + other['total'],
+        'total_sq': agg['total_sq'] + other['total_sq'],
+    }
+
+
+def _block_buckets(child_id, granularity):
+    """
+    {(child_id, bucket_start): aggregate} of compacted HeartBeat samples.
+    A block is one hour, so its stored aggregates fold straight into buckets.
+    """
+    block_queryset = HeartBeatBlock.objects.all()
+    if child_id is not None:
+        block_queryset = block_queryset.filter(child_id=child_id)
+    result = {}
+    for block in block_queryset.only('child_id', 'hour', 'count', 'minimum', 'maximum', 'total', 'total_sq').iterator():
+        agg = {
+            'count': block.count, 'minimum': block.minimum, 'maximum': block.maximum,
+            'total': block.total, 'total_sq': block.total_sq,
+        }
+        key = (block.child_id, bucket_start(block.hour, granularity))
+        result[key] = _combine(result.get(key, {'count': 0}), agg)
+    return result
+
+
+def _aggregates(field):
+    return {
+        'count': Count(field),
+        'minimum': Min(field),
+        'maximum': Max(field),
+        'total': Sum(field),
+        'total_sq': Sum(F(field) * F(field)),
+    }
@@ -0,0 +1,133 @@
+import html
+import re
+
+from django.db import connection
+
+from .models import ScratchNotes
+
+# Text search configuration of the Postgres index (see migration 0010); the
+# query side must use the same one for the index to be used.
+SEARCH_CONFIG = 'english'
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_STOP = '</mark>'
+# The database marks matches with these private-use characters; the note text
+# is HTML-escaped before they become HIGHLIGHT_START/STOP, so a note cannot
+# inject markup into its highlight
+_MATCH_START = '\ue000'
+_MATCH_STOP = '\ue001'
+MAX_RESULTS = 100
+
+NOTES_TABLE = ScratchNotes._meta.db_table
+FTS_TABLE = f'{NOTES_TABLE}_fts'
+
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def fts5_query(text):
+    """
+    Turn free text into a safe FTS5 query: every word or "quoted phrase" must
+    match, and a trailing * on a word matches it as a prefix.
+    """
+    terms = []
+    for phrase, word in _TERM.findall(text):
+        term = (phrase or word).strip()
+        prefix = bool(word) and term.endswith('*')
+        term = term.rstrip('*').replace('"', '')
+        if term:
+            terms.append(f'"{term}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+def search_notes(child_ids, query, since=None, until=None, limit=20, offset=0):
+    """
+    Rank the children's notes matching ``query`` and return one page of
+    (note, rank, highlight) tuples, best match first.
+
+    Postgres uses the GIN-indexed ``search_vector`` column with
+    websearch_to_tsquery (quotes, "or" and -negation), SQLite the FTS5 table
+    kept in sync by triggers. Other backends fall back to a substring match
+    without ranking.
+    """
+    child_ids = list(child_ids)
+    if not child_ids or not query.strip():
+        return []
+
+    if connection.vendor == 'postgresql':
+        rows = _search_postgres(child_ids, query, since, until, limit, offset)
+    elif connection.vendor == 'sqlite':
+        match = fts5_query(query)
+        if not match:
+            return []
+        rows = _search_sqlite(child_ids, match, since, until, limit, offset)
+    else:
+        notes = ScratchNotes.objects.filter(child_id__in=child_ids, text__icontains=query.strip())
+        if since is not None:
+            notes = notes.filter(created_at__gte=since)
+        if until is not None:
+            notes = notes.filter(created_at__lt=until)
+        return [(note, None, None) for note in notes.order_by('-created_at', '-id')[offset:offset + limit]]
+
+    notes = ScratchNotes.objects.in_bulk([row[0] for row in rows])
+    return [(notes[pk], rank, render_highlight(highlight)) for pk, rank, highlight in rows if pk in notes]
+
+
+def render_highlight(fragment):
+    """
+    HTML for a highlight fragment: escaped note text with the matches wrapped
+    in HIGHLIGHT_START/STOP.
+    """
+    if fragment is None:
+        return None
+    return html.escape(fragment).replace(_MATCH_START, HIGHLIGHT_START).replace(_MATCH_STOP, HIGHLIGHT_STOP)
+
+
+def _time_filters(alias, since, until):
+    sql, params = '', []
+    if since is not None:
+        sql += f' AND {alias}.created_at >= %s'
+        params.append(connection.ops.adapt_datetimefield_value(since))
+    if until is not None:
+        sql += f' AND {alias}.created_at < %s'
+        params.append(connection.ops.adapt_datetimefield_value(until))
+    return sql, params
+
+
+def _search_postgres(child_ids, query, since, until, limit, offset):
+    time_sql, time_params = _time_filters('n', since, until)
+    headline_options = f'StartSel={_MATCH_START}, StopSel={_MATCH_STOP}, MaxWords=35, MinWords=15'
+    # Headlines are expensive, so they are only built for the page that is returned
+    sql = f"""
+        SELECT page.id, page.rank, ts_headline(%s::regconfig, n.text, page.query, %s)
+        FROM (
+            SELECT n.id, ts_rank_cd(n.search_vector, q) AS rank, q AS query, n.created_at
+            FROM {NOTES_TABLE} n, websearch_to_tsquery(%s::regconfig, %s) q
+            WHERE n.search_vector @@ q AND n.child_id = ANY(%s){time_sql}
+            ORDER BY rank DESC, n.created_at DESC, n.id DESC
+            LIMIT %s OFFSET %s
+        ) page
+        JOIN {NOTES_TABLE} n ON n.id = page.id
+        ORDER BY page.rank DESC, page.created_at DESC, page.id DESC
+    """
+    params = [SEARCH_CONFIG, headline_options, SEARCH_CONFIG, query, child_ids, *time_params, limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _search_sqlite(child_ids, match, since, until, limit, offset):
+    time_sql, time_params = _time_filters('n', since, until)
+    placeholders = ', '.join(['%s'] * len(child_ids))
+    # bm25() is lower for better matches
+    sql = f"""
+        SELECT n.id, -bm25({FTS_TABLE}) AS score,
+               snippet({FTS_TABLE}, 0, %s, %s, '…', 32)
+        FROM {FTS_TABLE}
+        JOIN {NOTES_TABLE} n ON n.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s AND n.child_id IN ({placeholders}){time_sql}
+        ORDER BY score DESC, n.created_at DESC, n.id DESC
+        LIMIT %s OFFSET %s
+    """
+    params = [_MATCH_START, _MATCH_STOP, match, *child_ids, *time_params, limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 
 from core.models import ChildProfile
-from .models import HeartBeat, Behavior, Food, Sleep, BloodPressure, ScratchNotes
+from .models import HeartBeat, Behavior, Food, Sleep, BloodPressure, ScratchNotes, LatestVitals, VitalAnomaly
 
 class ChildSerializer(serializers.ModelSerializer):
     class Meta:
@@ -36,4 +36,56 @@ class BloodPressureSerializer(serializers.ModelSerializer):
 class ScratchNotesSerializer(serializers.ModelSerializer):
     class Meta:
         model = ScratchNotes
-        fields = ['id', 'child', 'text', 'created_at']
\ No newline at end of file
+        fields = ['id', 'child', 'text', 'created_at']
+
+# ======================= BATCH INGESTION ============================
+# The child is resolved once per batch by the caller, so it is read-only here
+# to avoid a lookup query for every record.
+class HeartBeatBatchSerializer(HeartBeatSerializer):
+    class Meta(HeartBeatSerializer.Meta):
+        read_only_fields = ['child']
+
+class BehaviorBatchSerializer(BehaviorSerializer):
+    class Meta(BehaviorSerializer.Meta):
+        read_only_fields = ['child']
+
+class FoodBatchSerializer(FoodSerializer):
+    class Meta(FoodSerializer.Meta):
+        read_only_fields = ['child']
+
+class SleepBatchSerializer(SleepSerializer):
+    class Meta(SleepSerializer.Meta):
+        read_only_fields = ['child']
+
+class BloodPressureBatchSerializer(BloodPressureSerializer):
+    class Meta(BloodPressureSerializer.Meta):
+        read_only_fields = ['child']
+
+class ScratchNotesBatchSerializer(ScratchNotesSerializer):
+    class Meta(ScratchNotesSerializer.Meta):
+        read_only_fields = ['child']
+
+BATCH_SERIALIZERS = {
+    'heartbeat': HeartBeatBatchSerializer,
+    'behavior': BehaviorBatchSerializer,
+    'food': FoodBatchSerializer,
+    'sleep': SleepBatchSerializer,
+    'bloodpressure': BloodPressureBatchSerializer,
+    'scratchnotes': ScratchNotesBatchSerializer,
+}
+
+
+class VitalAnomalySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = VitalAnomaly
+        fields = ['id', 'child', 'metric', 'reason', 'value', 'baseline_mean', 'z_score', 'reading_id', 'reading_at', 'created_at']
+
+
+class LatestVitalsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LatestVitals
+        fields = [
+            'child', 'heartbeat_bpm', 'heartbeat_at', 'systolic', 'dystolic', 'bloodpressure_at',
+            'sleep_hours', 'sleep_quality', 'sleep_at', 'mood', 'energy_level', 'behavior_at',
+            'food_type', 'calories', 'food_at', 'updated_at'
+        ]
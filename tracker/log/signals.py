@@ -0,0 +1,109 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from .models import LOG_MODELS
+from . import rollups
+from . import cache as dashboard_cache
+from . import sync
+from . import latest
+from . import anomaly
+from . import realtime
+
+# Sent with ``instances`` (a list) whenever log rows are created, including
+# bulk inserts, which do not send post_save.
+logs_created = Signal()
+
+# Sent with ``instance`` and ``deleted`` when an existing log row is edited or deleted.
+logs_changed = Signal()
+
+# Sent with ``anomalies`` (saved VitalAnomaly rows) when new readings are flagged.
+anomaly_detected = Signal()
+
+
+def _relay_saved(sender, instance, created, **kwargs):
+    if created:
+        logs_created.send(sender=sender, instances=[instance])
+    else:
+        logs_changed.send(sender=sender, instance=instance, deleted=False)
+
+
+def _relay_deleted(sender, instance, origin=None, **kwargs):
+    # Rows removed by a cascade from a deleted child are skipped: everything
+    # derived from them belongs to the child and cascades as well.
+    if isinstance(origin, sender) or getattr(origin, 'model', None) is sender:
+        logs_changed.send(sender=sender, instance=instance, deleted=True)
+
+
+for model in LOG_MODELS.values():
+    post_save.connect(_relay_saved, sender=model, dispatch_uid=f'log_saved_{model._meta.model_name}')
+    post_delete.connect(_relay_deleted, sender=model, dispatch_uid=f'log_deleted_{model._meta.model_name}')
+
+
+@receiver(logs_created)
+def update_rollups(sender, instances, **kwargs):
+    rollups.apply_samples(sender, instances)
+
+
+@receiver(logs_changed)
+def rebuild_rollups(sender, instance, **kwargs):
+    rollups.rebuild_buckets(sender, instance.child_id, [instance.created_at])
+
+
+# Versions are bumped once the write commits: a bump inside the transaction
+# would let a concurrent read cache pre-commit data under the new version.
+@receiver(logs_created)
+def invalidate_dashboard_on_create(sender, instances, **kwargs):
+    child_ids = {instance.child_id for instance in instances}
+    transaction.on_commit(lambda: dashboard_cache.invalidate_children(child_ids))
+
+
+@receiver(logs_changed)
+def invalidate_dashboard_on_change(sender, instance, **kwargs):
+    child_id = instance.child_id
+    transaction.on_commit(lambda: dashboard_cache.invalidate_children([child_id]))
+
+
+@receiver(logs_created)
+def record_sync_on_create(sender, instances, **kwargs):
+    sync.record_log_changes(sender, instances)
+
+
+@receiver(logs_changed)
+def record_sync_on_change(sender, instance, deleted, **kwargs):
+    sync.record_log_changes(sender, [instance], op='delete' if deleted else 'upsert')
+
+
+@receiver(logs_created)
+def update_latest_vitals(sender, instances, **kwargs):
+    latest.apply_latest(sender, instances)
+
+
+@receiver(logs_changed)
+def refresh_latest_vitals(sender, instance, **kwargs):
+    latest.refresh_latest(sender, instance.child_id)
+
+
+@receiver(logs_created)
+def push_created(sender, instances, **kwargs):
+    realtime.publish_rows(sender, instances)
+
+
+@receiver(logs_changed)
+def push_changed(sender, instance, deleted, **kwargs):
+    if deleted:
+        realtime.publish_delete(sender, instance)
+    else:
+        realtime.publish_rows(sender, [instance])
+
+
+@receiver(anomaly_detected)
+def push_anomalies(sender, anomalies, **kwargs):
+    realtime.publish_anomalies(anomalies)
+
+
+@receiver(logs_created)
+def detect_anomalies(sender, instances, **kwargs):
+    anomalies = anomaly.evaluate(sender, instances)
+    if anomalies:
+        anomaly_detected.send(sender=sender, anomalies=anomalies)
@@ -0,0 +1,133 @@
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+
+from core.models import ChildProfile
+from .models import LOG_MODELS, SyncChange
+from .serializers import (
+    ChildSerializer, HeartBeatSerializer, BehaviorSerializer, FoodSerializer,
+    SleepSerializer, BloodPressureSerializer, ScratchNotesSerializer
+)
+
+CHILD_RESOURCE = 'child'
+
+SYNC_SERIALIZERS = {
+    CHILD_RESOURCE: ChildSerializer,
+    'heartbeat': HeartBeatSerializer,
+    'behavior': BehaviorSerializer,
+    'food': FoodSerializer,
+    'sleep': SleepSerializer,
+    'bloodpressure': BloodPressureSerializer,
+    'scratchnotes': ScratchNotesSerializer,
+}
+
+MAX_CHANGES = 1000
+
+# First key of the advisory locks taken on SyncChange writes; the second is the parent id
+SYNC_LOCK_CLASS = 0x53594e43
+
+
+def _append(changes):
+    """
+    Insert SyncChange rows, holding a per-parent lock until the transaction
+    commits.
+
+    The id is the sync cursor, so a parent's changes must become visible in
+    id order: otherwise a client could sync past a lower id that a longer
+    transaction (a bulk ingest) commits later, and never see that change.
+    With the lock, a writer only takes ids for a parent once the previous
+    writer for that parent has committed or rolled back. SQLite serializes
+    writers on its own.
+    """
+    if not changes:
+        return
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for parent_id in sorted({change.parent_id for change in changes}):
+                    cursor.execute(
+                        "SELECT pg_advisory_xact_lock(%s, %s)", [SYNC_LOCK_CLASS, parent_id % 2 ** 31]
+                    )
+        SyncChange.objects.bulk_create(changes)
+
+
+def record_log_changes(model, instances, op='upsert'):
+    """
+    Append one change per log row, resolving every child's parent in one query.
+    """
+    if not instances:
+        return
+    parents = dict(
+        ChildProfile.objects.filter(id__in={i.child_id for i in instances}).values_list('id', 'parent_id')
+    )
+    resource = model._meta.model_name
+    _append([
+        SyncChange(
+            parent_id=parents[instance.child_id], child_id=instance.child_id,
+            resource=resource, object_id=instance.pk, op=op,
+        )
+        for instance in instances if instance.child_id in parents
+    ])
+
+
+def _child_saved(sender, instance, **kwargs):
+    _append([SyncChange(
+        parent_id=instance.parent_id, child_id=instance.pk,
+        resource=CHILD_RESOURCE, object_id=instance.pk, op='upsert',
+    )])
+
+
+def _child_deleted(sender, instance, **kwargs):
+    # One tombstone for the child; clients drop its logs along with it
+    _append([SyncChange(
+        parent_id=instance.parent_id, child_id=instance.pk,
+        resource=CHILD_RESOURCE, object_id=instance.pk, op='delete',
+    )])
+
+
+post_save.connect(_child_saved, sender=ChildProfile, dispatch_uid='sync_child_saved')
+post_delete.connect(_child_deleted, sender=ChildProfile, dispatch_uid='sync_child_deleted')
+
+
+def changes_since(user, cursor, limit=MAX_CHANGES):
+    """
+    Return the user's changes after ``cursor``, newest state per object.
+
+    Upserts carry the current row, deletes are tombstones. The returned cursor
+    is the id of the last change read; ``has_more`` asks the client to call again.
+    """
+    entries = list(
+        SyncChange.objects.filter(parent_id=user.id, id__gt=cursor)
+        .order_by('id')
+        .values_list('id', 'resource', 'object_id', 'op')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    next_cursor = entries[-1][0] if entries else cursor
+
+    # Only the latest change of each object matters
+    latest = {}
+    for change_id, resource, object_id, op in entries:
+        latest.pop((resource, object_id), None)
+        latest[(resource, object_id)] = op
+
+    # Fetch the current rows with one query per resource
+    wanted = {}
+    for (resource, object_id), op in latest.items():
+        if op == 'upsert':
+            wanted.setdefault(resource, []).append(object_id)
+    rows = {}
+    for resource, ids in wanted.items():
+        model = ChildProfile if resource == CHILD_RESOURCE else LOG_MODELS[resource]
+        serializer = SYNC_SERIALIZERS[resource]
+        for instance in model.objects.filter(id__in=ids):
+            rows[(resource, instance.pk)] = serializer(instance).data
+
+    changes = []
+    for (resource, object_id), op in latest.items():
+        data = rows.get((resource, object_id))
+        if op == 'upsert' and data is None:
+            # Deleted after this change; its (or its child's) tombstone follows
+            continue
+        changes.append({'resource': resource, 'id': object_id, 'op': op, 'data': data})
+
+    return {'cursor': next_cursor, 'has_more': has_more, 'changes': changes}
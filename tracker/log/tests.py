@@ -1,3 +1,906 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock, skipIf, skipUnless
+
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import CustomUser, ChildProfile
+from .models import HeartBeat, Food, Sleep, Behavior, ScratchNotes, VitalRollup, LatestVitals, VitalAnomaly, VitalBaseline, HeartBeatBlock
+from . import rollups
+from . import latest
+from . import anomaly
+from . import cache as dashboard_cache
+from . import export
+from . import columnar
+from . import buffer as write_buffer
+from . import views
+from . import search
+from . import analytics
+from . import blocks
+from . import partitions
+from .ingest import bulk_insert
+from .downsample import downsample, lttb
+
+
+def make_user(email, role='parent'):
+    # phone_number is unique, so derive it from the email
+    return CustomUser.objects.create_user(email=email, phone_number=email.split('@')[0][:15], role=role)
+
+
+def make_child(parent, first_name='Sam'):
+    return ChildProfile.objects.create(parent=parent, first_name=first_name, last_name='Test')
+
+
+# Fixed start of the test data, on a day boundary
+T0 = datetime(2025, 3, 3, tzinfo=dt_timezone.utc)
+
+
+def backdate(instance, created_at):
+    # created_at is auto_now_add, so it is set after the insert
+    type(instance).objects.filter(pk=instance.pk).update(created_at=created_at)
+    instance.created_at = created_at
+    return instance
+
+
+class LogTestCase(TestCase):
+    def setUp(self):
+        # Dashboard responses and their counters live in the shared cache
+        cache.clear()
+        self.user = make_user('parent@example.com')
+        self.child = make_child(self.user)
+        self.other = make_user('other@example.com')
+        self.other_child = make_child(self.other, 'Alex')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class BulkIngestTests(LogTestCase):
+    url = '/api/api/ingest/'
+
+    def test_mixed_batch_is_created(self):
+        response = self.client.post(self.url, {'child': self.child.id, 'records': [
+            {'type': 'heartbeat', 'bpm': 80},
+            {'type': 'food', 'food_type': 'apple', 'calories': 95},
+            {'type': 'scratchnotes', 'text': 'fine'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(HeartBeat.objects.filter(child=self.child).count(), 1)
+        self.assertEqual(Food.objects.filter(child=self.child).count(), 1)
+        self.assertEqual(ScratchNotes.objects.filter(child=self.child).count(), 1)
+
+    def test_partial_failure_reports_each_record(self):
+        response = self.client.post(self.url, [
+            {'type': 'heartbeat', 'child': self.child.id, 'bpm': 80},
+            {'type': 'heartbeat', 'child': self.other_child.id, 'bpm': 80},
+            {'type': 'unknown', 'child': self.child.id},
+        ], format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'error', 'error'])
+        self.assertIn('child', response.data['results'][1]['errors'])
+        self.assertIn('type', response.data['results'][2]['errors'])
+        self.assertFalse(HeartBeat.objects.filter(child=self.other_child).exists())
+
+    def test_rejects_empty_and_oversized_batches(self):
+        from .ingest import MAX_BATCH_SIZE
+        self.assertEqual(self.client.post(self.url, {'records': []}, format='json').status_code, 400)
+        records = [{'type': 'heartbeat', 'child': self.child.id, 'bpm': 80}] * (MAX_BATCH_SIZE + 1)
+        self.assertEqual(self.client.post(self.url, records, format='json').status_code, 400)
+
+
+class CursorPaginationTests(LogTestCase):
+    url = '/api/api/foods/'
+
+    def setUp(self):
+        super().setUp()
+        self.foods = [
+            backdate(Food.objects.create(child=self.child, food_type='rice', calories=i), T0 + timedelta(hours=i))
+            for i in range(7)
+        ]
+        # Two rows with the same timestamp are ordered by id
+        backdate(self.foods[3], self.foods[4].created_at)
+
+    def test_pages_cover_every_row_once_newest_first(self):
+        seen, cursor = [], None
+        while True:
+            params = {'child': self.child.id, 'page_size': 3}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data['results'])
+            cursor = response.data['cursor']
+            if cursor is None:
+                break
+        expected = sorted(self.foods, key=lambda food: (food.created_at, food.id), reverse=True)
+        self.assertEqual(seen, [food.id for food in expected])
+
+    def test_since_until_filter(self):
+        response = self.client.get(self.url, {
+            'child': self.child.id, 'since': (T0 + timedelta(hours=1)).isoformat(),
+            'until': (T0 + timedelta(hours=3)).isoformat(),
+        })
+        self.assertEqual([row['id'] for row in response.data['results']], [self.foods[2].id, self.foods[1].id])
+
+    def test_invalid_cursor_and_bounds(self):
+        self.assertEqual(self.client.get(self.url, {'child': self.child.id, 'cursor': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'child': self.child.id, 'since': 'yesterday'}).status_code, 400)
+
+    def test_impossible_dates_are_rejected(self):
+        for url in (self.url, '/api/api/heartbeats/', '/api/api/dashboard/', '/api/api/export/'):
+            for value in ('2024-02-30', '2024-02-30T10:00:00'):
+                response = self.client.get(url, {'child': self.child.id, 'since': value})
+                self.assertEqual(response.status_code, 400, url)
+                self.assertIn('since', response.data)
+
+    def test_other_parents_rows_are_hidden(self):
+        response = self.client.get(self.url, {'child': self.other_child.id})
+        self.assertEqual(response.data['results'], [])
+
+
+class RollupTests(LogTestCase):
+    def rollup(self, granularity='hour'):
+        return VitalRollup.objects.get(child=self.child, metric='heartbeat_bpm', granularity=granularity)
+
+    def test_saves_and_bulk_inserts_update_hour_and_day_buckets(self):
+        HeartBeat.objects.create(child=self.child, bpm=60)
+        bulk_insert(HeartBeat, [HeartBeat(child=self.child, bpm=bpm) for bpm in (80, 100)])
+        for granularity in ('hour', 'day'):
+            rollup = self.rollup(granularity)
+            self.assertEqual((rollup.count, rollup.minimum, rollup.maximum), (3, 60, 100))
+            self.assertAlmostEqual(rollup.mean, 80)
+
+    def test_delete_rebuilds_bucket_from_raw_rows(self):
+        low = HeartBeat.objects.create(child=self.child, bpm=50)
+        HeartBeat.objects.create(child=self.child, bpm=90)
+        low.delete()
+        rollup = self.rollup()
+        self.assertEqual((rollup.count, rollup.minimum, rollup.maximum), (1, 90, 90))
+
+    def test_backfill_matches_incremental_rollups(self):
+        bulk_insert(HeartBeat, [HeartBeat(child=self.child, bpm=bpm) for bpm in range(60, 70)])
+        incremental = list(VitalRollup.objects.order_by('granularity', 'metric').values_list(
+            'granularity', 'metric', 'count', 'minimum', 'maximum', 'total'))
+        self.assertGreater(rollups.backfill(), 0)
+        rebuilt = list(VitalRollup.objects.order_by('granularity', 'metric').values_list(
+            'granularity', 'metric', 'count', 'minimum', 'maximum', 'total'))
+        self.assertEqual(rebuilt, incremental)
+
+    def test_series_is_limited_to_requested_children(self):
+        HeartBeat.objects.create(child=self.child, bpm=70)
+        HeartBeat.objects.create(child=self.other_child, bpm=70)
+        series = rollups.rollup_series([self.child.id], granularity='day')
+        self.assertEqual(list(series), [self.child.id])
+        self.assertEqual(series[self.child.id]['heartbeat_bpm'][0]['count'], 1)
+
+
+class DashboardTests(LogTestCase):
+    url = '/api/api/dashboard/'
+
+    def test_summary_mode_aggregates_the_window(self):
+        for bpm in (60, 80, 100):
+            HeartBeat.objects.create(child=self.child, bpm=bpm)
+        HeartBeat.objects.create(child=self.other_child, bpm=200)
+        response = self.client.get(self.url, {'child': self.child.id, 'mode': 'summary', 'window': '1d'})
+        self.assertEqual(response.status_code, 200)
+        heartbeats = response.data['heartbeats']
+        self.assertEqual(heartbeats['count'], 3)
+        self.assertEqual(heartbeats['bpm']['avg'], 80)
+        self.assertEqual((heartbeats['bpm']['min'], heartbeats['bpm']['max']), (60, 100))
+        self.assertEqual(heartbeats['latest']['bpm'], 100)
+        self.assertEqual(response.data['foods']['count'], 0)
+
+    def test_raw_mode_caps_each_section(self):
+        for bpm in range(5):
+            HeartBeat.objects.create(child=self.child, bpm=60 + bpm)
+        response = self.client.get(self.url, {'child': self.child.id, 'limit': 2, 'sections': 'heartbeats'})
+        self.assertEqual(list(response.data), ['heartbeats'])
+        self.assertEqual([row['bpm'] for row in response.data['heartbeats']['results']], [64, 63])
+        cursor = response.data['heartbeats']['next_cursor']
+        response = self.client.get(self.url, {
+            'child': self.child.id, 'limit': 2, 'sections': 'heartbeats', 'heartbeats_cursor': cursor,
+        })
+        self.assertEqual([row['bpm'] for row in response.data['heartbeats']['results']], [62, 61])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'mode': 'everything'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'mode': 'summary', 'window': '7y'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'sections': 'heartbeats,unknown'}).status_code, 400)
+
+
+class DashboardCacheTests(LogTestCase):
+    url = '/api/api/dashboard/'
+
+    def get(self, **headers):
+        return self.client.get(self.url, {'child': self.child.id, 'mode': 'summary'}, headers=headers)
+
+    def test_repeat_request_is_a_hit_and_etag_gives_304(self):
+        first = self.get()
+        second = self.get()
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(dashboard_cache.stats()['hits'], 1)
+        self.assertEqual(dashboard_cache.stats()['misses'], 1)
+        not_modified = self.get(if_none_match=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_new_log_invalidates_once_committed(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks() as callbacks:
+            HeartBeat.objects.create(child=self.child, bpm=70)
+            # Not committed yet: readers still get the cached response
+            self.assertEqual(self.get()['ETag'], etag)
+        for callback in callbacks:
+            callback()
+        response = self.get()
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['heartbeats']['count'], 1)
+
+    def test_other_childs_logs_keep_the_entry(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            HeartBeat.objects.create(child=self.other_child, bpm=70)
+        self.assertEqual(self.get()['ETag'], etag)
+
+    def test_namespaces_count_separately(self):
+        self.get()
+        dashboard_cache.get('stats:missing', namespace='stats')
+        self.assertEqual(dashboard_cache.stats()['misses'], 1)
+        self.assertEqual(dashboard_cache.stats('stats')['misses'], 1)
+        self.assertEqual(dashboard_cache.stats('caseload')['misses'], 0)
+
+
+class DownsampleTests(LogTestCase):
+    def series(self, size=1000, spike=500):
+        rows = [(T0 + timedelta(seconds=i), i, 70 + (i % 5)) for i in range(size)]
+        rows[spike] = (rows[spike][0], spike, 180)
+        return rows
+
+    def test_lttb_keeps_endpoints_and_peaks(self):
+        y = np.array([row[2] for row in self.series()], dtype=float)
+        kept = lttb(np.arange(len(y), dtype=float), y, 50)
+        self.assertEqual(len(kept), 50)
+        self.assertEqual((kept[0], kept[-1]), (0, len(y) - 1))
+        self.assertIn(500, kept)
+
+    def test_minmax_keeps_bucket_extremes(self):
+        sampled = downsample(self.series(), ['bpm'], 20, 'minmax')
+        self.assertLessEqual(len(sampled), 20)
+        self.assertIn(180, [row[2] for row in sampled])
+        self.assertIn(70, [row[2] for row in sampled])
+
+    def test_short_series_is_returned_as_is(self):
+        rows = self.series(size=10, spike=3)
+        self.assertEqual(downsample(rows, ['bpm'], 50), rows)
+
+    def test_points_parameter_on_list_endpoint(self):
+        bulk_insert(HeartBeat, [HeartBeat(child=self.child, bpm=60 + i % 30) for i in range(200)])
+        response = self.client.get('/api/api/heartbeats/', {'child': self.child.id, 'points': 20})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 200)
+        self.assertEqual(response.data['points'], 20)
+        self.assertEqual(self.client.get('/api/api/heartbeats/', {'child': self.child.id, 'points': 2}).status_code, 400)
+        self.assertEqual(
+            self.client.get('/api/api/heartbeats/', {'child': self.child.id, 'points': 20, 'method': 'x'}).status_code,
+            400
+        )
+
+
+class ExportTests(LogTestCase):
+    url = '/api/api/export/'
+
+    def setUp(self):
+        super().setUp()
+        bulk_insert(HeartBeat, [HeartBeat(child=self.child, bpm=bpm) for bpm in (60, 61, 62)])
+        Food.objects.create(child=self.child, food_type='rice', calories=200)
+        HeartBeat.objects.create(child=self.other_child, bpm=90)
+
+    def test_ndjson_streams_every_record_of_the_child(self):
+        response = self.client.get(self.url, {'child': self.child.id})
+        self.assertTrue(response.streaming)
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record['type'] for record in records], ['heartbeat'] * 3 + ['food'])
+        self.assertEqual([record['bpm'] for record in records[:3]], [60, 61, 62])
+
+    def test_csv_has_header_and_type_filter(self):
+        response = self.client.get(self.url, {'child': self.child.id, 'output': 'csv', 'types': 'food'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(','), export.CSV_COLUMNS)
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith('food,'))
+
+    def test_other_parents_child_is_not_exported(self):
+        self.assertEqual(self.client.get(self.url, {'child': self.other_child.id}).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'output': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'child': 'abc'}).data, {'child': 'Must be an integer.'})
+
+    def test_command_rejects_bad_time_bounds(self):
+        out = StringIO()
+        call_command('export_logs', '--child', str(self.child.id), '--since', '2025-01-01', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 4)
+        with self.assertRaisesMessage(CommandError, "--until must be an ISO date or datetime, got 'soon'"):
+            call_command('export_logs', '--child', str(self.child.id), '--until', 'soon', stdout=StringIO())
+
+    def test_async_chunks_match_sync_lines(self):
+        def lines(asynchronous):
+            return export.render(export.iter_records([self.child.id]), 'ndjson', asynchronous=asynchronous)
+
+        async def collect():
+            return [chunk async for chunk in lines(True)]
+
+        # async_to_sync runs the thread-sensitive reads back on this thread,
+        # which holds the test transaction
+        chunks = async_to_sync(collect)()
+        self.assertEqual(''.join(chunks), ''.join(lines(False)))
+
+
+@skipIf(columnar.pa is None, "pyarrow is not installed")
+class ColumnarExportTests(LogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = True
+        self.user.save()
+        bulk_insert(HeartBeat, [HeartBeat(child=self.child, bpm=bpm) for bpm in (60, 61, 62)])
+        HeartBeat.objects.create(child=self.other_child, bpm=90)
+
+    def read(self, response, reader):
+        return reader(columnar.pa.BufferReader(b''.join(response.streaming_content)))
+
+    def test_parquet_export_of_one_child(self):
+        response = self.client.get('/api/api/export/columnar/heartbeat/', {'child': self.child.id})
+        self.assertEqual(response.status_code, 200)
+        table = self.read(response, columnar.pq.read_table)
+        self.assertEqual(table.schema, columnar.table_schema('heartbeat'))
+        self.assertEqual(table.column('bpm').to_pylist(), [60, 61, 62])
+
+    def test_arrow_export_of_all_children(self):
+        response = self.client.get('/api/api/export/columnar/heartbeat/', {'output': 'arrow'})
+        table = self.read(response, lambda source: columnar.pa.ipc.open_file(source).read_all())
+        self.assertEqual(table.num_rows, 4)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get('/api/api/export/columnar/users/').status_code, 404)
+        self.assertEqual(self.client.get('/api/api/export/columnar/heartbeat/', {'child': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/api/export/columnar/heartbeat/', {'output': 'csv'}).status_code, 400)
+
+    def test_command_writes_one_file_per_table(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('export_columnar', '--output-dir', directory, '--tables', 'heartbeat,food',
+                         '--child', str(self.child.id), stdout=StringIO())
+            self.assertEqual(columnar.pq.read_table(os.path.join(directory, 'heartbeat.parquet')).num_rows, 3)
+            self.assertEqual(columnar.pq.read_table(os.path.join(directory, 'food.parquet')).num_rows, 0)
+            with self.assertRaisesMessage(CommandError, "--since must be an ISO date or datetime"):
+                call_command('export_columnar', '--output-dir', directory, '--since', 'May', stdout=StringIO())
+
+
+@skipIf(connection.vendor not in ('postgresql', 'sqlite'), "Needs a full-text search backend")
+class ScratchNotesSearchTests(LogTestCase):
+    url = '/api/api/scratchnotes/search/'
+
+    def note(self, text, child=None):
+        return ScratchNotes.objects.create(child=child or self.child, text=text)
+
+    def test_matches_are_ranked_and_limited_to_accessible_children(self):
+        weak = self.note('Slept well after a short fever in the morning')
+        strong = self.note('Fever again, fever at night, fever gone by noon')
+        self.note('Played outside all day')
+        self.note('Fever', child=self.other_child)
+        response = self.client.get(self.url, {'q': 'fever'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], [strong.id, weak.id])
+        self.assertIn('<mark>fever</mark>', response.data['results'][1]['highlight'])
+
+    def test_highlight_escapes_note_markup(self):
+        self.note('Rash <img src=x onerror=alert(1)> on the arm')
+        highlight = self.client.get(self.url, {'q': 'rash'}).data['results'][0]['highlight']
+        self.assertNotIn('<img', highlight)
+        self.assertIn('&lt;img src=x onerror=alert(1)&gt;', highlight)
+        self.assertTrue(highlight.startswith('<mark>Rash</mark>'))
+
+    def test_pages_by_offset(self):
+        for i in range(3):
+            self.note(f'Cough number {i}')
+        first = self.client.get(self.url, {'q': 'cough', 'limit': 2}).data
+        self.assertEqual((len(first['results']), first['next_offset']), (2, 2))
+        rest = self.client.get(self.url, {'q': 'cough', 'limit': 2, 'offset': 2}).data
+        self.assertEqual((len(rest['results']), rest['next_offset']), (1, None))
+
+    def test_render_highlight(self):
+        fragment = f'{search._MATCH_START}a&b{search._MATCH_STOP} <script>'
+        self.assertEqual(search.render_highlight(fragment), '<mark>a&amp;b</mark> &lt;script&gt;')
+        self.assertIsNone(search.render_highlight(None))
+
+
+class VitalsStatsTests(LogTestCase):
+    url = '/api/api/stats/'
+
+    def test_distribution_counts_and_percentiles(self):
+        bulk_insert(HeartBeat, [HeartBeat(child=self.child, bpm=bpm) for bpm in range(100, 111)])
+        HeartBeat.objects.create(child=self.other_child, bpm=150)
+        now = timezone.now()
+        stats = analytics.distribution(self.child.id, now - timedelta(days=1), now + timedelta(minutes=1))
+        heartbeat = stats['heartbeat_bpm']
+        self.assertEqual((heartbeat['count'], heartbeat['mean']), (11, 105))
+        self.assertEqual((heartbeat['percentiles']['p50'], heartbeat['percentiles']['p95']), (105, 109.5))
+        self.assertEqual(stats['sleep_hours'], {'count': 0})
+
+    def test_profiles_come_from_hourly_rollups(self):
+        bulk_insert(HeartBeat, [HeartBeat(child=self.child, bpm=bpm) for bpm in (100, 120)])
+        now = timezone.now()
+        profile = analytics.profiles(self.child.id, now - timedelta(days=2), now + timedelta(minutes=1), rolling_days=3)
+        heartbeat = profile['heartbeat_bpm']
+        self.assertEqual(heartbeat['daily'][-1]['mean'], 110)
+        self.assertEqual(heartbeat['daily'][-1]['rolling_mean'], 110)
+        self.assertIsNone(heartbeat['daily'][0]['mean'])
+        self.assertEqual(heartbeat['hour_of_day'][now.astimezone(dt_timezone.utc).hour], 110)
+        self.assertEqual(len(heartbeat['day_of_week']), 7)
+
+    def test_sleep_correlates_with_mood_and_energy(self):
+        for day, (mood, energy) in enumerate([('sad', 'low'), ('okay', 'medium'), ('happy', 'high'), ('excited', 'very high')]):
+            at = T0 + timedelta(days=day, hours=12)
+            backdate(Sleep.objects.create(child=self.child, hours=6 + day, sleep_quality='good'), at)
+            backdate(Behavior.objects.create(child=self.child, mood=mood, energy_level=energy), at)
+        backdate(Behavior.objects.create(child=self.child, mood='Meh', energy_level='high'), T0 + timedelta(hours=13))
+        result = analytics.sleep_mood(self.child.id, T0, T0 + timedelta(days=7))
+        self.assertEqual(result['same_day_mood'], {'days': 4, 'pearson': 1.0, 'spearman': 1.0})
+        self.assertEqual(result['next_day_mood']['days'], 3)
+        self.assertEqual(result['next_day_mood']['pearson'], 1.0)
+        self.assertEqual(result['same_day_energy']['days'], 4)
+        self.assertEqual(result['unscored_moods'], ['meh'])
+
+    def test_too_few_days_gives_no_correlation(self):
+        backdate(Sleep.objects.create(child=self.child, hours=8, sleep_quality='good'), T0)
+        backdate(Behavior.objects.create(child=self.child, mood='happy', energy_level='high'), T0)
+        result = analytics.sleep_mood(self.child.id, T0, T0 + timedelta(days=1))
+        self.assertEqual(result['same_day_mood'], {'days': 1, 'pearson': None, 'spearman': None})
+
+    def test_view_checks_access_and_supports_etags(self):
+        HeartBeat.objects.create(child=self.child, bpm=110)
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'child': self.other_child.id}).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'child': 'abc'}).data, {'child': 'Must be an integer.'})
+        self.assertEqual(self.client.get(self.url, {'child': self.child.id, 'rolling': 0}).status_code, 400)
+        response = self.client.get(self.url, {'child': self.child.id, 'window': '7d'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['distribution']['heartbeat_bpm']['count'], 1)
+        again = self.client.get(self.url, {'child': self.child.id, 'window': '7d'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+
+class CompactionTests(LogTestCase):
+    def setUp(self):
+        super().setUp()
+        # Three hours of irregularly spaced readings, and two recent raw ones
+        created = bulk_insert(HeartBeat, [HeartBeat(child=self.child, bpm=100 + (i * 7) % 40) for i in range(45)])
+        for i, beat in enumerate(created):
+            backdate(beat, T0 + timedelta(hours=i // 15, seconds=(i % 15) * 200 + (i * 37) % 11, microseconds=i))
+        bulk_insert(HeartBeat, [HeartBeat(child=self.child, bpm=bpm) for bpm in (120, 121)])
+        rollups.backfill()
+
+    def list_rows(self, **params):
+        rows, cursor = [], None
+        while True:
+            query = {'child': self.child.id, 'page_size': 7, **params}
+            if cursor:
+                query['cursor'] = cursor
+            response = self.client.get('/api/api/heartbeats/', query)
+            self.assertEqual(response.status_code, 200)
+            rows.extend((row['id'], row['created_at'], row['bpm']) for row in response.data['results'])
+            cursor = response.data['cursor']
+            if cursor is None:
+                return rows
+
+    def reads(self):
+        window = {'since': (T0 + timedelta(minutes=70)).isoformat(), 'until': (T0 + timedelta(minutes=150)).isoformat()}
+        export_response = self.client.get('/api/api/export/', {'child': self.child.id, 'types': 'heartbeat'})
+        return {
+            'list': self.list_rows(),
+            'window': self.list_rows(**window),
+            'downsample': self.client.get('/api/api/heartbeats/', {'child': self.child.id, 'points': 10}).data,
+            'export': b''.join(export_response.streaming_content),
+            'distribution': analytics.distribution(self.child.id, T0, T0 + timedelta(minutes=100)),
+            'rollups': list(VitalRollup.objects.order_by('granularity', 'bucket_start').values_list(
+                'granularity', 'bucket_start', 'count', 'minimum', 'maximum', 'total')),
+        }
+
+    def test_reads_are_unchanged_by_compaction(self):
+        before = self.reads()
+        self.assertEqual(len(before['list']), 47)
+        self.assertEqual(len(before['window']), 21)
+        rows, count, size = blocks.compact(T0 + timedelta(days=1))
+        self.assertEqual((rows, count), (45, 3))
+        self.assertEqual(HeartBeat.objects.count(), 2)
+        self.assertEqual(HeartBeatBlock.objects.count(), 3)
+        self.assertEqual(self.reads(), before)
+        # Rollups rebuilt from blocks match too
+        rollups.backfill()
+        self.assertEqual(self.reads()['rollups'], before['rollups'])
+
+    def test_late_rows_are_merged_into_the_existing_block(self):
+        blocks.compact(T0 + timedelta(days=1))
+        late = backdate(HeartBeat.objects.create(child=self.child, bpm=99), T0 + timedelta(minutes=30))
+        before = self.list_rows()
+        blocks.compact(T0 + timedelta(days=1))
+        block = HeartBeatBlock.objects.get(hour=T0)
+        self.assertEqual((block.count, block.minimum), (16, 99))
+        self.assertIn(late.id, [sample[0] for sample in blocks.block_samples(block)])
+        self.assertEqual(self.list_rows(), before)
+
+    def test_encode_round_trip(self):
+        ids = [5, 9, 10, 40]
+        times_us = [1_000_000, 2_000_000, 2_500_003, 4_000_000]
+        data, interval = blocks.encode(ids, times_us, [80, 75, 160, 90])
+        block = HeartBeatBlock(start_at=blocks._from_us(times_us[0]), count=4, interval_us=interval, data=data)
+        decoded = blocks.decode(block)
+        self.assertEqual([list(array) for array in decoded], [ids, times_us, [80, 75, 160, 90]])
+
+    def test_dry_run_writes_nothing(self):
+        rows, count, _ = blocks.compact(T0 + timedelta(days=1), dry_run=True)
+        self.assertEqual((rows, count), (45, 3))
+        self.assertEqual(HeartBeat.objects.count(), 47)
+        self.assertFalse(HeartBeatBlock.objects.exists())
+
+
+class PartitionHelperTests(TestCase):
+    def test_month_arithmetic(self):
+        self.assertEqual(partitions.month_start(datetime(2025, 3, 31, 23, 59, tzinfo=dt_timezone.utc)), T0.replace(day=1))
+        self.assertEqual(partitions.add_months(datetime(2025, 11, 1, tzinfo=dt_timezone.utc), 3),
+                         datetime(2026, 2, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitions.add_months(datetime(2025, 1, 1, tzinfo=dt_timezone.utc), -1),
+                         datetime(2024, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitions.partition_name('log_heartbeat', T0), 'log_heartbeat_p2025_03')
+
+    @skipIf(connection.vendor == 'postgresql', "Checks the fallback of other backends")
+    def test_command_does_nothing_without_postgres(self):
+        out = StringIO()
+        call_command('manage_partitions', stdout=out)
+        self.assertIn('only partitioned on PostgreSQL', out.getvalue())
+        self.assertEqual(partitions.maintain(), [])
+
+
+@skipUnless(connection.vendor == 'postgresql', "Partitioning needs PostgreSQL")
+class PartitionTests(LogTestCase):
+    table = HeartBeat._meta.db_table
+
+    def existing(self):
+        with connection.cursor() as cursor:
+            return partitions.monthly_partitions(cursor, self.table)
+
+    def test_tables_are_partitioned_by_month(self):
+        with connection.cursor() as cursor:
+            self.assertTrue(partitions.is_partitioned(cursor, self.table))
+        partitions.maintain(months_ahead=2)
+        current = partitions.month_start(timezone.now())
+        for offset in range(3):
+            self.assertIn(partitions.add_months(current, offset), self.existing())
+
+    def test_rows_in_the_default_partition_move_to_a_new_month(self):
+        month = datetime(2031, 6, 1, tzinfo=dt_timezone.utc)
+        beat = backdate(HeartBeat.objects.create(child=self.child, bpm=110), month + timedelta(days=3))
+        now = partitions.add_months(month, -1)
+        actions = partitions.maintain(months_ahead=1, now=now)
+        self.assertIn((self.table, 'create', partitions.partition_name(self.table, month)), actions)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {partitions.partition_name(self.table, month)}")
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertEqual(HeartBeat.objects.get().id, beat.id)
+
+    def test_dry_run_and_retention(self):
+        now = timezone.now()
+        planned = partitions.maintain(months_ahead=12, dry_run=True, now=now)
+        self.assertTrue(planned)
+        self.assertEqual(partitions.maintain(months_ahead=12, dry_run=True, now=now), planned)
+        partitions.maintain(months_ahead=12, now=now)
+        self.assertEqual(partitions.maintain(months_ahead=12, now=now), [])
+
+        old = min(self.existing())
+        retired = partitions.maintain(months_ahead=0, retention_months=0, archive='detach',
+                                      now=partitions.add_months(old, 2))
+        self.assertIn((self.table, 'detach', partitions.partition_name(self.table, old)), retired)
+        self.assertNotIn(old, self.existing())
+
+
+class CaseloadTests(LogTestCase):
+    url = '/api/api/caseload/'
+
+    def setUp(self):
+        super().setUp()
+        from appointment.models import Appointment, Availability
+        from communication.models import ChatRoom
+        from core.models import Parent, Therapist
+
+        self.therapist = make_user('therapist@example.com', role='therapist')
+        # Linked through a chat room, and through an appointment the parent booked
+        ChatRoom.objects.create(parent=self.other, therapist=self.therapist, child=self.other_child)
+        availability = Availability.objects.create(
+            therapist=Therapist.objects.create(user=self.therapist, edu_document='edu_documents/cv.pdf'),
+            start_time=T0, end_time=T0 + timedelta(hours=1),
+        )
+        Appointment.objects.create(parent=Parent.objects.create(user=self.user), availability=availability)
+        make_child(make_user('stranger@example.com'), 'Kim')
+        self.client.force_authenticate(self.therapist)
+
+    def test_parents_are_forbidden(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_summaries_of_linked_children(self):
+        bulk_insert(HeartBeat, [HeartBeat(child=self.child, bpm=bpm) for bpm in (100, 120)])
+        HeartBeat.objects.create(child=self.other_child, bpm=250)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        children = {row['name'].split()[0]: row for row in response.data['children']}
+        self.assertEqual(list(children), ['Alex', 'Sam'])
+        heartbeat = children['Sam']['vitals']['heartbeat_bpm']
+        self.assertEqual((heartbeat['count'], heartbeat['avg'], heartbeat['min'], heartbeat['max']), (2, 110, 100, 120))
+        self.assertEqual(children['Sam']['latest']['heartbeat_bpm'], 120)
+        self.assertEqual(children['Sam']['anomalies']['count'], 0)
+        self.assertEqual(children['Alex']['anomalies']['count'], 1)
+
+        again = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_query_count_does_not_grow_with_the_caseload(self):
+        from communication.models import ChatRoom
+
+        def queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.client.get(self.url).status_code, 200)
+            return len(captured)
+
+        HeartBeat.objects.create(child=self.child, bpm=110)
+        small = queries()
+        for i in range(5):
+            child = make_child(self.other, f'Extra{i}')
+            ChatRoom.objects.create(parent=self.other, therapist=self.therapist, child=child)
+            HeartBeat.objects.create(child=child, bpm=110)
+        self.assertEqual(queries(), small)
+
+    def test_anomalies_of_linked_children_are_listed(self):
+        stranger_child = ChildProfile.objects.get(first_name='Kim')
+        HeartBeat.objects.create(child=self.other_child, bpm=250)
+        HeartBeat.objects.create(child=stranger_child, bpm=250)
+        response = self.client.get('/api/api/anomalies/')
+        self.assertEqual([row['child'] for row in response.data['results']], [self.other_child.id])
+        self.assertEqual(self.client.get('/api/api/anomalies/', {'child': stranger_child.id}).data['results'], [])
+        self.assertEqual(self.client.get('/api/api/anomalies/', {'child': 'abc'}).status_code, 400)
+
+
+class SyncTests(LogTestCase):
+    url = '/api/api/sync/'
+
+    def sync(self, cursor=0, **params):
+        response = self.client.get(self.url, {'cursor': cursor, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_first_sync_returns_children_and_logs(self):
+        beat = HeartBeat.objects.create(child=self.child, bpm=70)
+        data = self.sync()
+        changes = {(change['resource'], change['id']): change for change in data['changes']}
+        self.assertEqual(changes[('child', self.child.id)]['op'], 'upsert')
+        self.assertEqual(changes[('heartbeat', beat.id)]['data']['bpm'], 70)
+        self.assertNotIn(('child', self.other_child.id), changes)
+        self.assertFalse(data['has_more'])
+
+    def test_cursor_returns_only_later_changes_with_latest_state(self):
+        cursor = self.sync()['cursor']
+        note = ScratchNotes.objects.create(child=self.child, text='first')
+        note.text = 'edited'
+        note.save()
+        gone = HeartBeat.objects.create(child=self.child, bpm=70)
+        gone_id = gone.id
+        gone.delete()
+        data = self.sync(cursor)
+        self.assertEqual(
+            [(change['resource'], change['id'], change['op']) for change in data['changes']],
+            [('scratchnotes', note.id, 'upsert'), ('heartbeat', gone_id, 'delete')],
+        )
+        self.assertEqual(data['changes'][0]['data']['text'], 'edited')
+        self.assertIsNone(data['changes'][1]['data'])
+        self.assertEqual(self.sync(data['cursor'])['changes'], [])
+
+    def test_limit_pages_with_has_more(self):
+        bulk_insert(HeartBeat, [HeartBeat(child=self.child, bpm=bpm) for bpm in range(60, 65)])
+        seen, cursor, has_more = [], 0, True
+        while has_more:
+            data = self.sync(cursor, limit=2)
+            seen.extend(change['id'] for change in data['changes'] if change['resource'] == 'heartbeat')
+            cursor, has_more = data['cursor'], data['has_more']
+        self.assertEqual(len(seen), 5)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'abc'}).status_code, 400)
+
+
+class WriteBehindBufferTests(LogTestCase):
+    # The flusher thread is not started; _flush is driven by hand instead
+
+    def make_buffer(self, max_rows=2, max_queue=5):
+        return write_buffer.WriteBehindBuffer(HeartBeat, max_rows=max_rows, flush_interval=1, max_queue=max_queue)
+
+    def readings(self, count):
+        return [HeartBeat(child=self.child, bpm=60 + i) for i in range(count)]
+
+    def test_flush_resolves_futures_with_saved_rows(self):
+        buffer = self.make_buffer()
+        first, second = buffer.submit(self.readings(3)), buffer.submit(self.readings(1))
+        buffer._flush(list(buffer._pending))
+        self.assertEqual(len(first.result(timeout=0)), 3)
+        self.assertTrue(all(instance.pk for instance in second.result(timeout=0)))
+        self.assertEqual(HeartBeat.objects.filter(child=self.child).count(), 4)
+        self.assertEqual(buffer.metrics()['flushed_rows'], 4)
+
+    def test_full_queue_rejects_instead_of_growing(self):
+        buffer = self.make_buffer(max_queue=5)
+        buffer.submit(self.readings(4))
+        with self.assertRaises(write_buffer.BufferFull):
+            buffer.submit(self.readings(2))
+        self.assertEqual(buffer.metrics()['queue_depth'], 4)
+        self.assertEqual(buffer.metrics()['rejected_rows'], 2)
+
+    def test_failed_submit_is_all_or_nothing(self):
+        buffer = self.make_buffer(max_rows=2)
+        future = buffer.submit(self.readings(4))
+        with mock.patch('log.ingest.logs_created.send', side_effect=RuntimeError("disk full")), \
+                self.assertLogs('log.buffer', 'ERROR'):
+            buffer._flush(list(buffer._pending))
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=0)
+        # The rows were inserted, then rolled back
+        self.assertFalse(HeartBeat.objects.filter(child=self.child).exists())
+        self.assertEqual(buffer.metrics()['failed_rows'], 4)
+
+    def test_failed_submit_does_not_fail_the_others(self):
+        buffer = self.make_buffer(max_rows=10)
+        good = buffer.submit(self.readings(2))
+        bad = buffer.submit([HeartBeat(child=self.child, bpm=999)])
+        later = buffer.submit(self.readings(1))
+        real_insert = write_buffer.bulk_insert
+        calls = []
+
+        def failing_insert(model, objs):
+            calls.append(len(objs))
+            if any(instance.bpm == 999 for instance in objs):
+                raise RuntimeError("child deleted")
+            return real_insert(model, objs)
+
+        with mock.patch.object(write_buffer, 'bulk_insert', failing_insert), self.assertLogs('log.buffer', 'ERROR'):
+            buffer._flush(list(buffer._pending))
+        # One insert for the chunk, then one per submit
+        self.assertEqual(calls, [4, 2, 1, 1])
+        with self.assertRaises(RuntimeError):
+            bad.result(timeout=0)
+        self.assertEqual([len(good.result(timeout=0)), len(later.result(timeout=0))], [2, 1])
+        self.assertEqual(sorted(HeartBeat.objects.filter(child=self.child).values_list('bpm', flat=True)), [60, 60, 61])
+        metrics = buffer.metrics()
+        self.assertEqual((metrics['flushed_rows'], metrics['failed_rows']), (3, 1))
+
+    def test_endpoint_writes_directly_when_disabled(self):
+        response = self.client.post(
+            '/api/api/heartbeats/buffered/', {'child': self.child.id, 'readings': [{'bpm': 70}, {'bpm': 71}]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['ids']), 2)
+
+    def test_flush_ack_under_asgi_does_not_wait_on_the_buffer(self):
+        buffer = self.make_buffer(max_queue=100)
+        # Test requests are WSGIRequests; treat them as ASGI ones
+        with mock.patch.object(write_buffer, 'get_heartbeat_buffer', return_value=buffer), \
+                mock.patch.object(views, 'ASGIRequest', WSGIRequest):
+            response = self.client.post(
+                '/api/api/heartbeats/buffered/?ack=flush', {'child': self.child.id, 'bpm': 70}, format='json'
+            )
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(buffer.metrics()['queue_depth'], 0)
+            response = self.client.post('/api/api/heartbeats/buffered/', {'child': self.child.id, 'bpm': 71}, format='json')
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(buffer.metrics()['queue_depth'], 1)
+
+
+class LatestVitalsTests(LogTestCase):
+    url = '/api/api/latest/'
+
+    def test_older_reading_arriving_late_does_not_win(self):
+        newest = HeartBeat.objects.create(child=self.child, bpm=70)
+        # e.g. a device catching up on readings taken while it was offline
+        latest.apply_latest(HeartBeat, [HeartBeat(id=newest.id + 1, child=self.child, bpm=50, created_at=T0)])
+        vitals = LatestVitals.objects.get(child=self.child)
+        self.assertEqual((vitals.heartbeat_bpm, vitals.heartbeat_at), (70, newest.created_at))
+
+    def test_delete_falls_back_to_previous_reading(self):
+        HeartBeat.objects.create(child=self.child, bpm=70)
+        newest = HeartBeat.objects.create(child=self.child, bpm=90)
+        self.assertEqual(LatestVitals.objects.get(child=self.child).heartbeat_bpm, 90)
+        newest.delete()
+        self.assertEqual(LatestVitals.objects.get(child=self.child).heartbeat_bpm, 70)
+
+    def test_endpoint_returns_own_children_only(self):
+        Food.objects.create(child=self.child, food_type='rice', calories=200)
+        Food.objects.create(child=self.other_child, food_type='soup', calories=100)
+        response = self.client.get(self.url)
+        self.assertEqual([row['child'] for row in response.data], [self.child.id])
+        self.assertEqual(response.data[0]['food_type'], 'rice')
+        self.assertEqual(self.client.get(self.url, {'children': 'a,b'}).status_code, 400)
+
+    def test_therapist_sees_linked_children(self):
+        from communication.models import ChatRoom
+        therapist = make_user('therapist@example.com', role='therapist')
+        ChatRoom.objects.create(parent=self.other, therapist=therapist, child=self.other_child)
+        HeartBeat.objects.create(child=self.child, bpm=70)
+        HeartBeat.objects.create(child=self.other_child, bpm=80)
+        self.client.force_authenticate(therapist)
+        response = self.client.get(self.url)
+        self.assertEqual([(row['child'], row['heartbeat_bpm']) for row in response.data], [(self.other_child.id, 80)])
+
+
+class AnomalyDetectionTests(LogTestCase):
+    # The test children are born today, so the under-1 band (90-180 bpm) applies
+
+    def steady(self, count=30):
+        bulk_insert(HeartBeat, [HeartBeat(child=self.child, bpm=118 + i % 5) for i in range(count)])
+
+    def test_out_of_range_reading_is_flagged_and_kept_out_of_baseline(self):
+        self.steady(5)
+        before = VitalBaseline.objects.get(child=self.child, metric='heartbeat_bpm')
+        HeartBeat.objects.create(child=self.child, bpm=220)
+        flagged = VitalAnomaly.objects.get()
+        self.assertEqual((flagged.reason, flagged.value), ('out_of_range', 220))
+        after = VitalBaseline.objects.get(child=self.child, metric='heartbeat_bpm')
+        self.assertEqual((after.samples, after.mean), (before.samples, before.mean))
+
+    def test_deviation_from_baseline_after_warmup(self):
+        self.steady()
+        self.assertFalse(VitalAnomaly.objects.exists())
+        HeartBeat.objects.create(child=self.child, bpm=170)
+        flagged = VitalAnomaly.objects.get()
+        self.assertEqual(flagged.reason, 'deviation')
+        self.assertGreater(flagged.z_score, anomaly.detection_settings()['Z_THRESHOLD'])
+
+    def test_no_deviation_during_warmup(self):
+        self.steady(5)
+        HeartBeat.objects.create(child=self.child, bpm=170)
+        self.assertFalse(VitalAnomaly.objects.exists())
+
+    def test_replay_matches_streaming_detection(self):
+        self.steady()
+        for bpm in (170, 121, 200, 119):
+            HeartBeat.objects.create(child=self.child, bpm=bpm)
+        frame, baselines = anomaly.replay(HeartBeat)
+        self.assertEqual(
+            sorted(zip(frame['reading_id'], frame['reason'])),
+            sorted(VitalAnomaly.objects.values_list('reading_id', 'reason')),
+        )
+        stored = VitalBaseline.objects.get(child=self.child, metric='heartbeat_bpm')
+        samples, mean, _ = baselines[(self.child.id, 'heartbeat_bpm')]
+        self.assertEqual(samples, stored.samples)
+        self.assertAlmostEqual(mean, stored.mean)
+
+    def test_replay_command(self):
+        self.steady(5)
+        HeartBeat.objects.create(child=self.child, bpm=220)
+        out = StringIO()
+        call_command('replay_anomalies', '--since', '2025-01-01', stdout=out)
+        self.assertIn('Replay flagged 1 readings', out.getvalue())
+        with self.assertRaisesMessage(CommandError, "--since must be an ISO date or datetime"):
+            call_command('replay_anomalies', '--since', 'yesterday', stdout=StringIO())
 
-# Create your tests here.
+    def test_endpoint_lists_own_anomalies(self):
+        HeartBeat.objects.create(child=self.child, bpm=220)
+        HeartBeat.objects.create(child=self.other_child, bpm=220)
+        response = self.client.get('/api/api/anomalies/', {'metric': 'heartbeat_bpm'})
+        self.assertEqual([row['child'] for row in response.data['results']], [self.child.id])
@@ -1,6 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ChildViewSet, HeartBeatViewSet, BehaviorViewSet, FoodViewSet, SleepViewSet, BloodPressureViewSet, ScratchNotesViewSet, DashboardView
+from .views import (
+    ChildViewSet, HeartBeatViewSet, BehaviorViewSet, FoodViewSet, SleepViewSet, BloodPressureViewSet,
+    ScratchNotesViewSet, DashboardView, BulkIngestView, DashboardCacheStatsView, ExportView,
+    ColumnarExportView, SyncView, BufferedHeartBeatView, HeartBeatBufferStatsView,
+    LatestVitalsView, VitalAnomalyViewSet, ScratchNotesSearchView, VitalsStatsView, CaseloadView
+)
 
 router = DefaultRouter()
 router.register(r'children', ChildViewSet, basename='child')
@@ -10,8 +15,20 @@ router.register(r'foods', FoodViewSet, basename='food')
 router.register(r'sleeps', SleepViewSet, basename='sleep')
 router.register(r'bloodpressures', BloodPressureViewSet, basename='bloodpressure')
 router.register(r'scratchnotes', ScratchNotesViewSet, basename='scratchnotes')
+router.register(r'anomalies', VitalAnomalyViewSet, basename='anomaly')
 
 urlpatterns = [
+    path('api/heartbeats/buffered/', BufferedHeartBeatView.as_view(), name='heartbeat-buffered'),
+    path('api/heartbeats/buffer-stats/', HeartBeatBufferStatsView.as_view(), name='heartbeat-buffer-stats'),
+    path('api/scratchnotes/search/', ScratchNotesSearchView.as_view(), name='scratchnotes-search'),
     path('api/', include(router.urls)),
     path('api/dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('api/dashboard/cache-stats/', DashboardCacheStatsView.as_view(), name='dashboard-cache-stats'),
+    path('api/ingest/', BulkIngestView.as_view(), name='bulk-ingest'),
+    path('api/export/', ExportView.as_view(), name='export'),
+    path('api/sync/', SyncView.as_view(), name='sync'),
+    path('api/latest/', LatestVitalsView.as_view(), name='latest-vitals'),
+    path('api/stats/', VitalsStatsView.as_view(), name='vitals-stats'),
+    path('api/caseload/', CaseloadView.as_view(), name='therapist-caseload'),
+    path('api/export/columnar/<str:table>/', ColumnarExportView.as_view(), name='export-columnar'),
 ]
\ No newline at end of file
@@ -1,15 +1,38 @@
 # Create your views here.
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 
 from core.models import ChildProfile
+from core.access import accessible_children
+from core.idempotency import IdempotentCreateMixin, run_idempotent
 from .models import  HeartBeat, Behavior, Food, Sleep, BloodPressure, ScratchNotes
 from .serializers import (
     ChildSerializer, HeartBeatSerializer, BehaviorSerializer,
     FoodSerializer, SleepSerializer, BloodPressureSerializer, ScratchNotesSerializer
 )
+from .ingest import ingest_records, bulk_insert, MAX_BATCH_SIZE
+from .pagination import LogCursorPagination, BlockCursorPagination, filter_time_range, parse_time_bound, keyset_page
+from .dashboard import parse_window, summarize, caseload
+from . import cache as dashboard_cache
+from . import export
+from . import columnar
+from . import sync
+from . import buffer as write_buffer
+from . import search
+from . import analytics
+from . import blocks
+from .serializers import HeartBeatBatchSerializer, LatestVitalsSerializer, VitalAnomalySerializer
+from .models import LatestVitals, VitalAnomaly, HeartBeatBlock
+from .rollups import rollup_series, GRANULARITIES
+from .downsample import downsample, MAX_POINTS, METHODS as DOWNSAMPLE_METHODS
 from django.utils import timezone
+from django.utils.http import parse_etags
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse, FileResponse
+import tempfile
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import timedelta
 
 
@@ -26,23 +49,93 @@ class ChildViewSet(viewsets.ModelViewSet):
         # Automatically set the parent to the authenticated user
         serializer.save(parent=self.request.user)
 
-class HeartBeatViewSet(viewsets.ModelViewSet):
+class LogViewSetMixin(IdempotentCreateMixin):
+    # Shared by the log viewsets: newest-first keyset pages, since/until filters
+    # and Idempotency-Key support on POST
+    pagination_class = LogCursorPagination
+
+    def filter_time_range(self, queryset):
+        return filter_time_range(queryset, self.request.query_params)
+
+class DownsampleMixin:
+    # ?points=N returns about N points per field over the since/until window,
+    # downsampled on the server (?method=lttb, the default, or minmax).
+    downsample_fields = []
+
+    def list(self, request, *args, **kwargs):
+        points = request.query_params.get('points')
+        if points is None:
+            return super().list(request, *args, **kwargs)
+
+        try:
+            points = int(points)
+        except ValueError:
+            return Response({'error': 'points must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 3 <= points <= MAX_POINTS:
+            return Response({'error': f'points must be between 3 and {MAX_POINTS}'}, status=status.HTTP_400_BAD_REQUEST)
+        method = request.query_params.get('method', 'lttb')
+        if method not in DOWNSAMPLE_METHODS:
+            return Response({'error': 'method must be lttb or minmax'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = self.downsample_rows(self.filter_queryset(self.get_queryset()))
+        sampled = downsample(rows, self.downsample_fields, points, method)
+        fields = ['created_at', 'id', *self.downsample_fields]
+        return Response({
+            'total': len(rows),
+            'points': len(sampled),
+            'method': method,
+            'results': [dict(zip(fields, row)) for row in sampled],
+        })
+
+    def downsample_rows(self, queryset):
+        # (created_at, id, *fields) tuples, oldest first
+        return list(queryset.order_by('created_at', 'id').values_list('created_at', 'id', *self.downsample_fields))
+
+class HeartBeatViewSet(DownsampleMixin, LogViewSetMixin, viewsets.ModelViewSet):
     serializer_class = HeartBeatSerializer
+    downsample_fields = ['bpm']
     permission_classes = [permissions.IsAuthenticated]
+    # Lists include samples compacted into HeartBeatBlock (read-only)
+    pagination_class = BlockCursorPagination
 
     def get_queryset(self):
         # Only return heartbeats for the user's children
         child_id = self.request.query_params.get('child')
         if child_id:
-            return HeartBeat.objects.filter(child__id=child_id, child__parent=self.request.user)
+            return self.filter_time_range(
+                HeartBeat.objects.filter(child__id=child_id, child__parent=self.request.user)
+            )
         return HeartBeat.objects.none()
-        
+
+    def get_block_queryset(self):
+        child_id = self.request.query_params.get('child')
+        if not child_id:
+            return HeartBeatBlock.objects.none()
+        since, until = self.time_bounds()
+        return blocks.blocks_in_range(since, until, child_id=child_id, child__parent=self.request.user)
+
+    def time_bounds(self):
+        since = self.request.query_params.get('since')
+        until = self.request.query_params.get('until')
+        return (
+            parse_time_bound(since, 'since') if since else None,
+            parse_time_bound(until, 'until') if until else None,
+        )
+
+    def downsample_rows(self, queryset):
+        since, until = self.time_bounds()
+        rows = super().downsample_rows(queryset)
+        for block in self.get_block_queryset():
+            rows.extend((created_at, pk, bpm) for pk, _, created_at, bpm in blocks.block_samples(block, since, until))
+        rows.sort(key=lambda row: (row[0], row[1]))
+        return rows
+
 
     def perform_create(self, serializer):
         # Ensure the child belongs to the authenticated user
         serializer.save()
 
-class BehaviorViewSet(viewsets.ModelViewSet):
+class BehaviorViewSet(LogViewSetMixin, viewsets.ModelViewSet):
     serializer_class = BehaviorSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -50,13 +143,15 @@ class BehaviorViewSet(viewsets.ModelViewSet):
         # Only return behaviors for the user's children
         child_id = self.request.query_params.get('child')
         if child_id:
-            return Behavior.objects.filter(child__id=child_id, child__parent=self.request.user)
+            return self.filter_time_range(
+                Behavior.objects.filter(child__id=child_id, child__parent=self.request.user)
+            )
         return Behavior.objects.none()
 
     def perform_create(self, serializer):
         serializer.save()
 
-class FoodViewSet(viewsets.ModelViewSet):
+class FoodViewSet(LogViewSetMixin, viewsets.ModelViewSet):
     serializer_class = FoodSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -64,13 +159,15 @@ class FoodViewSet(viewsets.ModelViewSet):
         # Only return foods for the user's children
         child_id = self.request.query_params.get('child')
         if child_id:
-            return Food.objects.filter(child__id=child_id, child__parent=self.request.user)
+            return self.filter_time_range(
+                Food.objects.filter(child__id=child_id, child__parent=self.request.user)
+            )
         return Food.objects.none()
 
     def perform_create(self, serializer):
         serializer.save()
 
-class SleepViewSet(viewsets.ModelViewSet):
+class SleepViewSet(LogViewSetMixin, viewsets.ModelViewSet):
     serializer_class = SleepSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -78,26 +175,31 @@ class SleepViewSet(viewsets.ModelViewSet):
         # Only return sleeps for the user's children
         child_id = self.request.query_params.get('child')
         if child_id:
-            return Sleep.objects.filter(child__id=child_id, child__parent=self.request.user)
+            return self.filter_time_range(
+                Sleep.objects.filter(child__id=child_id, child__parent=self.request.user)
+            )
         return Sleep.objects.none()
     def perform_create(self, serializer):
         serializer.save()
 
-class BloodPressureViewSet(viewsets.ModelViewSet):
+class BloodPressureViewSet(DownsampleMixin, LogViewSetMixin, viewsets.ModelViewSet):
     serializer_class = BloodPressureSerializer
+    downsample_fields = ['systolic', 'dystolic']
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         # Only return blood pressures for the user's children
         child_id = self.request.query_params.get('child')
         if child_id:
-            return BloodPressure.objects.filter(child__id=child_id, child__parent=self.request.user)
+            return self.filter_time_range(
+                BloodPressure.objects.filter(child__id=child_id, child__parent=self.request.user)
+            )
         return BloodPressure.objects.none()
 
     def perform_create(self, serializer):
         serializer.save()
 
-class ScratchNotesViewSet(viewsets.ModelViewSet):
+class ScratchNotesViewSet(LogViewSetMixin, viewsets.ModelViewSet):
     serializer_class = ScratchNotesSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -105,20 +207,95 @@ class ScratchNotesViewSet(viewsets.ModelViewSet):
         # Only return scratch notes for the user's children
         child_id = self.request.query_params.get('child')
         if child_id:
-            return ScratchNotes.objects.filter(child__id=child_id, child__parent=self.request.user)
+            return self.filter_time_range(
+                ScratchNotes.objects.filter(child__id=child_id, child__parent=self.request.user)
+            )
         return ScratchNotes.objects.none()
 
     def perform_create(self, serializer):
         serializer.save()
 
+class ScratchNotesSearchView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # Full-text search over the notes of every child the user can see,
+        # best match first. ?q= is required; ?child=, ?since=, ?until=,
+        # ?limit= (max 100) and ?offset= are optional.
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', 20))
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            return Response({'error': 'limit and offset must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= limit <= search.MAX_RESULTS or offset < 0:
+            return Response({'error': f'limit must be between 1 and {search.MAX_RESULTS}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        children = accessible_children(request.user)
+        child_id = request.query_params.get('child')
+        if child_id:
+            children = children.filter(id=child_id)
+        since = request.query_params.get('since')
+        until = request.query_params.get('until')
+
+        matches = search.search_notes(
+            children.values_list('id', flat=True),
+            query,
+            since=parse_time_bound(since, 'since') if since else None,
+            until=parse_time_bound(until, 'until') if until else None,
+            limit=limit + 1,
+            offset=offset,
+        )
+        results = [
+            {**ScratchNotesSerializer(note).data, 'rank': rank, 'highlight': highlight}
+            for note, rank, highlight in matches[:limit]
+        ]
+        return Response({
+            'next_offset': offset + limit if len(matches) > limit else None,
+            'results': results,
+        })
+
+
 class DashboardView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    # Raw mode returns at most this many rows per section and page
+    default_limit = 50
+    max_limit = 500
+
+    sections = {
+        'heartbeats': (HeartBeat, HeartBeatSerializer),
+        'behaviors': (Behavior, BehaviorSerializer),
+        'foods': (Food, FoodSerializer),
+        'sleeps': (Sleep, SleepSerializer),
+        'bloodpressures': (BloodPressure, BloodPressureSerializer),
+        'scratchnotes': (ScratchNotes, ScratchNotesSerializer),
+    }
+
     def get(self, request):
+        # Responses are cached per user and query, and invalidated by log writes
+        key = dashboard_cache.cache_key(request)
+        entry = dashboard_cache.get(key)
+        if entry is None:
+            response = self.build(request)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = dashboard_cache.store(key, response.data)
+
+        etag, data = entry
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(data, headers={'ETag': etag})
+
+    def build(self, request):
         # Get optional query parameter for filtering by child
         child_id = request.query_params.get('child')
-        
-       
+        mode = request.query_params.get('mode', 'raw')
+
+        if mode == 'rollup':
+            return self.get_rollups(request, child_id)
 
         # Base filter for related models (excluding Child for now)
         queryset_filter = {}
@@ -126,25 +303,384 @@ class DashboardView(APIView):
             queryset_filter['child_id'] = child_id
 
         queryset_filter['child__parent'] = self.request.user  # Ensure only user's children
-        # Aggregate data for all models
-        data = {
-            'heartbeats': HeartBeatSerializer(
-                HeartBeat.objects.filter(**queryset_filter), many=True
-            ).data,
-            'behaviors': BehaviorSerializer(
-                Behavior.objects.filter(**queryset_filter), many=True
-            ).data,
-            'foods': FoodSerializer(
-                Food.objects.filter(**queryset_filter), many=True
-            ).data,
-            'sleeps': SleepSerializer(
-                Sleep.objects.filter(**queryset_filter), many=True
-            ).data,
-            'bloodpressures': BloodPressureSerializer(
-                BloodPressure.objects.filter(**queryset_filter), many=True
-            ).data,
-            'scratchnotes': ScratchNotesSerializer(
-                ScratchNotes.objects.filter(**queryset_filter), many=True
-            ).data,
-        }
-        return Response(data)
\ No newline at end of file
+
+        if mode == 'summary':
+            window = parse_window(request.query_params.get('window', '7d'))
+            return Response(summarize(queryset_filter, window))
+        if mode != 'raw':
+            return Response({'error': 'mode must be raw, summary or rollup'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Raw rows, newest first, one capped page per section. Each section pages
+        # on its own through ?<section>_cursor=, and ?sections= limits the sections.
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', self.default_limit)), self.max_limit))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        requested = request.query_params.get('sections')
+        names = requested.split(',') if requested else list(self.sections)
+        unknown = [name for name in names if name not in self.sections]
+        if unknown:
+            return Response({'error': f"Unknown sections: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        since = request.query_params.get('since')
+        until = request.query_params.get('until')
+        since = parse_time_bound(since, 'since') if since else None
+        until = parse_time_bound(until, 'until') if until else None
+
+        data = {}
+        for name in names:
+            model, serializer_class = self.sections[name]
+            queryset = filter_time_range(model.objects.filter(**queryset_filter), request.query_params)
+            cursor = request.query_params.get(f'{name}_cursor')
+            if model is HeartBeat:
+                # Include samples compacted into blocks
+                block_queryset = blocks.blocks_in_range(since, until, **queryset_filter)
+                rows, next_cursor = blocks.keyset_page(queryset, block_queryset, cursor, limit, since, until)
+            else:
+                rows, next_cursor = keyset_page(queryset, cursor, limit)
+            data[name] = {
+                'results': serializer_class(rows, many=True).data,
+                'next_cursor': next_cursor,
+            }
+        return Response(data)
+
+    def get_rollups(self, request, child_id):
+        # Per-bucket vitals read from the rollup tables instead of raw rows
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return Response({'error': 'granularity must be hour or day'}, status=status.HTTP_400_BAD_REQUEST)
+
+        since = request.query_params.get('since')
+        until = request.query_params.get('until')
+        children = ChildProfile.objects.filter(parent=request.user)
+        if child_id:
+            children = children.filter(id=child_id)
+
+        series = rollup_series(
+            list(children.values_list('id', flat=True)),
+            granularity=granularity,
+            since=parse_time_bound(since, 'since') if since else None,
+            until=parse_time_bound(until, 'until') if until else None,
+        )
+        return Response({'granularity': granularity, 'children': series})
+
+class VitalsStatsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # Distribution, rolling daily means, hour/weekday profiles and
+        # sleep-vs-mood correlations for ?child= over ?window= (default 30d).
+        # Cached like the dashboard: any new log of the child invalidates it.
+        child_id = request.query_params.get('child')
+        if not child_id:
+            return Response({'error': 'child is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            child_id = int(child_id)
+        except ValueError:
+            raise ValidationError({'child': 'Must be an integer.'})
+        child = accessible_children(request.user).filter(id=child_id).first()
+        if child is None:
+            return Response({'error': 'Child not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        key = dashboard_cache.cache_key(request, namespace='stats')
+        entry = dashboard_cache.get(key, namespace='stats')
+        if entry is None:
+            window = parse_window(request.query_params.get('window', '30d'))
+            try:
+                rolling_days = int(request.query_params.get('rolling', analytics.DEFAULT_ROLLING_DAYS))
+            except ValueError:
+                return Response({'error': 'rolling must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            if not 1 <= rolling_days <= 90:
+                return Response({'error': 'rolling must be between 1 and 90 days'}, status=status.HTTP_400_BAD_REQUEST)
+            entry = dashboard_cache.store(key, analytics.child_statistics(child.id, window, rolling_days))
+
+        etag, data = entry
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(data, headers={'ETag': etag})
+
+
+class CaseloadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # Latest readings, window aggregates (?window=, default 7d) and anomaly
+        # counts for every child linked to the therapist through a chat room or
+        # an appointment, in a fixed number of queries. Cached like the dashboard.
+        if request.user.role != 'therapist':
+            return Response({'error': 'Only therapists have a caseload'}, status=status.HTTP_403_FORBIDDEN)
+        children = list(
+            accessible_children(request.user).select_related('latest_vitals').order_by('first_name', 'last_name', 'id')
+        )
+
+        key = dashboard_cache.cache_key(request, namespace='caseload', child_ids=[child.id for child in children])
+        entry = dashboard_cache.get(key, namespace='caseload')
+        if entry is None:
+            window = parse_window(request.query_params.get('window', '7d'))
+            summaries = caseload([child.id for child in children], window)
+            data = {
+                'window': summaries['window'],
+                'children': [
+                    {
+                        'child': child.id,
+                        'name': child.full_name,
+                        'latest': (
+                            LatestVitalsSerializer(child.latest_vitals).data
+                            if hasattr(child, 'latest_vitals') else None
+                        ),
+                        **summaries['children'][child.id],
+                    }
+                    for child in children
+                ],
+            }
+            entry = dashboard_cache.store(key, data)
+
+        etag, data = entry
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(data, headers={'ETag': etag})
+
+
+class BulkIngestView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        return run_idempotent(request, lambda: self.ingest(request))
+
+    def ingest(self, request):
+        # Accept either {"child": id, "records": [...]} or a bare list of records
+        if isinstance(request.data, list):
+            records, default_child = request.data, None
+        else:
+            records, default_child = request.data.get('records'), request.data.get('child')
+
+        if not isinstance(records, list) or not records:
+            return Response({'error': 'records must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(records) > MAX_BATCH_SIZE:
+            return Response(
+                {'error': f'At most {MAX_BATCH_SIZE} records are accepted per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = ingest_records(request.user, records, default_child=default_child)
+        created = sum(1 for result in results if result['status'] == 'created')
+
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created == 0:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_207_MULTI_STATUS
+
+        return Response(
+            {'created': created, 'failed': len(results) - created, 'results': results},
+            status=response_status
+        )
+
+
+class DashboardCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        # Counters of the dashboard, or of ?namespace=stats / caseload
+        namespace = request.query_params.get('namespace', 'dashboard')
+        if namespace not in dashboard_cache.NAMESPACES:
+            return Response(
+                {'error': f"namespace must be one of {', '.join(dashboard_cache.NAMESPACES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(dashboard_cache.stats(namespace))
+
+
+class ExportView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # Stream the full history of one child (?child=) or of all the user's children
+        export_format = request.query_params.get('output', 'ndjson')
+        if export_format not in export.EXPORT_FORMATS:
+            return Response({'error': 'output must be ndjson or csv'}, status=status.HTTP_400_BAD_REQUEST)
+
+        types = request.query_params.get('types')
+        types = types.split(',') if types else None
+        if types and any(log_type not in export.EXPORT_FIELDS for log_type in types):
+            return Response({'error': 'Unknown log type in types'}, status=status.HTTP_400_BAD_REQUEST)
+
+        children = ChildProfile.objects.filter(parent=request.user)
+        child_id = request.query_params.get('child')
+        if child_id:
+            try:
+                child_id = int(child_id)
+            except ValueError:
+                raise ValidationError({'child': 'Must be an integer.'})
+            children = children.filter(id=child_id)
+        child_ids = list(children.values_list('id', flat=True))
+        if not child_ids:
+            return Response({'error': 'Child not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        since = request.query_params.get('since')
+        until = request.query_params.get('until')
+        records = export.iter_records(
+            child_ids,
+            types=types,
+            since=parse_time_bound(since, 'since') if since else None,
+            until=parse_time_bound(until, 'until') if until else None,
+        )
+
+        content_type = 'application/x-ndjson' if export_format == 'ndjson' else 'text/csv'
+        # Served as an async iterator under ASGI, so the export is never held in memory
+        asynchronous = isinstance(request._request, ASGIRequest)
+        response = StreamingHttpResponse(
+            export.render(records, export_format, asynchronous=asynchronous), content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="logs-{child_id or "all"}.{export_format}"'
+        return response
+
+
+class ColumnarExportView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, table):
+        # One log table as a Parquet (default) or Arrow IPC file, for analytics
+        if table not in export.EXPORT_FIELDS:
+            return Response({'error': f"Unknown table '{table}'"}, status=status.HTTP_404_NOT_FOUND)
+        export_format = request.query_params.get('output', 'parquet')
+        if export_format not in columnar.COLUMNAR_FORMATS:
+            return Response({'error': 'output must be parquet or arrow'}, status=status.HTTP_400_BAD_REQUEST)
+
+        child_id = request.query_params.get('child')
+        if child_id:
+            try:
+                child_id = int(child_id)
+            except ValueError:
+                return Response({'error': 'child must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        since = request.query_params.get('since')
+        until = request.query_params.get('until')
+
+        # Written to an anonymous temporary file on disk, which the response streams
+        sink = tempfile.TemporaryFile()
+        try:
+            columnar.write_table(
+                table, sink, export_format,
+                child_ids=[child_id] if child_id else None,
+                since=parse_time_bound(since, 'since') if since else None,
+                until=parse_time_bound(until, 'until') if until else None,
+            )
+        except columnar.ColumnarUnavailable as e:
+            sink.close()
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        sink.seek(0)
+
+        extension, content_type = columnar.COLUMNAR_FORMATS[export_format]
+        return FileResponse(sink, as_attachment=True, filename=f'{table}{extension}', content_type=content_type)
+
+
+class SyncView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # Changes to the user's children and their logs after ?cursor= (0 for everything)
+        try:
+            cursor = int(request.query_params.get('cursor', 0))
+            limit = max(1, min(int(request.query_params.get('limit', sync.MAX_CHANGES)), sync.MAX_CHANGES))
+        except ValueError:
+            return Response({'error': 'cursor and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(sync.changes_since(request.user, cursor, limit))
+
+
+class BufferedHeartBeatView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        return run_idempotent(request, lambda: self.ingest(request))
+
+    def ingest(self, request):
+        # High-frequency HeartBeat ingestion through the write-behind buffer.
+        # Accepts {"child": id, "bpm": n} or {"child": id, "readings": [{"bpm": n}, ...]}.
+        child = ChildProfile.objects.filter(id=request.data.get('child'), parent=request.user).first()
+        if child is None:
+            return Response({'error': 'Child not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        readings = request.data.get('readings', [request.data])
+        if not isinstance(readings, list) or not readings:
+            return Response({'error': 'readings must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = HeartBeatBatchSerializer(data=readings, many=True)
+        serializer.is_valid(raise_exception=True)
+        instances = [HeartBeat(child=child, **data) for data in serializer.validated_data]
+
+        config = write_buffer.buffer_settings()
+        ack_flush = request.query_params.get('ack', config['ACK']) == 'flush'
+        buffer = write_buffer.get_heartbeat_buffer()
+        if buffer is None or (ack_flush and isinstance(request._request, ASGIRequest)):
+            # Buffering disabled, or an ack after the write under ASGI, where
+            # waiting on the flush would tie up the thread sync views run on:
+            # write synchronously in one bulk insert
+            created = bulk_insert(HeartBeat, instances)
+            return Response({'ids': [instance.pk for instance in created]}, status=status.HTTP_201_CREATED)
+
+        try:
+            future = buffer.submit(instances)
+        except write_buffer.BufferFull:
+            return Response(
+                {'error': 'Ingestion buffer is full, retry later'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': '1'},
+            )
+
+        if not ack_flush:
+            return Response({'queued': len(instances)}, status=status.HTTP_202_ACCEPTED)
+
+        try:
+            created = future.result(timeout=config['ACK_TIMEOUT_S'])
+        except FutureTimeoutError:
+            return Response({'error': 'Timed out waiting for flush'}, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        except Exception:
+            return Response({'error': 'Failed to store readings'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({'ids': [instance.pk for instance in created]}, status=status.HTTP_201_CREATED)
+
+
+class HeartBeatBufferStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        buffer = write_buffer.get_heartbeat_buffer()
+        if buffer is None:
+            return Response({'enabled': False})
+        return Response({'enabled': True, **buffer.metrics()})
+
+
+class LatestVitalsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # Latest vitals for ?child=, for ?children=1,2,3 or for all children the user can see
+        child_ids = request.query_params.get('children') or request.query_params.get('child')
+        latest = LatestVitals.objects.filter(child__in=accessible_children(request.user))
+        if child_ids:
+            try:
+                latest = latest.filter(child_id__in=[int(child_id) for child_id in child_ids.split(',')])
+            except ValueError:
+                return Response({'error': 'children must be a comma separated list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(LatestVitalsSerializer(latest, many=True).data)
+
+
+class VitalAnomalyViewSet(viewsets.ReadOnlyModelViewSet):
+    # Flagged readings of the children the user can see, newest first.
+    # Filters: ?child=, ?metric=, ?reason=, ?since=/?until= (on detection time)
+    serializer_class = VitalAnomalySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = LogCursorPagination
+
+    def get_queryset(self):
+        queryset = VitalAnomaly.objects.filter(child__in=accessible_children(self.request.user))
+        child_id = self.request.query_params.get('child')
+        if child_id:
+            if not child_id.isdigit():
+                raise ValidationError({'child': 'Must be an integer.'})
+            queryset = queryset.filter(child=child_id)
+        for param in ('metric', 'reason'):
+            value = self.request.query_params.get(param)
+            if value:
+                queryset = queryset.filter(**{param: value})
+        return filter_time_range(queryset, self.request.query_params)
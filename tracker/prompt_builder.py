@@ -0,0 +1,228 @@
+import json
+import math
+from collections import Counter, defaultdict
+
+# Turns the log data of a report into the compact JSON payload sent to the
+# model: per-type statistics, daily aggregates and deduplicated notes instead
+# of every row, cut down to a token budget if needed.
+
+DEFAULT_TOKEN_BUDGET = 8000
+# Rough size of a token for English text and JSON; only used for budgeting
+CHARS_PER_TOKEN = 4
+MAX_NOTE_CHARS = 500
+SHORT_NOTE_CHARS = 200
+# Distinct values kept per *_counts map, most frequent first
+MAX_COUNT_VALUES = 20
+
+NUMERIC_FIELDS = {
+    'heartbeat': ['bpm'],
+    'bloodpressure': ['systolic', 'dystolic'],
+    'sleep': ['hours'],
+    'food': ['calories'],
+}
+CATEGORY_FIELDS = {
+    'sleep': ['sleep_quality'],
+    'food': ['food_type'],
+    'behavior': ['mood', 'energy_level'],
+}
+# Rollup metric -> field name in the payload
+ROLLUP_FIELDS = {
+    'heartbeat_bpm': 'bpm',
+    'bloodpressure_systolic': 'systolic',
+    'bloodpressure_dystolic': 'dystolic',
+    'sleep_hours': 'hours',
+    'food_calories': 'calories',
+}
+
+# How to read the payload; goes into the prompt next to it
+FORMAT_NOTE = (
+    "n is the number of logs; stats are {mean, min, max, sd}; <field>_daily rows are "
+    "[date, mean, min, max, n]; counts map the most frequent logged values to how often they were logged; "
+    "notes are [date, text], newest first; omitted says how many notes, days, values and which sections "
+    "were left out to keep the input short."
+)
+
+
+def dumps(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _number(value):
+    return round(value, 1)
+
+
+def _day(value):
+    # datetime or ISO string
+    return str(value)[:10]
+
+
+def _stats(values):
+    if not values:
+        return None
+    mean = sum(values) / len(values)
+    sd = math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+    return {'mean': _number(mean), 'min': _number(min(values)), 'max': _number(max(values)), 'sd': _number(sd)}
+
+
+def _numeric(rows, field):
+    values = [row[field] for row in rows if row.get(field) is not None]
+    by_day = defaultdict(list)
+    for row in rows:
+        if row.get(field) is not None:
+            by_day[_day(row['created_at'])].append(row[field])
+    daily = [
+        [day, _number(sum(v) / len(v)), _number(min(v)), _number(max(v)), len(v)]
+        for day, v in sorted(by_day.items())
+    ]
+    return _stats(values), daily
+
+
+def _rollup(buckets):
+    count = sum(bucket['count'] for bucket in buckets)
+    if not count:
+        return None, []
+    stats = {
+        'mean': _number(sum(bucket['mean'] * bucket['count'] for bucket in buckets) / count),
+        'min': _number(min(bucket['min'] for bucket in buckets)),
+        'max': _number(max(bucket['max'] for bucket in buckets)),
+    }
+    daily = [
+        [_day(bucket['bucket_start']), _number(bucket['mean']), _number(bucket['min']), _number(bucket['max']),
+         bucket['count']]
+        for bucket in buckets
+    ]
+    return stats, daily
+
+
+def _counts(rows, field):
+    values = Counter(' '.join(str(row[field]).split()).lower() for row in rows if row.get(field))
+    return dict(values.most_common())
+
+
+def _notes(rows):
+    # Newest first, each distinct text once
+    seen, notes = set(), []
+    for row in sorted(rows, key=lambda row: str(row['created_at']), reverse=True):
+        text = ' '.join(str(row.get('text') or '').split())
+        key = text.casefold()
+        if not text or key in seen:
+            continue
+        seen.add(key)
+        notes.append([_day(row['created_at']), text[:MAX_NOTE_CHARS]])
+    return notes
+
+
+def build_payload(data):
+    """
+    Reduce report data ({type: [row, ...]}, or {type: {metric: [bucket, ...]}}
+    for daily rollups) to per-type statistics, daily aggregates and notes.
+    """
+    payload = {}
+    days = set()
+    for name, rows in data.items():
+        if name == 'scratchnotes':
+            continue
+        if isinstance(rows, dict):
+            # Daily rollups
+            section = {'n': 0}
+            for metric, buckets in rows.items():
+                field = ROLLUP_FIELDS.get(metric, metric)
+                section[field], section[f'{field}_daily'] = _rollup(buckets)
+                section['n'] = max(section['n'], sum(bucket['count'] for bucket in buckets))
+                days.update(_day(bucket['bucket_start']) for bucket in buckets)
+        else:
+            section = {'n': len(rows)}
+            for field in NUMERIC_FIELDS.get(name, []):
+                section[field], section[f'{field}_daily'] = _numeric(rows, field)
+            for field in CATEGORY_FIELDS.get(name, []):
+                section[f'{field}_counts'] = _counts(rows, field)
+            days.update(_day(row['created_at']) for row in rows)
+        payload[name] = section
+
+    notes = data.get('scratchnotes') or []
+    payload['scratchnotes'] = {'n': len(notes), 'notes': _notes(notes)}
+    days.update(_day(row['created_at']) for row in notes)
+    if days:
+        payload['period'] = [min(days), max(days)]
+    return payload
+
+
+def _daily_series(payload):
+    return [
+        (section, key) for section in payload.values() if isinstance(section, dict)
+        for key, value in section.items() if key.endswith('_daily') and value
+    ]
+
+
+def _value_counts(payload):
+    return [
+        (section, key) for section in payload.values() if isinstance(section, dict)
+        for key, value in section.items() if key.endswith('_counts') and value
+    ]
+
+
+def _truncate_counts(section, key, keep):
+    # Counts are ordered most frequent first; returns the number of values dropped
+    values = list(section[key].items())
+    section[key] = dict(values[:keep])
+    return len(values) - keep
+
+
+def build(data, budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Compact JSON payload of the data within ``budget`` estimated tokens;
+    returns (text, estimated tokens).
+
+    Every *_counts map keeps its MAX_COUNT_VALUES most frequent values. Over
+    budget, notes are shortened, then the oldest notes dropped, then the
+    oldest days of the daily series, then the least frequent counted values,
+    and finally whole sections, largest first. The payload says how much was
+    left out. Only a budget too small for the bare ``omitted`` summary is
+    exceeded.
+    """
+    payload = build_payload(data)
+    omitted = {'notes': 0, 'days': 0, 'values': 0, 'sections': []}
+    for section, key in _value_counts(payload):
+        if len(section[key]) > MAX_COUNT_VALUES:
+            omitted['values'] += _truncate_counts(section, key, MAX_COUNT_VALUES)
+    if omitted['values']:
+        payload['omitted'] = omitted
+    text = dumps(payload)
+    notes = payload['scratchnotes']['notes']
+    shortened = False
+
+    while estimate_tokens(text) > budget:
+        series = _daily_series(payload)
+        counts = _value_counts(payload)
+        sections = [name for name, section in payload.items() if name not in ('omitted', 'period')]
+        if notes and not shortened:
+            for note in notes:
+                note[1] = note[1][:SHORT_NOTE_CHARS]
+            shortened = True
+        elif notes:
+            keep = len(notes) // 2
+            omitted['notes'] += len(notes) - keep
+            del notes[keep:]
+        elif series:
+            removed = 0
+            for section, key in series:
+                keep = len(section[key]) // 2
+                removed = max(removed, len(section[key]) - keep)
+                section[key] = section[key][len(section[key]) - keep:]
+            omitted['days'] += removed
+        elif counts:
+            for section, key in counts:
+                omitted['values'] += _truncate_counts(section, key, len(section[key]) // 2)
+        elif sections:
+            largest = max(sections, key=lambda name: len(dumps(payload[name])))
+            del payload[largest]
+            omitted['sections'].append(largest)
+        else:
+            break
+        payload['omitted'] = omitted
+        text = dumps(payload)
+    return text, estimate_tokens(text)
@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import Report
+from .models import Report, ReportJob
 # Register your models here.
 
-admin.site.register(Report)
\ No newline at end of file
+admin.site.register(Report)
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'child', 'report_type', 'status', 'priority', 'attempts', 'run_after', 'finished_at')
+    list_filter = ('status', 'report_type')
@@ -0,0 +1,144 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import prompt_builder
+
+DEFAULT_TIMEOUT = 60      # seconds per model call
+DEFAULT_RETRIES = 3       # extra attempts after the first one
+BACKOFF_BASE = 1.0        # seconds; doubled per attempt
+BACKOFF_CAP = 30.0
+
+
+class ReportFailed(Exception):
+    def __init__(self, message, attempts):
+        super().__init__(message)
+        self.attempts = attempts
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """
+    Exponential backoff with full jitter, so retries from many workers spread out.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def call_with_retry(summarize, data, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, base_delay=BACKOFF_BASE):
+    """
+    Call ``summarize(data, timeout=...)`` until it returns a report without an
+    ``error`` key, retrying exceptions and invalid answers with backoff.
+    Returns (report, attempts); raises ReportFailed once retries run out.
+    """
+    for attempt in range(retries + 1):
+        try:
+            report = summarize(data, timeout=timeout)
+            if 'error' not in report:
+                return report, attempt + 1
+            error = report['error']
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        if attempt < retries:
+            time.sleep(backoff_delay(attempt, base_delay))
+    raise ReportFailed(error, retries + 1)
+
+
+class GenerationStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.succeeded = 0
+        self.failed = 0
+        self.attempts = 0
+        self.latencies = []
+        self.input_tokens = 0
+
+    def record(self, attempts, latency, ok, usage=None):
+        self.attempts += attempts
+        self.latencies.append(latency)
+        self.input_tokens += (usage or {}).get('input_tokens') or 0
+        if ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        done = self.succeeded + self.failed
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 2) if latencies else None
+
+        return {
+            'reports': self.succeeded,
+            'failed': self.failed,
+            'retries': self.attempts - done,
+            'elapsed': round(elapsed, 2),
+            'per_second': round(done / elapsed, 2) if elapsed else None,
+            'latency_p50': percentile(0.5),
+            'latency_p95': percentile(0.95),
+            'input_tokens': self.input_tokens,
+        }
+
+
+def generate(items, summarize, concurrency=1, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, stats=None):
+    """
+    Run the model over ``(key, data)`` items with at most ``concurrency``
+    calls in flight, and yield ``(key, report, error)`` as calls finish
+    (in completion order). Items are pulled lazily, so the caller can build
+    each input just before it is needed, and results come back to the
+    calling thread, which keeps database work off the pool.
+    """
+    stats = stats or GenerationStats()
+
+    def run(data):
+        start = time.perf_counter()
+        try:
+            report, attempts = call_with_retry(summarize, data, timeout, retries)
+            return report, None, attempts, time.perf_counter() - start
+        except ReportFailed as e:
+            return None, str(e), e.attempts, time.perf_counter() - start
+
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = {}
+        while True:
+            for key, data in items:
+                pending[pool.submit(run, data)] = key
+                if len(pending) >= concurrency:
+                    break
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                report, error, attempts, latency = future.result()
+                stats.record(attempts, latency, error is None, report.get('usage') if report else None)
+                yield key, report, error
+
+
+class StubModel:
+    """
+    Local stand-in for Gemini for load tests: sleeps for about ``latency``
+    seconds, fails with probability ``failure_rate`` and returns a canned
+    report in the same shape, with the input tokens the prompt payload would take.
+    """
+
+    def __init__(self, latency=0.5, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    def __call__(self, data, timeout=None):
+        delay = random.uniform(0.5, 1.5) * self.latency
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"stub model took longer than {timeout}s")
+        time.sleep(delay)
+        if random.random() < self.failure_rate:
+            raise RuntimeError("stub model failure")
+        _, tokens = prompt_builder.build(data)
+        return {
+            'summary': "Stub summary.",
+            'suggestion': "Stub suggestion.",
+            'insight': {name: ["stub", len(rows)] for name, rows in data.items()},
+            'usage': {'input_tokens': tokens, 'output_tokens': 0},
+        }
@@ -0,0 +1,162 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import DateTimeField, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from core.models import ChildProfile
+from log import blocks
+from log.models import HeartBeat, Behavior, Sleep, BloodPressure, Food, ScratchNotes
+from log.rollups import rollup_series, bucket_start, ROLLUP_METRICS
+
+from .models import Report
+
+# Window start of a child without reports when no default is given
+EARLIEST = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Children whose logs report_data reads and holds at a time
+BATCH_SIZE = 50
+
+
+def window_start(child_ref, report_type, default_since):
+    """
+    Expression for where a child's next report starts: the end of its last
+    report of ``report_type`` (its creation time for reports made before
+    periods were stored), or ``default_since`` if it has none (all history
+    if that is None).
+    """
+    last_end = (
+        Report.objects.filter(child=child_ref, report_type=report_type)
+        .annotate(end=Coalesce('period_end', 'generated_at'))
+        .order_by('-end')
+        .values('end')[:1]
+    )
+    return Coalesce(Subquery(last_end), Value(default_since or EARLIEST), output_field=DateTimeField())
+
+
+def report_windows(child_ids, until, since=None, default_since=None, report_type='weekly'):
+    """
+    {child_id: start} of each child's report window, which ends at ``until``.
+    An explicit ``since`` applies to every child.
+    """
+    if since is not None:
+        return {child_id: since for child_id in child_ids}
+    return dict(
+        ChildProfile.objects.filter(id__in=child_ids)
+        .annotate(start=window_start(OuterRef('pk'), report_type, default_since))
+        .values_list('id', 'start')
+    )
+
+
+def _windowed(model, child_ids, until, since, default_since, report_type):
+    rows = model.objects.filter(child_id__in=child_ids, created_at__lt=until)
+    if since is not None:
+        return rows.filter(created_at__gte=since)
+    return rows.alias(
+        window_start=window_start(OuterRef('child_id'), report_type, default_since)
+    ).filter(created_at__gte=F('window_start'))
+
+
+def windowed_logs(models, child_ids, until, since=None, default_since=None, report_type='weekly'):
+    """
+    Rows of each model in every child's report window, grouped in memory as
+    {child_id: {name: [row, ...]}}, with one query per model for all children.
+    The per-child window start is a correlated subquery, so nothing before
+    it is read.
+    """
+    grouped = {}
+    for name, model in models.items():
+        rows = _windowed(model, child_ids, until, since, default_since, report_type)
+        for row in rows.order_by('child_id', 'created_at', 'id').values():
+            grouped.setdefault(row['child_id'], {}).setdefault(name, []).append(row)
+
+        if model is HeartBeat:
+            _add_compacted(grouped, name, child_ids, until, since, default_since, report_type)
+    return grouped
+
+
+def children_with_logs(models, child_ids, until, since=None, default_since=None, report_type='weekly'):
+    """
+    Ids of the children with any row of the models in their report window,
+    with one query per model.
+    """
+    found = set()
+    for model in models:
+        rows = _windowed(model, child_ids, until, since, default_since, report_type)
+        found.update(rows.values_list('child_id', flat=True).distinct().order_by())
+    return found
+
+
+def _add_compacted(grouped, name, child_ids, until, since, default_since, report_type):
+    # Heartbeats compacted into blocks are older than every raw row of the
+    # child, so they go in front
+    starts = report_windows(child_ids, until, since, default_since, report_type)
+    earliest = min(starts.values(), default=None)
+    compacted = {}
+    for pk, child_id, created_at, bpm in blocks.iter_samples(
+        blocks.blocks_in_range(earliest, until, child_id__in=child_ids), earliest, until
+    ):
+        if created_at >= starts[child_id]:
+            compacted.setdefault(child_id, []).append(
+                {'id': pk, 'child_id': child_id, 'bpm': bpm, 'created_at': created_at}
+            )
+    for child_id, rows in compacted.items():
+        logs = grouped.setdefault(child_id, {})
+        logs[name] = rows + logs.get(name, [])
+
+
+def report_data(child_ids, until, since=None, default_since=None, use_rollups=False, report_type='weekly',
+                batch_size=BATCH_SIZE):
+    """
+    The log data of each child's next report. Returns (starts, data): the
+    window start of each child, and an iterator of (child_id, dashboard data).
+    The iterator reads the logs of ``batch_size`` children at a time, with a
+    few queries per batch, so memory holds one batch rather than every
+    child's logs. A child with nothing new gets empty lists.
+    """
+    child_ids = list(child_ids)
+    starts = report_windows(child_ids, until, since, default_since, report_type)
+
+    def data():
+        for i in range(0, len(child_ids), batch_size):
+            yield from _batch_data(
+                child_ids[i:i + batch_size], starts, until, since, default_since, use_rollups, report_type
+            )
+
+    return starts, data()
+
+
+def _batch_data(child_ids, starts, until, since, default_since, use_rollups, report_type):
+    models = {'behavior': Behavior, 'scratchnotes': ScratchNotes}
+    if use_rollups:
+        # One query for the batch's daily buckets, trimmed per child below
+        rollups = rollup_series(
+            child_ids, granularity='day', since=min((starts[c] for c in child_ids), default=until), until=until
+        )
+        # Buckets are whole days, so whether there is anything new is checked on the raw rows
+        fresh = children_with_logs(ROLLUP_METRICS, child_ids, until, since, default_since, report_type)
+    else:
+        models = {'heartbeat': HeartBeat, 'sleep': Sleep, 'bloodpressure': BloodPressure, 'food': Food, **models}
+    # One query per log type for the batch
+    logs = windowed_logs(models, child_ids, until, since, default_since, report_type)
+
+    for child_id in child_ids:
+        child_logs = logs.get(child_id, {})
+        if use_rollups:
+            first_bucket = bucket_start(starts[child_id], 'day').isoformat()
+            child_rollups = {
+                metric: [bucket for bucket in buckets if bucket['bucket_start'] >= first_bucket]
+                for metric, buckets in rollups.get(child_id, {}).items()
+            } if child_id in fresh else {}
+            dashboard_data = {
+                model._meta.model_name: {
+                    metric: child_rollups[metric] for metric, _ in metrics if child_rollups.get(metric)
+                }
+                for model, metrics in ROLLUP_METRICS.items()
+            }
+        else:
+            dashboard_data = {
+                name: child_logs.get(name, []) for name in ('heartbeat', 'sleep', 'bloodpressure', 'food')
+            }
+        dashboard_data["behavior"] = child_logs.get('behavior', [])
+        dashboard_data["scratchnotes"] = child_logs.get('scratchnotes', [])
+        yield child_id, dashboard_data
@@ -0,0 +1,267 @@
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import generation
+from .inputs import report_data
+from .models import Report, ReportJob
+
+logger = logging.getLogger(__name__)
+
+# Database-backed queue of report jobs, run by `manage.py run_report_worker`.
+# A worker claims the highest priority job that is due (or whose lease ran
+# out) and leases it; each claim is one attempt at one model call. A failed
+# attempt is queued again after a jittered exponential backoff, and a job
+# out of attempts is dead-lettered (status 'dead') with its last error.
+
+JOB_DEFAULTS = {
+    'LEASE_SECONDS': 300,    # must be longer than a model call
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE': 30,      # seconds; doubled per attempt
+    'BACKOFF_CAP': 3600,
+    'POLL_INTERVAL': 2,      # seconds an idle worker waits before looking again
+}
+
+# Jobs asked for through the API go before scheduled batches
+PRIORITY_BATCH = 0
+PRIORITY_INTERACTIVE = 10
+
+ACTIVE = (ReportJob.QUEUED, ReportJob.RUNNING)
+
+
+def job_settings():
+    return {**JOB_DEFAULTS, **getattr(settings, 'REPORT_JOBS', {})}
+
+
+def worker_name(index=0):
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+def _active_jobs(child_ids, report_type):
+    return {
+        job.child_id: job
+        for job in ReportJob.objects.select_for_update()
+        .filter(child_id__in=child_ids, report_type=report_type, status__in=ACTIVE)
+        .order_by('id')
+    }
+
+
+def _create_or_get(job):
+    # Insert one job, or return the active job another enqueue created first
+    # (the report_job_one_active constraint); loops if that job finished in between
+    while True:
+        try:
+            with transaction.atomic():
+                job.save(force_insert=True)
+            return job, True
+        except IntegrityError:
+            existing = _active_jobs([job.child_id], job.report_type).get(job.child_id)
+            if existing is not None:
+                return existing, False
+
+
+def enqueue(child_ids, report_type='weekly', priority=PRIORITY_BATCH, days=7, max_attempts=None, run_after=None):
+    """
+    Queue a report job for each child, and return ({child_id: job}, number of
+    new jobs). A child that already has a queued or running job of the type
+    keeps it (raised to ``priority`` if that is higher) instead of getting a
+    second one; the report_job_one_active constraint holds this against
+    concurrent enqueues too.
+    """
+    config = job_settings()
+    run_after = run_after or timezone.now()
+    child_ids = list(child_ids)
+    with transaction.atomic():
+        jobs = _active_jobs(child_ids, report_type)
+        new = [
+            ReportJob(
+                child_id=child_id, report_type=report_type, priority=priority, days=days, run_after=run_after,
+                max_attempts=max_attempts or config['MAX_ATTEMPTS'],
+            )
+            for child_id in child_ids if child_id not in jobs
+        ]
+        try:
+            with transaction.atomic():
+                created = ReportJob.objects.bulk_create(new)
+        except IntegrityError:
+            # Another enqueue added some of these children's jobs after they were
+            # read above; insert one at a time and keep the ones that won
+            created = []
+            for job in new:
+                job, inserted = _create_or_get(job)
+                if inserted:
+                    created.append(job)
+                else:
+                    jobs[job.child_id] = job
+        for job in created:
+            jobs[job.child_id] = job
+
+        raised = [job.id for job in jobs.values() if job.priority < priority]
+        if raised:
+            ReportJob.objects.filter(id__in=raised).update(priority=priority)
+            for job in jobs.values():
+                job.priority = max(job.priority, priority)
+    return jobs, len(created)
+
+
+def claim(worker, lease_seconds=None):
+    """
+    Lease the next job for ``worker``: the highest priority queued job that
+    is due, or a running one whose lease expired. Returns the job, with its
+    attempt counted, or None if there is nothing to do.
+    """
+    lease_seconds = lease_seconds or job_settings()['LEASE_SECONDS']
+    now = timezone.now()
+    due = (
+        Q(status=ReportJob.QUEUED, run_after__lte=now)
+        | Q(status=ReportJob.RUNNING, lease_expires_at__lt=now)
+    )
+    with transaction.atomic():
+        # SKIP LOCKED lets workers pass over each other's candidates; where it
+        # is not supported the guarded update below still lets only one win
+        candidates = list(
+            ReportJob.objects.select_for_update(skip_locked=True)
+            .filter(due).order_by('-priority', 'run_after', 'id')
+            .values_list('id', 'attempts')[:5]
+        )
+        for job_id, attempts in candidates:
+            claimed = ReportJob.objects.filter(due, id=job_id, attempts=attempts).update(
+                status=ReportJob.RUNNING,
+                attempts=attempts + 1,
+                locked_by=worker,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                started_at=now,
+            )
+            if claimed:
+                return ReportJob.objects.select_related('child').get(id=job_id)
+    return None
+
+
+def _finish(job, **fields):
+    # Only the worker still holding the lease may finish the job; returns
+    # False if it lost the lease and someone else took the job over
+    return bool(
+        ReportJob.objects.filter(
+            id=job.id, status=ReportJob.RUNNING, locked_by=job.locked_by, attempts=job.attempts
+        ).update(lease_expires_at=None, **fields)
+    )
+
+
+def fail(job, error):
+    """
+    Queue a failed job again after a backoff, or dead-letter it if that was
+    its last attempt. Returns the new status.
+    """
+    config = job_settings()
+    now = timezone.now()
+    if job.attempts >= job.max_attempts:
+        _finish(job, status=ReportJob.DEAD, last_error=error, finished_at=now)
+        return ReportJob.DEAD
+    delay = generation.backoff_delay(job.attempts - 1, config['BACKOFF_BASE'], config['BACKOFF_CAP'])
+    _finish(job, status=ReportJob.QUEUED, last_error=error, run_after=now + timedelta(seconds=delay))
+    return ReportJob.QUEUED
+
+
+def run(job, summarize, timeout=generation.DEFAULT_TIMEOUT, use_rollups=False):
+    """
+    Make one attempt at a leased job, and return its new status. On failure
+    the job is queued again after a backoff, or dead-lettered once it is out
+    of attempts.
+    """
+    if job.attempts > job.max_attempts:
+        # Taken over after the worker of its last attempt died
+        _finish(job, status=ReportJob.DEAD, finished_at=timezone.now(),
+                last_error=job.last_error or "Lease expired on the last attempt")
+        return ReportJob.DEAD
+
+    until = timezone.now()
+    starts, data = report_data(
+        [job.child_id], until, default_since=until - timedelta(days=job.days),
+        use_rollups=use_rollups, report_type=job.report_type,
+    )
+    _, dashboard_data = next(data)
+    if not any(dashboard_data.values()):
+        _finish(job, status=ReportJob.SKIPPED, finished_at=timezone.now())
+        return ReportJob.SKIPPED
+
+    try:
+        # Retries are the queue's job, so each attempt is a single call
+        report, _ = generation.call_with_retry(summarize, dashboard_data, timeout=timeout, retries=0)
+    except generation.ReportFailed as e:
+        return fail(job, str(e))
+
+    with transaction.atomic():
+        saved = Report.objects.create(
+            child_id=job.child_id,
+            report_type=job.report_type,
+            summary=report["summary"],
+            suggestion=report["suggestion"],
+            insight=report["insight"],
+            period_start=starts[job.child_id],
+            period_end=until,
+        )
+        if not _finish(job, status=ReportJob.SUCCEEDED, report=saved, last_error='', finished_at=timezone.now()):
+            # The lease ran out and another worker has the job; its report wins
+            transaction.set_rollback(True)
+            logger.warning(f"Report job {job.id} lost its lease to another worker, result dropped")
+            return ReportJob.RUNNING
+    return ReportJob.SUCCEEDED
+
+
+def work(worker, summarize, stop, timeout=generation.DEFAULT_TIMEOUT, lease_seconds=None, poll_interval=None,
+         use_rollups=False, burst=False, on_result=None):
+    """
+    Worker loop: claim and run jobs until ``stop`` (a threading.Event) is
+    set, or, with ``burst``, until no job is due. ``on_result(job, status)``
+    is called after each job.
+    """
+    poll_interval = poll_interval or job_settings()['POLL_INTERVAL']
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            job = claim(worker, lease_seconds)
+        except Exception as e:
+            logger.error(f"Report worker {worker} could not claim a job: {e}")
+            stop.wait(poll_interval)
+            continue
+        if job is None:
+            if burst:
+                break
+            stop.wait(poll_interval)
+            continue
+        try:
+            status = run(job, summarize, timeout, use_rollups)
+        except Exception as e:
+            logger.error(f"Report job {job.id} crashed: {e}", exc_info=True)
+            try:
+                status = fail(job, f"{type(e).__name__}: {e}")
+            except Exception:
+                # Database trouble; the job is taken again when its lease runs out
+                status = ReportJob.RUNNING
+        if on_result:
+            on_result(job, status)
+    close_old_connections()
+
+
+def run_workers(count, summarize, stop=None, **options):
+    """
+    Run ``count`` worker threads until they finish; see ``work``.
+    """
+    stop = stop or threading.Event()
+    threads = [
+        threading.Thread(target=work, args=(worker_name(i), summarize, stop), kwargs=options, name=f'report-worker-{i}')
+        for i in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        # Joined with a timeout so the main thread still gets signals
+        while thread.is_alive():
+            thread.join(0.5)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from core.models import ChildProfile
+from report import jobs
+
+
+class Command(BaseCommand):
+    help = "Queue a report job for every child (or the given ones), for run_report_worker to generate."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--child', type=int, action='append', help="Only this child id (repeatable)")
+        parser.add_argument('--report-type', choices=['daily', 'weekly'], default='weekly')
+        parser.add_argument('--priority', type=int, default=jobs.PRIORITY_BATCH, help="Higher runs first")
+        parser.add_argument(
+            '--days', type=int, default=7,
+            help="Window of a child's first report; later ones cover the time since the last report"
+        )
+        parser.add_argument('--max-attempts', type=int, help="Default REPORT_JOBS['MAX_ATTEMPTS']")
+
+    def handle(self, *args, **options):
+        children = ChildProfile.objects.all()
+        if options['child']:
+            children = children.filter(id__in=options['child'])
+        child_ids = list(children.values_list('id', flat=True))
+        queued, created = jobs.enqueue(
+            child_ids, options['report_type'], priority=options['priority'], days=options['days'],
+            max_attempts=options['max_attempts'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {created} report jobs queued, {len(queued) - created} children already had one"
+        ))
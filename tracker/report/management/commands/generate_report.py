@@ -1,42 +1,80 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils.timezone import now
+from datetime import timedelta
+from functools import partial
 from core.models import ChildProfile
-from log.models import  HeartBeat, Behavior, Sleep, BloodPressure, Food, ScratchNotes
+from log.pagination import time_bound_option
 from report.models import Report
-from gemini import summarize_dashboard_data
+from report import generation
+from report.inputs import report_data
+from llm_cache import default_cache
 
 import json
 
 class Command(BaseCommand):
     help = "Generate daily reports for all children using local DB data (not API)."
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--use-rollups', action='store_true',
+            help="Send daily rollups of the numeric vitals instead of every raw row"
+        )
+        parser.add_argument(
+            '--days', type=int, default=7,
+            help="Window of a child's first report; later ones cover the time since the last report"
+        )
+        parser.add_argument('--since', help="ISO date or datetime (inclusive); overrides the per-child window")
+        parser.add_argument('--until', help="ISO date or datetime (exclusive, default now)")
+        parser.add_argument('--concurrency', type=int, default=1, help="Model calls in flight at once")
+        parser.add_argument('--timeout', type=float, default=generation.DEFAULT_TIMEOUT, help="Seconds per model call")
+        parser.add_argument(
+            '--retries', type=int, default=generation.DEFAULT_RETRIES,
+            help="Retries per child after a failed call, with jittered exponential backoff"
+        )
+        parser.add_argument('--no-cache', action='store_true', help="Call the model even for inputs with a cached report")
+        parser.add_argument('--stub-model', action='store_true', help="Use a local stub model instead of Gemini")
+        parser.add_argument('--stub-latency', type=float, default=0.5, help="Average stub call time in seconds")
+        parser.add_argument('--stub-failure-rate', type=float, default=0.0, help="Share of stub calls that fail")
+
     def handle(self, *args, **options):
-        today = now().date()
-        children = ChildProfile.objects.all()
-
-        for child in children:
-            print("Child: ", child.full_name)
-            # Manually collect all related log data
-            dashboard_data = {
-                "heartbeat": list(HeartBeat.objects.filter(child=child).values()),
-                "behavior": list(Behavior.objects.filter(child=child).values()),
-                "sleep": list(Sleep.objects.filter(child=child).values()),
-                "bloodpressure": list(BloodPressure.objects.filter(child=child).values()),
-                "food": list(Food.objects.filter(child=child).values()),
-                "scratchnotes": list(ScratchNotes.objects.filter(child=child).values())
-            }
-
-            if not any(dashboard_data.values()):
-                self.stdout.write(self.style.WARNING(f"No data found for child {child.full_name}"))
-                continue
+        if options['concurrency'] < 1:
+            raise CommandError("--concurrency must be at least 1")
+        if options['stub_model']:
+            summarize = generation.StubModel(options['stub_latency'], options['stub_failure_rate'])
+        else:
+            # Imported here so the stub runs without Gemini credentials
+            from gemini import summarize_dashboard_data
+            summarize = partial(summarize_dashboard_data, bypass_cache=options['no_cache'])
 
-            # Call Gemini
-            report = summarize_dashboard_data(dashboard_data)
-            print(report["insight"])
+        until = time_bound_option(options, 'until') or now()
+        since = time_bound_option(options, 'since')
+        default_since = until - timedelta(days=options['days'])
+
+        children = {child.id: child for child in ChildProfile.objects.all()}
+        # Each child's window starts where its last weekly report ended. The
+        # logs are read a batch of children at a time, as generate() pulls inputs
+        starts, data = report_data(list(children), until, since, default_since, use_rollups=options['use_rollups'])
+
+        def inputs():
+            for child_id, dashboard_data in data:
+                child = children[child_id]
+                if not any(dashboard_data.values()):
+                    self.stdout.write(self.style.WARNING(f"No new data for child {child.full_name}, skipped"))
+                    continue
+                print("Child: ", child.full_name)
+                yield child, dashboard_data
 
-            if "error" in report:
-                self.stderr.write(f"⚠️ Failed to generate valid report for child {child.full_name}")
+        stats = generation.GenerationStats()
+        results = generation.generate(
+            inputs(), summarize,
+            concurrency=options['concurrency'], timeout=options['timeout'], retries=options['retries'], stats=stats,
+        )
+        for child, report, error in results:
+            if error:
+                self.stderr.write(f"⚠️ Failed to generate valid report for child {child.full_name}: {error}")
                 continue
+            print(report["insight"])
+            usage = report.get("usage", {})
 
             # Save the report
             Report.objects.create(
@@ -44,7 +82,26 @@ class Command(BaseCommand):
                 report_type="weekly",
                 summary=report["summary"],
                 suggestion=report["suggestion"],
-                insight=report["insight"]  # assumes JSONField
+                insight=report["insight"],  # assumes JSONField
+                period_start=starts[child.id],
+                period_end=until,
             )
 
-            self.stdout.write(self.style.SUCCESS(f"✅ Report saved for {child.full_name}"))
+            tokens = "cached" if usage.get("cached") else f"{usage.get('input_tokens')} input tokens"
+            self.stdout.write(self.style.SUCCESS(f"✅ Report saved for {child.full_name} ({tokens})"))
+
+        summary = stats.summary()
+        timing = f"in {summary['elapsed']}s"
+        if summary['latency_p50'] is not None:
+            timing += (
+                f" ({summary['per_second']}/s, p50 {summary['latency_p50']}s, p95 {summary['latency_p95']}s per child)"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {summary['reports']} reports, {summary['failed']} failed, {summary['retries']} retries {timing}, "
+            f"{summary['input_tokens']} input tokens"
+        ))
+        if not options['stub_model']:
+            cache = default_cache().stats()
+            self.stdout.write(
+                f"LLM cache: {cache['hits']} hits, {cache['misses']} misses, {cache['entries']} entries (all time)"
+            )
@@ -0,0 +1,70 @@
+import signal
+import threading
+from collections import Counter
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+
+from report import generation, jobs
+
+
+class Command(BaseCommand):
+    help = "Run a pool of workers that generate the queued report jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Jobs worked on at once")
+        parser.add_argument('--timeout', type=float, default=generation.DEFAULT_TIMEOUT, help="Seconds per model call")
+        parser.add_argument('--lease', type=int, help="Seconds a worker holds a job (default REPORT_JOBS['LEASE_SECONDS'])")
+        parser.add_argument('--burst', action='store_true', help="Exit once no job is due instead of waiting for more")
+        parser.add_argument(
+            '--use-rollups', action='store_true',
+            help="Send daily rollups of the numeric vitals instead of every raw row"
+        )
+        parser.add_argument('--no-cache', action='store_true', help="Call the model even for inputs with a cached report")
+        parser.add_argument('--stub-model', action='store_true', help="Use a local stub model instead of Gemini")
+        parser.add_argument('--stub-latency', type=float, default=0.5, help="Average stub call time in seconds")
+        parser.add_argument('--stub-failure-rate', type=float, default=0.0, help="Share of stub calls that fail")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1")
+        lease = options['lease'] or jobs.job_settings()['LEASE_SECONDS']
+        if lease <= options['timeout']:
+            raise CommandError("The lease must be longer than --timeout, or jobs are taken over mid-call")
+        if options['stub_model']:
+            summarize = generation.StubModel(options['stub_latency'], options['stub_failure_rate'])
+        else:
+            # Imported here so the stub runs without Gemini credentials
+            from gemini import summarize_dashboard_data
+            summarize = partial(summarize_dashboard_data, bypass_cache=options['no_cache'])
+
+        stop = threading.Event()
+
+        def shutdown(signum, frame):
+            # Workers finish the job they are on, then exit
+            self.stdout.write(self.style.WARNING("Stopping after the current jobs..."))
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        counts = Counter()
+        lock = threading.Lock()
+
+        def on_result(job, status):
+            with lock:
+                counts[status] += 1
+            message = f"Job {job.id} for child {job.child.full_name} (attempt {job.attempts}): {status}"
+            if status == jobs.ReportJob.SUCCEEDED:
+                self.stdout.write(self.style.SUCCESS(f"✅ {message}"))
+            else:
+                self.stdout.write(self.style.WARNING(message))
+
+        self.stdout.write(f"Running {options['workers']} report workers")
+        jobs.run_workers(
+            options['workers'], summarize, stop,
+            timeout=options['timeout'], lease_seconds=lease, use_rollups=options['use_rollups'],
+            burst=options['burst'], on_result=on_result,
+        )
+        summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items())) or "no jobs"
+        self.stdout.write(self.style.SUCCESS(f"✅ Workers stopped: {summary}"))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0002_alter_report_child'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='period_end',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='period_start',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_idempotencykey'),
+        ('report', '0003_report_period'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly')], default='weekly', max_length=10)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('skipped', 'Skipped'), ('dead', 'Dead')], default='queued', max_length=10)),
+                ('priority', models.SmallIntegerField(default=0)),
+                ('days', models.PositiveSmallIntegerField(default=7)),
+                ('run_after', models.DateTimeField()),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5)),
+                ('locked_by', models.CharField(blank=True, max_length=100)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to='core.childprofile')),
+                ('report', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='report.report')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', '-priority', 'run_after'], name='report_repo_status_7fc45c_idx'), models.Index(fields=['status', 'lease_expires_at'], name='report_repo_status_73b1b6_idx'), models.Index(fields=['child', 'status'], name='report_repo_child_i_0c2f8b_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('child', 'report_type'), name='report_job_one_active')],
+            },
+        ),
+    ]
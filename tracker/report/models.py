@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from core.models import ChildProfile
 
 
@@ -11,6 +12,9 @@ class Report(models.Model):
     child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE)  # replace with your actual child model
     report_type = models.CharField(max_length=10, choices=REPORT_TYPES)
     generated_at = models.DateTimeField(auto_now_add=True)
+    # Time range of the logs the report covers; the next report starts at period_end
+    period_start = models.DateTimeField(null=True, blank=True)
+    period_end = models.DateTimeField(null=True, blank=True)
     summary = models.TextField()
     suggestion = models.TextField()
 
@@ -19,3 +23,60 @@ class Report(models.Model):
 
     def __str__(self):
         return f"{self.report_type.title()} Report for Child {self.child_id} on {self.generated_at.date()}"
+
+
+class ReportJob(models.Model):
+    """
+    A report to generate in the background; see report/jobs.py. Workers take
+    the highest priority job that is due and hold a lease on it until
+    ``lease_expires_at``; a job whose worker died is taken again once the
+    lease runs out.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    SKIPPED = 'skipped'
+    DEAD = 'dead'
+    STATUSES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (SKIPPED, 'Skipped'),  # nothing new to report on
+        (DEAD, 'Dead'),  # out of attempts
+    )
+
+    child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, related_name='report_jobs')
+    report_type = models.CharField(max_length=10, choices=Report.REPORT_TYPES, default='weekly')
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    # Higher runs first
+    priority = models.SmallIntegerField(default=0)
+    # Window of a child's first report, in days
+    days = models.PositiveSmallIntegerField(default=7)
+    run_after = models.DateTimeField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    report = models.ForeignKey(Report, null=True, blank=True, on_delete=models.SET_NULL, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_after']),
+            models.Index(fields=['status', 'lease_expires_at']),
+            models.Index(fields=['child', 'status']),
+        ]
+        constraints = [
+            # At most one queued or running job per child and report type
+            models.UniqueConstraint(
+                fields=['child', 'report_type'],
+                condition=Q(status__in=['queued', 'running']),
+                name='report_job_one_active',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.report_type.title()} report job {self.id} for Child {self.child_id} ({self.status})"
@@ -1,7 +1,15 @@
 from rest_framework import serializers
-from .models import Report
+from .models import Report, ReportJob
 
 class ReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = Report
         fields = '__all__'
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'child', 'report_type', 'status', 'priority', 'attempts', 'max_attempts', 'run_after',
+            'last_error', 'report', 'created_at', 'started_at', 'finished_at',
+        ]
@@ -1,3 +1,524 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+import llm_cache
+import prompt_builder
+from core.models import CustomUser, ChildProfile
+from log.models import HeartBeat, Food
+from . import generation
+from . import jobs
+from .inputs import report_data
+from .models import Report, ReportJob
+
+
+def make_user(email, role='parent'):
+    return CustomUser.objects.create_user(email=email, phone_number=email.split('@')[0][:15], role=role)
+
+
+def make_child(parent, first_name='Sam'):
+    return ChildProfile.objects.create(parent=parent, first_name=first_name, last_name='Test')
+
+
+def backdate(instance, created_at):
+    type(instance).objects.filter(pk=instance.pk).update(created_at=created_at)
+    instance.created_at = created_at
+    return instance
+
+
+class FakeModel:
+    """
+    Callable model that records how many calls overlap, and fails the first
+    ``failures`` calls of each input.
+    """
+
+    def __init__(self, latency=0.02, failures=0, answer=None):
+        self.latency = latency
+        self.failures = failures
+        self.answer = answer or {'summary': "ok", 'suggestion': "ok", 'insight': {}}
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = {}
+
+    def __call__(self, data, timeout=None):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            key = repr(data)
+            self.calls[key] = self.calls.get(key, 0) + 1
+            call = self.calls[key]
+        try:
+            time.sleep(self.latency)
+            if call <= self.failures:
+                raise RuntimeError(f"failure {call}")
+            return dict(self.answer, usage={'input_tokens': 10})
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+@mock.patch.object(generation, 'backoff_delay', return_value=0)
+class GenerationTests(SimpleTestCase):
+    def test_retries_until_a_valid_report(self, _):
+        model = FakeModel(latency=0, failures=2)
+        report, attempts = generation.call_with_retry(model, 'a', retries=3)
+        self.assertEqual((report['summary'], attempts), ("ok", 3))
+
+    def test_error_answers_are_retried_and_then_fail(self, _):
+        model = FakeModel(latency=0, answer={'error': "Invalid JSON"})
+        with self.assertRaises(generation.ReportFailed) as failed:
+            generation.call_with_retry(model, 'a', retries=2)
+        self.assertEqual((str(failed.exception), failed.exception.attempts), ("Invalid JSON", 3))
+        self.assertEqual(sum(model.calls.values()), 3)
+
+    def test_no_retries_means_one_call(self, _):
+        model = FakeModel(latency=0, failures=1)
+        with self.assertRaises(generation.ReportFailed) as failed:
+            generation.call_with_retry(model, 'a', retries=0)
+        self.assertEqual((str(failed.exception), failed.exception.attempts), ("RuntimeError: failure 1", 1))
+
+    def test_concurrency_caps_calls_in_flight(self, _):
+        model = FakeModel()
+        items = [(i, f'child-{i}') for i in range(12)]
+        results = list(generation.generate(items, model, concurrency=3))
+        self.assertEqual(model.peak, 3)
+        self.assertEqual(sorted(key for key, _, _ in results), list(range(12)))
+        self.assertTrue(all(error is None for _, _, error in results))
+
+    def test_single_worker_runs_calls_one_at_a_time(self, _):
+        model = FakeModel(latency=0.005)
+        list(generation.generate([(i, i) for i in range(5)], model))
+        self.assertEqual(model.peak, 1)
+
+    def test_items_are_pulled_as_slots_free_up(self, _):
+        pulled = []
+        model = FakeModel()
+
+        def items():
+            for i in range(6):
+                pulled.append(i)
+                yield i, i
+
+        results = generation.generate(items(), model, concurrency=2)
+        next(results)
+        # Two calls were started and one refilled slot, not the whole input
+        self.assertLessEqual(len(pulled), 3)
+        list(results)
+        self.assertEqual(len(pulled), 6)
+
+    def test_failures_are_yielded_and_counted(self, _):
+        stats = generation.GenerationStats()
+        model = FakeModel(latency=0, failures=1)
+        results = dict(
+            (key, error) for key, _, error in
+            generation.generate([('a', 'a'), ('b', 'b')], model, concurrency=2, retries=0, stats=stats)
+        )
+        self.assertEqual(results, {'a': "RuntimeError: failure 1", 'b': "RuntimeError: failure 1"})
+        summary = stats.summary()
+        self.assertEqual((summary['reports'], summary['failed'], summary['retries']), (0, 2, 0))
+
+    def test_stats_summary(self, _):
+        stats = generation.GenerationStats()
+        stats.started -= 2  # two seconds ago
+        for latency in (0.1, 0.2, 0.3, 0.4):
+            stats.record(1, latency, True, {'input_tokens': 100})
+        stats.record(3, 1.0, False)
+        summary = stats.summary()
+        self.assertEqual(
+            {key: summary[key] for key in ('reports', 'failed', 'retries', 'latency_p50', 'latency_p95', 'input_tokens')},
+            {'reports': 4, 'failed': 1, 'retries': 2, 'latency_p50': 0.3, 'latency_p95': 1.0, 'input_tokens': 400},
+        )
+        self.assertAlmostEqual(summary['per_second'], 2.5, delta=0.1)
+        self.assertEqual(generation.GenerationStats().summary()['latency_p50'], None)
+
+    def test_stub_model_times_out(self, _):
+        with self.assertRaises(TimeoutError):
+            generation.StubModel(latency=1)({}, timeout=0.01)
+
+
+class BackoffTests(SimpleTestCase):
+    def test_full_jitter_within_the_cap(self):
+        for attempt in range(10):
+            delay = generation.backoff_delay(attempt, base=1, cap=8)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(8, 2 ** attempt))
+
+
+class GenerateReportCommandTests(TestCase):
+    def setUp(self):
+        self.parent = make_user('parent@example.com')
+        self.child = make_child(self.parent)
+        self.quiet = make_child(self.parent, 'Alex')
+        self.now = timezone.now()
+
+    def generate(self, *args):
+        out = StringIO()
+        # The command also prints progress to stdout
+        with redirect_stdout(StringIO()):
+            call_command('generate_report', '--stub-model', '--stub-latency', '0', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_reports_cover_only_new_data_and_skip_children_without_any(self):
+        backdate(HeartBeat.objects.create(child=self.child, bpm=110), self.now - timedelta(days=3))
+        backdate(HeartBeat.objects.create(child=self.quiet, bpm=110), self.now - timedelta(days=30))
+        out = self.generate()
+        self.assertIn('No new data for child Alex Test, skipped', out)
+        report = Report.objects.get()
+        self.assertEqual(report.child, self.child)
+        self.assertEqual(report.insight['heartbeat'], ['stub', 1])
+        self.assertAlmostEqual(report.period_start, report.period_end - timedelta(days=7), delta=timedelta(seconds=1))
+
+        # The next report starts where this one ended
+        Food.objects.create(child=self.child, food_type='rice', calories=200)
+        self.generate()
+        latest = Report.objects.filter(child=self.child).latest('id')
+        self.assertEqual(latest.period_start, report.period_end)
+        self.assertEqual((latest.insight['heartbeat'], latest.insight['food']), (['stub', 0], ['stub', 1]))
+
+        # Nothing new since then
+        self.assertIn('No new data for child Sam Test, skipped', self.generate())
+        self.assertEqual(Report.objects.count(), 2)
+
+    def test_explicit_window(self):
+        backdate(HeartBeat.objects.create(child=self.child, bpm=110), self.now - timedelta(days=20))
+        self.generate('--since', (self.now - timedelta(days=21)).date().isoformat())
+        self.assertEqual(Report.objects.get().insight['heartbeat'], ['stub', 1])
+
+    def test_bad_time_bounds_are_command_errors(self):
+        with self.assertRaisesMessage(CommandError, "--since must be an ISO date or datetime, got 'last week'"):
+            self.generate('--since', 'last week')
+        with self.assertRaisesMessage(CommandError, "--until"):
+            self.generate('--until', '2025-02-30')
+        with self.assertRaises(CommandError):
+            self.generate('--concurrency', '0')
+
+
+class ReportDataTests(TestCase):
+    def test_logs_are_read_one_batch_at_a_time(self):
+        parent = make_user('parent@example.com')
+        children = [make_child(parent, f'Child{i}') for i in range(5)]
+        for i, child in enumerate(children):
+            for _ in range(i):
+                HeartBeat.objects.create(child=child, bpm=110)
+        until = timezone.now() + timedelta(seconds=1)
+        starts, data = report_data([child.id for child in children], until, default_since=until - timedelta(days=1),
+                                   batch_size=2)
+        self.assertEqual(set(starts), {child.id for child in children})
+
+        with CaptureQueriesContext(connection) as first_batch:
+            first = [next(data), next(data)]
+        with CaptureQueriesContext(connection) as rest:
+            rest_items = list(data)
+        # Each batch reads its own logs: the first two children did not load the rest
+        self.assertTrue(first_batch.captured_queries)
+        self.assertGreater(len(rest), len(first_batch))
+        counts = [(child_id, len(item['heartbeat'])) for child_id, item in first + rest_items]
+        self.assertEqual(counts, [(child.id, i) for i, child in enumerate(children)])
+
+
+class Clock:
+    def __init__(self, start=1000.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+        self.clock = Clock()
+        patcher = mock.patch.object(llm_cache.time, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def cache(self, **options):
+        return llm_cache.ResponseCache(self.path, **options)
+
+    def test_keys_ignore_formatting_but_not_versions(self):
+        key = llm_cache.make_key('gemini', 'v1', {'b': [1, 2], 'a': 'x'})
+        self.assertEqual(key, llm_cache.make_key('gemini', 'v1', {'a': 'x', 'b': [1, 2]}))
+        self.assertNotEqual(key, llm_cache.make_key('gemini', 'v2', {'a': 'x', 'b': [1, 2]}))
+        self.assertNotEqual(key, llm_cache.make_key('other', 'v1', {'a': 'x', 'b': [1, 2]}))
+        self.assertEqual(llm_cache.make_key('m', 'v1', " I  am\nhappy "), llm_cache.make_key('m', 'v1', "I am happy"))
+
+    def test_entries_expire_after_the_ttl(self):
+        cache = self.cache(ttl=60)
+        cache.set('k', {'summary': 'x'})
+        self.clock.now += 59
+        self.assertEqual(cache.get('k'), {'summary': 'x'})
+        self.clock.now += 2
+        self.assertIsNone(cache.get('k'))
+        self.assertEqual(cache.evict(), 1)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions'], stats['entries']), (1, 1, 1, 0))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = self.cache(max_entries=2)
+        for key in ('a', 'b'):
+            cache.set(key, key)
+            self.clock.now += 1
+        cache.get('a')
+        self.clock.now += 1
+        cache.set('c', 'c')
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), ('a', None, 'c'))
+
+    def test_counters_persist_across_instances(self):
+        self.cache().set('k', 1)
+        self.cache().get('k')
+        self.assertEqual(self.cache().stats()['hits'], 1)
+
+    def test_cached_call(self):
+        cache = self.cache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {'summary': len(calls)}
+
+        self.assertEqual(llm_cache.cached_call('m', 'v1', {'a': 1}, compute, cache=cache), {'summary': 1})
+        self.assertEqual(llm_cache.cached_call('m', 'v1', {'a': 1}, compute, cache=cache), {'summary': 1})
+        # A bypass calls the model again and replaces the entry
+        self.assertEqual(llm_cache.cached_call('m', 'v1', {'a': 1}, compute, bypass=True, cache=cache), {'summary': 2})
+        self.assertEqual(llm_cache.cached_call('m', 'v1', {'a': 1}, compute, cache=cache), {'summary': 2})
+        self.assertEqual(len(calls), 2)
+
+    def test_rejected_results_are_not_cached(self):
+        cache = self.cache()
+        results = iter([{'error': 'Invalid JSON'}, {'summary': 'ok'}])
+
+        def call():
+            return llm_cache.cached_call(
+                'm', 'v1', 'input', lambda: next(results), cacheable=lambda value: 'error' not in value, cache=cache
+            )
+
+        self.assertEqual(call(), {'error': 'Invalid JSON'})
+        self.assertEqual(call(), {'summary': 'ok'})
+        self.assertEqual(call(), {'summary': 'ok'})
+
+    def test_disabled_cache_always_computes(self):
+        cache = self.cache(enabled=False)
+        values = iter([1, 2])
+        self.assertEqual(llm_cache.cached_call('m', 'v1', 'x', lambda: next(values), cache=cache), 1)
+        self.assertEqual(llm_cache.cached_call('m', 'v1', 'x', lambda: next(values), cache=cache), 2)
+
+    def test_concurrent_requests_for_one_key_make_one_call(self):
+        cache = self.cache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return {'summary': 'once'}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(llm_cache.cached_call('m', 'v1', 'x', compute, cache=cache)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'summary': 'once'}] * 5)
+
+
+class PromptBuilderTests(SimpleTestCase):
+    start = datetime(2025, 3, 3, tzinfo=dt_timezone.utc)
+
+    def data(self, food_types=3, notes=2):
+        return {
+            'heartbeat': [{'bpm': 100 + i % 30, 'created_at': self.start + timedelta(hours=i)} for i in range(300)],
+            'sleep': [
+                {'hours': 7 + i % 2, 'sleep_quality': 'Good ', 'created_at': self.start + timedelta(days=i)}
+                for i in range(10)
+            ],
+            'bloodpressure': [],
+            'food': [
+                # food 0 is logged most often, then food 1, ...
+                {'calories': 100, 'food_type': f'food {i % food_types if i % 2 else 0}',
+                 'created_at': self.start + timedelta(minutes=i)}
+                for i in range(500)
+            ],
+            'behavior': [{'mood': 'happy', 'energy_level': 'high', 'created_at': self.start}],
+            'scratchnotes': [
+                {'text': f'note {i} ' * 40, 'created_at': self.start + timedelta(days=i)} for i in range(notes)
+            ],
+        }
+
+    def build(self, data, budget=prompt_builder.DEFAULT_TOKEN_BUDGET):
+        text, tokens = prompt_builder.build(data, budget)
+        self.assertEqual(tokens, prompt_builder.estimate_tokens(text))
+        return json.loads(text), tokens
+
+    def test_statistics_instead_of_rows(self):
+        payload, _ = self.build(self.data())
+        self.assertEqual(payload['heartbeat']['n'], 300)
+        self.assertEqual(payload['heartbeat']['bpm'], {'mean': 114.5, 'min': 100, 'max': 129, 'sd': 8.7})
+        self.assertEqual(payload['heartbeat']['bpm_daily'][0], ['2025-03-03', 111.5, 100, 123, 24])
+        self.assertEqual(payload['sleep']['sleep_quality_counts'], {'good': 10})
+        self.assertEqual(payload['period'], ['2025-03-03', '2025-03-15'])
+        self.assertEqual([note[0] for note in payload['scratchnotes']['notes']], ['2025-03-04', '2025-03-03'])
+        self.assertNotIn('omitted', payload)
+
+    def test_counts_keep_the_most_frequent_values(self):
+        payload, _ = self.build(self.data(food_types=500))
+        counts = payload['food']['food_type_counts']
+        self.assertEqual(len(counts), prompt_builder.MAX_COUNT_VALUES)
+        self.assertEqual(next(iter(counts)), 'food 0')
+        # 'food 0' and the 250 odd numbered foods
+        self.assertEqual(payload['omitted']['values'], 251 - prompt_builder.MAX_COUNT_VALUES)
+
+    def test_budget_holds_with_many_distinct_values(self):
+        data = self.data(food_types=500, notes=30)
+        for budget in (100, 200, 500, 1000, 2000):
+            payload, tokens = self.build(data, budget)
+            self.assertLessEqual(tokens, budget)
+            self.assertTrue(payload['omitted'])
+        payload, _ = self.build(data, 100)
+        # Whole sections are the last thing to go, largest first
+        self.assertEqual(payload['omitted']['sections'][0], 'food')
+        self.assertIn('heartbeat', payload)
+
+    def test_notes_are_shortened_before_they_are_dropped(self):
+        data = self.data(notes=4)
+        _, tokens = self.build(data)
+        payload, _ = self.build(data, tokens - 1)
+        self.assertEqual(len(payload['scratchnotes']['notes']), 4)
+        self.assertEqual(len(payload['scratchnotes']['notes'][0][1]), prompt_builder.SHORT_NOTE_CHARS)
+        self.assertEqual(payload['omitted']['notes'], 0)
+
+
+@mock.patch.object(generation, 'backoff_delay', return_value=60)
+class ReportJobTests(TestCase):
+    def setUp(self):
+        self.parent = make_user('parent@example.com')
+        self.child = make_child(self.parent)
+        self.other_child = make_child(self.parent, 'Alex')
+        HeartBeat.objects.create(child=self.child, bpm=110)
+
+    def due(self, job, **fields):
+        # Make a job due (or its lease expired) without waiting
+        ReportJob.objects.filter(id=job.id).update(**fields)
+
+    def test_one_active_job_per_child(self, _):
+        queued, created = jobs.enqueue([self.child.id, self.other_child.id])
+        self.assertEqual(created, 2)
+        again, created = jobs.enqueue([self.child.id], priority=jobs.PRIORITY_INTERACTIVE)
+        self.assertEqual(created, 0)
+        self.assertEqual(again[self.child.id].id, queued[self.child.id].id)
+        self.assertEqual(ReportJob.objects.get(id=queued[self.child.id].id).priority, jobs.PRIORITY_INTERACTIVE)
+        # Another type, or a finished job, does not count
+        self.assertEqual(jobs.enqueue([self.child.id], report_type='daily')[1], 1)
+        ReportJob.objects.filter(id=queued[self.child.id].id).update(status=ReportJob.SUCCEEDED)
+        self.assertEqual(jobs.enqueue([self.child.id])[1], 1)
+
+    def test_constraint_rejects_a_second_active_job(self, _):
+        jobs.enqueue([self.child.id])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ReportJob.objects.create(child=self.child, run_after=timezone.now(), status=ReportJob.RUNNING)
+
+    def test_enqueue_racing_another_enqueue_reuses_its_job(self, _):
+        winner, _ = jobs.enqueue([self.child.id])
+        # As if the other enqueue committed after this one read the active jobs
+        with mock.patch.object(jobs, '_active_jobs', side_effect=[{}, {self.child.id: winner[self.child.id]}]):
+            queued, created = jobs.enqueue([self.child.id, self.other_child.id])
+        self.assertEqual(created, 1)
+        self.assertEqual(queued[self.child.id].id, winner[self.child.id].id)
+        self.assertEqual(ReportJob.objects.filter(status=ReportJob.QUEUED).count(), 2)
+
+    def test_claims_highest_priority_due_job_first(self, _):
+        low, _ = jobs.enqueue([self.child.id])
+        high, _ = jobs.enqueue([self.other_child.id], priority=jobs.PRIORITY_INTERACTIVE)
+        later, _ = jobs.enqueue([self.child.id], report_type='daily', priority=99,
+                                run_after=timezone.now() + timedelta(hours=1))
+        self.assertEqual(jobs.claim('w1').id, high[self.other_child.id].id)
+        job = jobs.claim('w2')
+        self.assertEqual(job.id, low[self.child.id].id)
+        self.assertEqual((job.status, job.attempts, job.locked_by), (ReportJob.RUNNING, 1, 'w2'))
+        self.assertIsNone(jobs.claim('w3'))
+
+    def test_expired_lease_is_taken_over(self, _):
+        jobs.enqueue([self.child.id])
+        first = jobs.claim('w1', lease_seconds=60)
+        self.assertIsNone(jobs.claim('w2'))
+        self.due(first, lease_expires_at=timezone.now() - timedelta(seconds=1))
+        second = jobs.claim('w2')
+        self.assertEqual((second.id, second.attempts, second.locked_by), (first.id, 2, 'w2'))
+        # The first worker finishing late cannot overwrite the new lease
+        self.assertEqual(jobs.run(first, FakeModel(latency=0)), ReportJob.RUNNING)
+        self.assertFalse(Report.objects.exists())
+        self.assertEqual(jobs.run(second, FakeModel(latency=0)), ReportJob.SUCCEEDED)
+        self.assertEqual(Report.objects.get().jobs.get().id, first.id)
+
+    def test_failures_back_off_then_dead_letter(self, _):
+        jobs.enqueue([self.child.id], max_attempts=2)
+        model = FakeModel(latency=0, failures=5)
+        job = jobs.claim('w1')
+        self.assertEqual(jobs.run(job, model), ReportJob.QUEUED)
+        job.refresh_from_db()
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=50))
+        self.assertEqual(job.last_error, "RuntimeError: failure 1")
+        self.assertIsNone(jobs.claim('w1'))
+
+        self.due(job, run_after=timezone.now())
+        self.assertEqual(jobs.run(jobs.claim('w1'), model), ReportJob.DEAD)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (ReportJob.DEAD, 2))
+        self.assertIsNotNone(job.finished_at)
+        # A dead job no longer blocks a new one
+        self.assertEqual(jobs.enqueue([self.child.id])[1], 1)
+
+    def test_worker_runs_jobs_until_none_are_due(self, _):
+        jobs.enqueue([self.child.id, self.other_child.id])
+        results = []
+        jobs.work('w1', FakeModel(latency=0), threading.Event(), burst=True,
+                  on_result=lambda job, status: results.append((job.child_id, status)))
+        self.assertEqual(sorted(results), sorted([
+            (self.child.id, ReportJob.SUCCEEDED), (self.other_child.id, ReportJob.SKIPPED),
+        ]))
+        report = Report.objects.get()
+        self.assertEqual((report.child, report.report_type), (self.child, 'weekly'))
+
+    def test_api_queues_a_job_and_reports_its_status(self, _):
+        client = APIClient()
+        client.force_authenticate(self.parent)
+        response = client.post('/api/api/report/', {'child': self.child.id, 'generate': True}, format='json')
+        self.assertEqual(response.status_code, 202)
+        again = client.post('/api/api/report/', {'child': self.child.id, 'generate': True}, format='json')
+        self.assertEqual(again.data['job_id'], response.data['job_id'])
+
+        status_url = f"/api/api/report/jobs/{response.data['job_id']}/"
+        self.assertTrue(response.data['status_url'].endswith(status_url))
+        self.assertEqual(client.get(status_url).data['status'], ReportJob.QUEUED)
+        jobs.run(jobs.claim('w1'), FakeModel(latency=0))
+        job = client.get(status_url).data
+        self.assertEqual((job['status'], job['report']), (ReportJob.SUCCEEDED, Report.objects.get().id))
+
+        stranger = make_user('stranger@example.com')
+        client.force_authenticate(stranger)
+        self.assertEqual(client.get(status_url).status_code, 404)
+        response = client.post('/api/api/report/', {'child': self.child.id, 'generate': True}, format='json')
+        self.assertEqual(response.status_code, 404)
+        for child in ('abc', [self.child.id]):
+            response = client.post('/api/api/report/', {'child': child, 'generate': True}, format='json')
+            self.assertEqual(response.data, {'child': 'Must be an integer.'})
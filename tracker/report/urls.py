@@ -2,11 +2,13 @@ from django.urls import path
 from .views import (
     ReportCreateView,
     ReportListView,
-    ReportDetailView
+    ReportDetailView,
+    ReportJobDetailView
 )
 
 urlpatterns = [
     path('', ReportCreateView.as_view(), name='create-report'),
     path('list/', ReportListView.as_view(), name='list-reports'),
-    path('<int:pk>/', ReportDetailView.as_view(), name='report-detail')
+    path('<int:pk>/', ReportDetailView.as_view(), name='report-detail'),
+    path('jobs/<int:pk>/', ReportJobDetailView.as_view(), name='report-job-detail')
 ]
@@ -1,13 +1,49 @@
-from rest_framework import generics, permissions
-from .models import Report
-from .serializers import ReportSerializer
+from django.urls import reverse
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 
-# Create a new report
+from core.access import accessible_children
+from .models import Report, ReportJob
+from .serializers import ReportSerializer, ReportJobSerializer
+from . import jobs
+
+# Create a new report, or with {"child": id, "generate": true} queue a job
+# that generates one and return 202 with the job to poll
 class ReportCreateView(generics.CreateAPIView):
     queryset = Report.objects.all()
     serializer_class = ReportSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def create(self, request, *args, **kwargs):
+        if not request.data.get('generate'):
+            return super().create(request, *args, **kwargs)
+
+        report_type = request.data.get('report_type', 'weekly')
+        if report_type not in dict(Report.REPORT_TYPES):
+            return Response({'error': 'report_type must be daily or weekly'}, status=status.HTTP_400_BAD_REQUEST)
+        child_id = request.data.get('child')
+        if not child_id:
+            return Response({'error': 'child is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            child_id = int(child_id)
+        except (TypeError, ValueError):
+            raise ValidationError({'child': 'Must be an integer.'})
+        child = accessible_children(request.user).filter(id=child_id).first()
+        if child is None:
+            return Response({'error': 'Child not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        queued, _ = jobs.enqueue([child.id], report_type, priority=jobs.PRIORITY_INTERACTIVE)
+        job = queued[child.id]
+        return Response(
+            {
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': request.build_absolute_uri(reverse('report-job-detail', args=[job.id])),
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
 
 # List all reports or filter by child_id
 class ReportListView(generics.ListAPIView):
@@ -29,3 +65,10 @@ class ReportDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
 
+# Status of a report job; once it succeeded, report is the id of the new report
+class ReportJobDetailView(generics.RetrieveAPIView):
+    serializer_class = ReportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ReportJob.objects.filter(child__in=accessible_children(self.request.user))
@@ -4,15 +4,25 @@ import requests
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from llm_cache import cached_call
+
 # Load environment variables from .env
 load_dotenv()
 
 # Set up API keys
 GEMINI_API_KEY = os.getenv("API_KEY")
 genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash-002")
+MODEL_NAME = "gemini-1.5-flash-002"
+model = genai.GenerativeModel(MODEL_NAME)
+
+# Bump when the prompt changes, so cached ratings are not reused
+SENTIMENT_PROMPT_VERSION = 1
+
+def rateSentence(text, bypass_cache=False):
+    # Ratings are cached per sentence (see llm_cache); failures raise and are not cached
+    return cached_call(MODEL_NAME, f"sentiment-{SENTIMENT_PROMPT_VERSION}", text, lambda: _rate(text), bypass=bypass_cache)
 
-def rateSentence(text):
+def _rate(text):
     prompt = f"""
         Analyze the following sentence and return a JSON object with two fields: "positive" and "negative",
         each representing the percentage (from 0 to 100) of how positive or negative the sentence is.
@@ -155,12 +155,93 @@ EMAIL_USE_TLS = True
 EMAIL_USE_SSL = False
 
 # Channels configuration
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
+# Cache and channel layer configuration. Use Redis when running several
+# processes, so that dashboard invalidation and live vitals pushed from one
+# worker reach the others.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
+# Seconds a cached dashboard response is kept
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', 300))
+
+# Optional write-behind buffer for high-frequency HeartBeat ingestion
+# (api/api/heartbeats/buffered/). ACK is 'enqueue' (fast, rows in the buffer
+# are lost if the process dies) or 'flush' (respond once rows are stored;
+# under ASGI these requests are written directly instead of waiting on a flush).
+HEARTBEAT_BUFFER = {
+    'ENABLED': os.getenv('HEARTBEAT_BUFFER_ENABLED', 'False').lower() == 'true',
+    'MAX_ROWS': int(os.getenv('HEARTBEAT_BUFFER_MAX_ROWS', 500)),
+    'FLUSH_INTERVAL_MS': int(os.getenv('HEARTBEAT_BUFFER_FLUSH_INTERVAL_MS', 200)),
+    'MAX_QUEUE': int(os.getenv('HEARTBEAT_BUFFER_MAX_QUEUE', 20000)),
+    'ACK': os.getenv('HEARTBEAT_BUFFER_ACK', 'enqueue'),
 }
 
+# Streaming anomaly detection on heart rate and blood pressure. ALPHA is the
+# EWMA smoothing factor of each child's baseline, Z_THRESHOLD the deviation
+# that is flagged, and WARMUP the readings needed before deviations count.
+ANOMALY_DETECTION = {
+    'ALPHA': float(os.getenv('ANOMALY_ALPHA', 0.1)),
+    'Z_THRESHOLD': float(os.getenv('ANOMALY_Z_THRESHOLD', 3.5)),
+    'WARMUP': int(os.getenv('ANOMALY_WARMUP', 20)),
+}
+
+# WebSocket ingestion for wearables (ws/ingest/<child_id>/): frames are stored
+# and acknowledged in batches every FLUSH_INTERVAL_MS, or sooner once
+# MAX_PENDING frames are waiting.
+DEVICE_STREAM = {
+    'FLUSH_INTERVAL_MS': int(os.getenv('DEVICE_STREAM_FLUSH_INTERVAL_MS', 1000)),
+    'MAX_PENDING': int(os.getenv('DEVICE_STREAM_MAX_PENDING', 1000)),
+}
+
+# Monthly partitions of log_heartbeat and log_bloodpressure (Postgres only),
+# maintained by `manage.py manage_partitions`: MONTHS_AHEAD future partitions
+# are kept ready, and partitions older than RETENTION_MONTHS (unset keeps
+# everything) are detached as plain tables or dropped, per ARCHIVE.
+LOG_PARTITIONS = {
+    'MONTHS_AHEAD': int(os.getenv('LOG_PARTITIONS_MONTHS_AHEAD', 3)),
+    'RETENTION_MONTHS': int(os.environ['LOG_PARTITIONS_RETENTION_MONTHS']) if os.getenv('LOG_PARTITIONS_RETENTION_MONTHS') else None,
+    'ARCHIVE': os.getenv('LOG_PARTITIONS_ARCHIVE', 'detach'),
+}
+
+# Background report jobs (report/jobs.py). A worker holds a job for
+# LEASE_SECONDS per attempt, so it must be longer than a model call; failed
+# attempts are retried after a jittered backoff from BACKOFF_BASE seconds.
+REPORT_JOBS = {
+    'LEASE_SECONDS': int(os.getenv('REPORT_JOBS_LEASE_SECONDS', 300)),
+    'MAX_ATTEMPTS': int(os.getenv('REPORT_JOBS_MAX_ATTEMPTS', 5)),
+    'BACKOFF_BASE': float(os.getenv('REPORT_JOBS_BACKOFF_BASE', 30)),
+    'BACKOFF_CAP': float(os.getenv('REPORT_JOBS_BACKOFF_CAP', 3600)),
+    'POLL_INTERVAL': float(os.getenv('REPORT_JOBS_POLL_INTERVAL', 2)),
+}
+
+# Model responses are cached in a sqlite file (llm_cache.py), under
+# LLM_CACHE_PATH or else DATA_DIR. It is only shared within one host, and in
+# a container DATA_DIR must be a mounted volume (the image uses /data) or the
+# cache and its hit/miss counters are lost on every redeploy.
+
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [